@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import numpy as np
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+from dtw.dtw import DTW
+from dtw.multiscale import approximation_error
+from features.mfcc import MFCC
+from metrics import Metrics
+
+# Sweep sizes; --quick uses the smaller set
+FULL = {
+    'lengths': [50, 100, 200, 400],
+    'band_ratios': [0.05, 0.1, 0.2, 0.4],
+    'template_counts': [1, 3, 5, 10],
+    'long_lengths': [200, 400, 800, 1600],
+    'radii': [2, 4, 8],
+}
+QUICK = {
+    'lengths': [50, 100],
+    'band_ratios': [0.1, 0.2],
+    'template_counts': [1, 3],
+    'long_lengths': [200, 400],
+    'radii': [4],
+}
+
+
+def synthetic_utterance(label: int, n_frames: int, seed: int = 0, sample_rate: int = 16000,
+                        mfcc: Optional[MFCC] = None) -> np.ndarray:
+    """
+    Synthetic 16-bit "utterance" that yields exactly n_frames feature frames
+
+    Three formant-like tones glide between class-specific frequencies under
+    a smooth envelope, with per-instance jitter and background noise, so
+    utterances of the same class are similar but not identical.
+
+    Args:
+        label: Class index; selects the formant trajectories
+        n_frames: Number of MFCC frames the audio should produce
+        seed: Seed of the per-instance jitter
+        sample_rate: Sample rate in Hz
+        mfcc: Extractor whose framing determines the length (default: MFCC())
+
+    Returns:
+        int16 samples
+    """
+    mfcc = mfcc if mfcc is not None else MFCC(sample_rate=sample_rate)
+    rng = np.random.default_rng([label, seed])
+    n_samples = (n_frames - 1) * mfcc.frame_step + mfcc.frame_length
+    t = np.arange(n_samples) / sample_rate
+
+    audio = np.zeros(n_samples)
+    for k, (base, spread) in enumerate([(300, 60), (1200, 150), (2500, 200)]):
+        start = (base + spread * ((label * (k + 3)) % 7)) * rng.uniform(0.95, 1.05)
+        end = (base + spread * ((label * (k + 5) + 2) % 7)) * rng.uniform(0.95, 1.05)
+        # Phase of a linear glide from start to end Hz
+        phase = 2 * np.pi * (start * t + (end - start) * t ** 2 / (2 * t[-1]))
+        audio += np.sin(phase) / (k + 1)
+    audio *= np.hanning(n_samples)
+    audio += 0.02 * rng.standard_normal(n_samples)
+    return (audio / np.abs(audio).max() * 8000).astype(np.int16)
+
+
+def synthetic_corpus(n_classes: int, n_per_class: int, n_frames: int, seed: int = 0,
+                     mfcc: Optional[MFCC] = None) -> Dict[str, List[np.ndarray]]:
+    """
+    Feature sequences of synthetic utterances, shaped like DigitRecognizer.recordings
+
+    Lengths vary by up to +-20% around n_frames, as real utterances do.
+    """
+    mfcc = mfcc if mfcc is not None else MFCC()
+    rng = np.random.default_rng(seed)
+    corpus: Dict[str, List[np.ndarray]] = {}
+    for label in range(n_classes):
+        lengths = rng.integers(int(n_frames * 0.8), int(n_frames * 1.2) + 1, n_per_class)
+        audios = [synthetic_utterance(label, int(n), seed=seed * 1000 + i, mfcc=mfcc)
+                  for i, n in enumerate(lengths)]
+        corpus[f'class{label}'] = mfcc.compute_features_batch(audios)
+    return corpus
+
+
+def time_call(fn: Callable[[], object], repeat: int = 5, min_time: float = 0.05) -> Dict[str, float]:
+    """
+    Time a call after one warm-up run (e.g. numba compilation)
+
+    Each of the `repeat` samples runs fn enough times to take at least
+    min_time seconds, and reports the time per call.
+
+    Returns:
+        Seconds per call: min, median and mean over the samples, and the
+        number of calls per sample
+    """
+    fn()
+    start = time.perf_counter()
+    fn()
+    once = max(time.perf_counter() - start, 1e-9)
+    number = max(1, int(min_time / once))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return {'min': float(np.min(samples)), 'median': float(np.median(samples)),
+            'mean': float(np.mean(samples)), 'number': number}
+
+
+def _record(results: List[Dict], name: str, params: Dict, timing: Dict[str, float], **extra):
+    """Add one benchmark result (with any extra measurements) and report it"""
+    results.append({'name': name, 'params': params, 'seconds': timing, **extra})
+    args = ', '.join(f'{k}={v}' for k, v in params.items())
+    notes = ''.join(f'  {k}={v:.4g}' for k, v in extra.get('error', {}).items())
+    print(f"{name:<24} {args:<40} {timing['median'] * 1e3:10.3f} ms{notes}", file=sys.stderr)
+
+
+def bench_mfcc(results: List[Dict], sizes: Dict, repeat: int):
+    """MFCC.compute_features per utterance length"""
+    mfcc = MFCC()
+    for n_frames in sizes['lengths']:
+        audio = synthetic_utterance(0, n_frames, mfcc=mfcc)
+        _record(results, 'mfcc.compute_features', {'frames': n_frames},
+                time_call(lambda: mfcc.compute_features(audio), repeat))
+
+
+def bench_dtw(results: List[Dict], sizes: Dict, repeat: int, engine: str):
+    """compute_distance and time_synchronous_dtw per length and band ratio"""
+    mfcc = MFCC()
+    for n_frames in sizes['lengths']:
+        template = mfcc.compute_features(synthetic_utterance(1, n_frames, seed=1, mfcc=mfcc))
+        test = mfcc.compute_features(synthetic_utterance(1, n_frames, seed=2, mfcc=mfcc))
+        for band_ratio in sizes['band_ratios']:
+            dtw = DTW(band_ratio=band_ratio, engine=engine)
+            params = {'frames': n_frames, 'band_ratio': band_ratio}
+            _record(results, 'dtw.compute_distance', params,
+                    time_call(lambda: dtw.compute_distance(template, test), repeat))
+            _record(results, 'dtw.time_synchronous_dtw', params,
+                    time_call(lambda: dtw.time_synchronous_dtw(template, test), repeat))
+
+
+def bench_multiscale(results: List[Dict], sizes: Dict, repeat: int, engine: str, n_pairs: int = 3):
+    """Exact banded vs coarse-to-fine compute_distance on long utterances, with the approximation error"""
+    mfcc = MFCC()
+    for n_frames in sizes['long_lengths']:
+        templates = [mfcc.compute_features(synthetic_utterance(1, n_frames, seed=2 * i, mfcc=mfcc))
+                     for i in range(n_pairs)]
+        # Tests run 10% longer, so the pairs also differ in tempo
+        tests = [mfcc.compute_features(synthetic_utterance(1, n_frames * 11 // 10, seed=2 * i + 1, mfcc=mfcc))
+                 for i in range(n_pairs)]
+        exact = DTW(engine=engine)
+        templates = [exact.normalize_features(t) for t in templates]
+        tests = [exact.normalize_features(t) for t in tests]
+        _record(results, 'dtw.exact_distance', {'frames': n_frames},
+                time_call(lambda: exact.compute_distance(templates[0], tests[0], normalized=True), repeat))
+        for radius in sizes['radii']:
+            dtw = DTW(engine=engine, radius=radius)
+            timing = time_call(lambda: dtw.compute_distance(templates[0], tests[0], normalized=True), repeat)
+            error = approximation_error(exact, templates, tests, radius, Metrics(), normalized=True)
+            _record(results, 'dtw.multiscale_distance', {'frames': n_frames, 'radius': radius}, timing,
+                    error=error)
+
+
+def bench_recognize(results: List[Dict], sizes: Dict, repeat: int, engine: str, n_classes: int = 10):
+    """DTW.recognize against n_templates templates of each class"""
+    corpus = synthetic_corpus(n_classes, max(sizes['template_counts']) + 1, 100, seed=3)
+    dtw = DTW(engine=engine)
+    test = corpus['class0'][-1]
+    for n_templates in sizes['template_counts']:
+        templates = [t for seqs in corpus.values() for t in seqs[:n_templates]]
+        for use_lower_bounds in (False, True):
+            params = {'templates': len(templates), 'lower_bounds': use_lower_bounds}
+            timing = time_call(lambda: dtw.recognize(templates, test, use_lower_bounds=use_lower_bounds),
+                               repeat)
+            _record(results, 'dtw.recognize', params, timing)
+
+
+def bench_test_recognition(results: List[Dict], sizes: Dict, repeat: int, n_classes: int = 10,
+                           n_tests: int = 5):
+    """End-to-end DigitRecognizer.test_recognition on a synthetic corpus"""
+    from main import DigitRecognizer
+
+    logger = logging.getLogger('benchmark')
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    corpus = synthetic_corpus(n_classes, max(max(sizes['template_counts']), n_tests + 1), 100, seed=4)
+    recognizer = DigitRecognizer(logger, cache_dir=None, corpus_dir=None)
+    recognizer.recordings = corpus
+    for n_templates in sizes['template_counts']:
+        recognizer.setup_templates(n_templates)
+        timing = time_call(lambda: recognizer.test_recognition(n_tests=n_tests), repeat, min_time=0)
+        _record(results, 'test_recognition', {'templates_per_class': n_templates, 'tests': n_classes * n_tests},
+                timing)
+
+
+def run(sizes: Dict, repeat: int = 5, engine: str = 'auto', only: Optional[Sequence[str]] = None) -> Dict:
+    """
+    Run the benchmarks
+
+    Args:
+        sizes: Lengths, band ratios and template counts to cover (FULL or QUICK)
+        repeat: Timing samples per benchmark
+        engine: DTW recurrence kernel (see DTW)
+        only: Benchmark groups to run ('mfcc', 'dtw', 'multiscale', 'recognize',
+            'test_recognition'); all when None
+
+    Returns:
+        JSON-serializable report with environment metadata and one entry per measurement
+    """
+    groups = {
+        'mfcc': lambda results: bench_mfcc(results, sizes, repeat),
+        'dtw': lambda results: bench_dtw(results, sizes, repeat, engine),
+        'multiscale': lambda results: bench_multiscale(results, sizes, repeat, engine),
+        'recognize': lambda results: bench_recognize(results, sizes, repeat, engine),
+        'test_recognition': lambda results: bench_test_recognition(results, sizes, repeat),
+    }
+    results: List[Dict] = []
+    for name, bench in groups.items():
+        if only is None or name in only:
+            bench(results)
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': DTW(engine=engine)._kernel.__name__,
+            'repeat': repeat,
+            'sizes': sizes,
+        },
+        'results': results,
+    }
+
+
+def compare(before: Dict, after: Dict) -> List[str]:
+    """
+    Speedup of every measurement present in both reports
+
+    Returns:
+        One line per measurement: name, parameters, median before/after and ratio
+    """
+    key = lambda r: (r['name'], json.dumps(r['params'], sort_keys=True))
+    old = {key(r): r for r in before['results']}
+    lines = []
+    for r in after['results']:
+        if key(r) not in old:
+            continue
+        t0, t1 = old[key(r)]['seconds']['median'], r['seconds']['median']
+        args = ', '.join(f'{k}={v}' for k, v in r['params'].items())
+        lines.append(f"{r['name']:<24} {args:<40} {t0 * 1e3:10.3f} ms -> {t1 * 1e3:10.3f} ms  x{t0 / t1:.2f}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DTW, MFCC and recognition on synthetic audio")
+    parser.add_argument('--out', default='benchmark.json', help="JSON report to write")
+    parser.add_argument('--quick', action='store_true', help="smaller sweep for a fast check")
+    parser.add_argument('--repeat', type=int, default=5, help="timing samples per benchmark")
+    parser.add_argument('--engine', default='auto', help="DTW kernel: auto, numba, wavefront or loop")
+    parser.add_argument('--only', nargs='+', choices=['mfcc', 'dtw', 'multiscale', 'recognize', 'test_recognition'],
+                        help="run only these benchmark groups")
+    parser.add_argument('--compare', metavar='BASELINE', help="report speedups relative to an earlier report")
+    args = parser.parse_args()
+
+    report = run(QUICK if args.quick else FULL, args.repeat, args.engine, args.only)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\n".join(compare(baseline, report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import time
+import numpy as np
+from typing import Optional
+
+
+class RingBuffer:
+    def __init__(self, capacity: int, dtype=np.int16):
+        """
+        Single-producer, single-consumer ring buffer of audio samples without locks
+
+        The producer (the audio callback thread) only advances the write
+        counter and the consumer only advances the read counter, each after
+        its copy is complete, so neither side ever waits for the other. When
+        the buffer is full, new samples are dropped and counted in `overruns`
+        rather than blocking the producer.
+
+        Args:
+            capacity: Number of samples the buffer holds
+            dtype: Sample type
+        """
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._written = 0  # total samples written, only changed by the producer
+        self._read = 0     # total samples read, only changed by the consumer
+        self.overruns = 0
+
+    def available(self) -> int:
+        """Samples written but not yet read"""
+        return self._written - self._read
+
+    def write(self, samples: np.ndarray) -> int:
+        """
+        Append samples (producer side)
+
+        Args:
+            samples: Samples to append
+
+        Returns:
+            Number of samples stored; the rest did not fit and were dropped
+        """
+        written = self._written
+        n = min(len(samples), self.capacity - (written - self._read))
+        self.overruns += len(samples) - n
+        start = written % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:n - first] = samples[first:n]
+        # Publish only after the samples are in place
+        self._written = written + n
+        return n
+
+    def read(self, max_samples: Optional[int] = None) -> np.ndarray:
+        """
+        Take the oldest unread samples (consumer side)
+
+        Args:
+            max_samples: Most samples to take (default: all available)
+
+        Returns:
+            Copy of the samples taken, possibly empty
+        """
+        read = self._read
+        n = self._written - read
+        if max_samples is not None:
+            n = min(n, max_samples)
+        start = read % self.capacity
+        first = min(n, self.capacity - start)
+        samples = np.concatenate((self._data[start:start + first], self._data[:n - first]))
+        # Release the space only after the samples are copied out
+        self._read = read + n
+        return samples
+
+
+class CallbackRecorder:
+    def __init__(self, rate: int = 16000, chunk_size: int = 1024, channels: int = 1,
+                 buffer_seconds: float = 10.0):
+        """
+        Microphone capture driven by the PyAudio callback
+
+        The callback only decodes the captured bytes with np.frombuffer and
+        writes them into a RingBuffer, so the capture thread never waits on
+        the consumer. read_chunk() hands the samples to the consumer in
+        fixed-size chunks.
+
+        Args:
+            rate: Sample rate in Hz
+            chunk_size: Frames per chunk (per channel)
+            channels: 1=mono, 2=stereo (samples stay interleaved)
+            buffer_seconds: Audio the ring buffer can hold before dropping samples
+        """
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.channels = channels
+        self.ring = RingBuffer(int(buffer_seconds * rate) * channels)
+        self._pyaudio = None
+        self._stream = None
+        self.sample_width = 2  # 16-bit PCM
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """PyAudio callback: store the captured samples and keep the stream running"""
+        self.ring.write(np.frombuffer(in_data, dtype='<i2'))
+        return None, self._continue
+
+    def start(self):
+        """Open the microphone stream and start capturing"""
+        import pyaudio
+        self._continue = pyaudio.paContinue
+        self._pyaudio = pyaudio.PyAudio()
+        self.sample_width = self._pyaudio.get_sample_size(pyaudio.paInt16)
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            frames_per_buffer=self.chunk_size,
+            stream_callback=self._callback
+        )
+        self._stream.start_stream()
+
+    def read_chunk(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+        """
+        Wait for the next full chunk of captured samples
+
+        Args:
+            timeout: Seconds to wait at most (None waits indefinitely)
+
+        Returns:
+            Interleaved samples of one chunk, or None on timeout or once the
+            stream has stopped without a full chunk left
+        """
+        needed = self.chunk_size * self.channels
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Poll at a fraction of the chunk duration; the producer is never blocked
+        poll = self.chunk_size / self.rate / 4
+        while self.ring.available() < needed:
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            # A stopped, closed or failed stream will not deliver more samples
+            stream = self._stream
+            if stream is None or not stream.is_active():
+                return None
+            time.sleep(poll)
+        return self.ring.read(needed)
+
+    def stop(self):
+        """Stop capturing and release the audio device"""
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
+
+    def __enter__(self) -> 'CallbackRecorder':
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
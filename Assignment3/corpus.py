@@ -0,0 +1,171 @@
+import os
+import json
+import wave
+import hashlib
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def _check_format(path: str, wf: wave.Wave_read, rate: Optional[int] = None):
+    """Raise ValueError unless the WAV file holds 16-bit mono samples (at the given rate)"""
+    if wf.getnchannels() != 1:
+        raise ValueError(f"{path}: expected mono audio, got {wf.getnchannels()} channels")
+    if wf.getsampwidth() != 2:
+        raise ValueError(f"{path}: expected 16-bit samples, got {8 * wf.getsampwidth()}-bit")
+    if rate is not None and wf.getframerate() != rate:
+        raise ValueError(f"{path}: expected {rate} Hz, got {wf.getframerate()} Hz")
+
+
+def read_wav(path: str, rate: Optional[int] = None) -> np.ndarray:
+    """
+    Samples of a 16-bit mono WAV file
+
+    The sample data is viewed in place with np.frombuffer instead of being
+    unpacked sample by sample.
+
+    Args:
+        path: WAV file
+        rate: Required sample rate in Hz (None accepts any)
+
+    Returns:
+        Read-only int16 samples
+    """
+    with wave.open(path, 'rb') as wf:
+        _check_format(path, wf, rate)
+        data = wf.readframes(wf.getnframes())
+    return np.frombuffer(data, dtype='<i2')
+
+
+class RecordingCorpus:
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, corpus_dir: str):
+        """
+        Recordings packed into one contiguous int16 file with an offset/label index
+
+        The packed samples are memory-mapped once, and every recording is a
+        zero-copy slice of that map, so serving thousands of recordings takes
+        a single file open. Use pack() or load_or_pack() to create a corpus.
+
+        Args:
+            corpus_dir: Directory written by pack()
+        """
+        self.corpus_dir = corpus_dir
+        with open(os.path.join(corpus_dir, self.INDEX_FILE)) as f:
+            index = json.load(f)
+        self.rate: int = index['rate']
+        self.records: List[Dict] = index['recordings']
+        self.samples = np.load(os.path.join(corpus_dir, index['samples']), mmap_mode='r')
+        if self.records and self.records[-1]['offset'] + self.records[-1]['length'] > len(self.samples):
+            raise ValueError(f"{corpus_dir}: index does not match the packed samples")
+        self._by_path = {record['path']: i for i, record in enumerate(self.records)}
+
+    @classmethod
+    def pack(cls, corpus_dir: str, files: Sequence[Tuple[str, str]]) -> 'RecordingCorpus':
+        """
+        Concatenate recordings into a new packed corpus
+
+        Args:
+            corpus_dir: Directory to write the corpus to (replaces an existing one)
+            files: (label, WAV path) of each recording, in corpus order
+
+        Returns:
+            The packed corpus
+        """
+        os.makedirs(corpus_dir, exist_ok=True)
+        # Headers first, so the packed file can be allocated at its final size
+        rate = None
+        records = []
+        offset = 0
+        for label, path in files:
+            with wave.open(path, 'rb') as wf:
+                rate = wf.getframerate() if rate is None else rate
+                _check_format(path, wf, rate)
+                length = wf.getnframes()
+            stat = os.stat(path)
+            records.append({'path': os.path.abspath(path), 'label': label, 'offset': offset, 'length': length,
+                            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+            offset += length
+
+        index = {'rate': rate if rate is not None else 16000, 'recordings': records}
+        # A new samples file per content, so an index never points at a partially written one
+        name = 'samples-' + hashlib.sha1(json.dumps(index, sort_keys=True).encode()).hexdigest()[:16] + '.npy'
+        index['samples'] = name
+        tmp = os.path.join(corpus_dir, name + f'.{os.getpid()}.tmp')
+        samples = np.lib.format.open_memmap(tmp, mode='w+', dtype='<i2', shape=(offset,))
+        for record in records:
+            audio = read_wav(record['path'], rate)
+            samples[record['offset']:record['offset'] + len(audio)] = audio
+        samples.flush()
+        del samples
+        os.replace(tmp, os.path.join(corpus_dir, name))
+
+        index_path = os.path.join(corpus_dir, cls.INDEX_FILE)
+        tmp = index_path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, index_path)
+
+        # Samples files of earlier versions are unreferenced now
+        for old in os.listdir(corpus_dir):
+            if old.startswith('samples-') and old.endswith('.npy') and old != name:
+                os.remove(os.path.join(corpus_dir, old))
+        return cls(corpus_dir)
+
+    @classmethod
+    def load_or_pack(cls, corpus_dir: str, files: Sequence[Tuple[str, str]]) -> 'RecordingCorpus':
+        """
+        Open the corpus in `corpus_dir` if it holds exactly these recordings unchanged, else repack it
+
+        Args:
+            corpus_dir: Corpus directory
+            files: (label, WAV path) of each recording, in corpus order
+
+        Returns:
+            A corpus of the given recordings
+        """
+        try:
+            corpus = cls(corpus_dir)
+        except (OSError, ValueError, KeyError):
+            return cls.pack(corpus_dir, files)  # missing or unreadable, pack it
+        if len(corpus.records) != len(files):
+            return cls.pack(corpus_dir, files)
+        for record, (label, path) in zip(corpus.records, files):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                return cls.pack(corpus_dir, files)
+            if (record['path'] != os.path.abspath(path) or record['label'] != label
+                    or record['size'] != stat.st_size or record['mtime_ns'] != stat.st_mtime_ns):
+                return cls.pack(corpus_dir, files)
+        return corpus
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        """Samples of recording idx, a read-only view into the memory map"""
+        record = self.records[idx]
+        return self.samples[record['offset']:record['offset'] + record['length']]
+
+    @property
+    def labels(self) -> List[str]:
+        """Label of each recording, in corpus order"""
+        return [record['label'] for record in self.records]
+
+    @property
+    def paths(self) -> List[str]:
+        """Source path of each recording, in corpus order"""
+        return [record['path'] for record in self.records]
+
+    def audio(self, path: str) -> np.ndarray:
+        """
+        Samples of the recording packed from a source file
+
+        Args:
+            path: Source WAV path, as given to pack()
+
+        Returns:
+            Read-only view into the memory map
+        """
+        return self[self._by_path[os.path.abspath(path)]]
@@ -0,0 +1,155 @@
+import numpy as np
+from typing import Callable, List, Tuple
+from dtw.kernels import dtw_wavefront
+
+CostFn = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def _sweep(template: np.ndarray, test: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+           band: int, cost_fn: CostFn, block: int = 32) -> np.ndarray:
+    """
+    Accumulated costs of the last row of a sub-block, keeping one row at a time
+
+    Paths start in the first cell (rows[0], cols[0]) and move through rows
+    and cols in the given order, so passing them reversed sweeps backwards.
+
+    Args:
+        template: Normalized template feature sequence (N x D)
+        test: Normalized test feature sequence (M x D)
+        rows: Template frame indices in processing order
+        cols: Test frame indices in processing order
+        band: Band half-width, applied to the absolute frame indices
+        cost_fn: Local cost function returning a matrix for two frame sets
+        block: Template rows per local-cost matrix product
+
+    Returns:
+        Accumulated cost of reaching (rows[-1], cols[k]) for every k
+    """
+    W = len(cols)
+    # Entry 0 is a virtual column before cols[0]; the virtual row above only allows the start cell
+    prev = np.full(W + 1, np.inf)
+    prev[0] = 0
+
+    for b0 in range(0, len(rows), block):
+        local_block = cost_fn(template[rows[b0:b0 + block]], test[cols])
+        for r, local in zip(rows[b0:b0 + block], local_block):
+            inside = np.abs(cols - r) <= band
+            # cur[k] = d_k + min(cur[k-1], prev[k], prev[k-1]) as a running minimum:
+            # with a_k = d_k + min(prev[k], prev[k-1]) and S_k = d_0 + ... + d_k,
+            # cur[k] = S_k + min_{l <= k} (a_l - S_l). The in-band cells of a row are contiguous.
+            local = np.where(inside, local, 0)
+            entry = np.where(inside, local + np.minimum(prev[1:], prev[:-1]), np.inf)
+            cumulative = np.cumsum(local)
+            cur = np.full(W + 1, np.inf)
+            cur[1:] = cumulative + np.minimum.accumulate(entry - cumulative)
+            cur[1:][~inside] = np.inf
+            prev = cur
+
+    return prev[1:]
+
+
+def _full_path(template: np.ndarray, test: np.ndarray, r0: int, r1: int, c0: int, c1: int,
+               band: int, cost_fn: CostFn) -> List[Tuple[int, int]]:
+    """Optimal path from (r0, c0) to (r1, c1) with a dense traceback over a small block"""
+    local = cost_fn(template[r0:r1 + 1], test[c0:c1 + 1])
+    n, m = local.shape
+    rows = np.arange(r0, r1 + 1)[:, np.newaxis]
+    cols = np.arange(c0, c1 + 1)[np.newaxis, :]
+    local = np.where(np.abs(rows - cols) <= band, local, np.inf)
+
+    # Out-of-band cells are already inf, so the block itself needs no band
+    acc = dtw_wavefront(local, max(n, m))
+
+    # Trace back from the end corner, preferring the diagonal on ties
+    i, j = n, m
+    path = [(r0 + i - 1, c0 + j - 1)]
+    while (i, j) != (1, 1):
+        steps = [(acc[i-1, j-1], i - 1, j - 1), (acc[i-1, j], i - 1, j), (acc[i, j-1], i, j - 1)]
+        _, i, j = min(steps, key=lambda step: step[0])
+        path.append((r0 + i - 1, c0 + j - 1))
+    return path[::-1]
+
+
+def hirschberg_path(template: np.ndarray, test: np.ndarray, band: int, cost_fn: CostFn,
+                    base_cells: int = 4096) -> np.ndarray:
+    """
+    Optimal banded DTW warping path in linear memory (divide and conquer)
+
+    The template is split at its middle row; a forward sweep from the start
+    and a backward sweep from the end give the cost of every crossing
+    between the two halves, the cheapest crossing fixes one point of the
+    path, and both halves are solved recursively. Blocks of at most
+    base_cells cells are solved directly with a traceback.
+
+    Args:
+        template: Normalized template feature sequence (N x D)
+        test: Normalized test feature sequence (M x D)
+        band: Band half-width in frames
+        cost_fn: Local cost function returning a matrix for two frame sets
+        base_cells: Block size below which a dense traceback is used
+
+    Returns:
+        Warping path as (L x 2) array of (template frame, test frame) pairs,
+        empty when no path fits inside the band
+    """
+    N, M = len(template), len(test)
+    if N == 0 or M == 0 or abs(N - M) > band:
+        return np.zeros((0, 2), dtype=int)
+
+    path: List[Tuple[int, int]] = []
+    # Explicit stack of blocks, processed left to right
+    stack = [(0, N - 1, 0, M - 1)]
+    while stack:
+        r0, r1, c0, c1 = stack.pop()
+        if r0 == r1:
+            path.extend((r0, c) for c in range(c0, c1 + 1))
+            continue
+        if c0 == c1:
+            path.extend((r, c0) for r in range(r0, r1 + 1))
+            continue
+        if (r1 - r0 + 1) * (c1 - c0 + 1) <= base_cells:
+            path.extend(_full_path(template, test, r0, r1, c0, c1, band, cost_fn))
+            continue
+
+        mid = (r0 + r1) // 2
+        cols = np.arange(c0, c1 + 1)
+        forward = _sweep(template, test, np.arange(r0, mid + 1), cols, band, cost_fn)
+        backward = _sweep(template, test, np.arange(r1, mid, -1), cols[::-1], band, cost_fn)[::-1]
+
+        # Leave row mid at column j either straight down or diagonally
+        down = forward + backward
+        diagonal = forward[:-1] + backward[1:]
+        j_down, j_diag = int(np.argmin(down)), int(np.argmin(diagonal))
+        if diagonal[j_diag] <= down[j_down]:
+            split, next_col = c0 + j_diag, c0 + j_diag + 1
+        else:
+            split, next_col = c0 + j_down, c0 + j_down
+        if not np.isfinite(min(down[j_down], diagonal[j_diag])):
+            return np.zeros((0, 2), dtype=int)
+
+        stack.append((mid + 1, r1, next_col, c1))
+        stack.append((r0, mid, c0, split))
+
+    return np.array(path, dtype=int)
+
+
+def path_costs(template: np.ndarray, test: np.ndarray, path: np.ndarray, cost_fn: CostFn,
+               chunk: int = 256) -> np.ndarray:
+    """
+    Local cost of every aligned frame pair on a warping path
+
+    Args:
+        template: Normalized template feature sequence (N x D)
+        test: Normalized test feature sequence (M x D)
+        path: Warping path (L x 2)
+        cost_fn: Local cost function returning a matrix for two frame sets
+        chunk: Path steps per local-cost evaluation
+
+    Returns:
+        Local cost per path step (L,)
+    """
+    costs = np.empty(len(path))
+    for s in range(0, len(path), chunk):
+        steps = path[s:s + chunk]
+        costs[s:s + chunk] = np.diag(cost_fn(template[steps[:, 0]], test[steps[:, 1]]))
+    return costs
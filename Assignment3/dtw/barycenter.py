@@ -0,0 +1,152 @@
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+def pairwise_distances(dtw, sequences: List[np.ndarray]) -> np.ndarray:
+    """
+    Symmetric DTW distance matrix of normalized sequences
+
+    Args:
+        dtw: DTW instance whose band and metric are used
+        sequences: Normalized feature sequences
+
+    Returns:
+        Distance matrix (n x n); pairs without an in-band path are inf
+    """
+    columns = [dtw.score_batch(sequences, test, normalized=True)[0] for test in sequences]
+    distances = np.stack(columns, axis=1)
+    return np.minimum(distances, distances.T)
+
+
+def k_medoids(distances: np.ndarray, k: int, max_iterations: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Partition items into k clusters around medoids, given their pairwise distances
+
+    Deterministic: the first medoid is the most central item and each
+    further one the item farthest from the medoids chosen so far. Items are
+    then reassigned to their nearest medoid and every medoid is replaced by
+    the member with the smallest total distance to its cluster, until
+    nothing changes.
+
+    Args:
+        distances: Pairwise distances (n x n)
+        k: Number of clusters (at most n)
+        max_iterations: Most assignment/update rounds
+
+    Returns:
+        Tuple of (medoid index per cluster (k,), cluster of each item (n,))
+    """
+    n = len(distances)
+    k = min(k, n)
+    # Out-of-band pairs count as very far rather than poisoning the sums
+    finite = np.isfinite(distances)
+    cap = distances[finite].max() * 2 + 1 if finite.any() else 1.0
+    distances = np.where(finite, distances, cap)
+
+    medoids = [int(np.argmin(distances.sum(axis=1)))]
+    while len(medoids) < k:
+        nearest = distances[:, medoids].min(axis=1)
+        nearest[medoids] = -1
+        medoids.append(int(np.argmax(nearest)))
+    medoids = np.array(medoids)
+
+    for _ in range(max_iterations):
+        assignment = np.argmin(distances[:, medoids], axis=1)
+        # Medoids stay in their own cluster even when tied with another
+        assignment[medoids] = np.arange(k)
+        updated = medoids.copy()
+        for c in range(k):
+            members = np.flatnonzero(assignment == c)
+            within = distances[np.ix_(members, members)].sum(axis=1)
+            updated[c] = members[np.argmin(within)]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+
+    assignment = np.argmin(distances[:, medoids], axis=1)
+    assignment[medoids] = np.arange(k)
+    return medoids, assignment
+
+
+def dba(dtw, sequences: List[np.ndarray], initial: np.ndarray, max_iterations: int = 10,
+        tol: float = 1e-4) -> np.ndarray:
+    """
+    DTW Barycenter Averaging of normalized sequences
+
+    Each round aligns every sequence to the current average and replaces
+    each average frame by the mean of the frames aligned to it. This keeps
+    the length of `initial` and lowers the total alignment cost.
+
+    Args:
+        dtw: DTW instance whose band and metric are used
+        sequences: Normalized feature sequences to average
+        initial: Starting average, usually the medoid of the sequences
+        max_iterations: Most averaging rounds
+        tol: Stop once a round lowers the total cost by less than this fraction
+
+    Returns:
+        Average sequence with the lowest total alignment cost found
+    """
+    average = np.array(initial, dtype=np.float64)
+    best, best_cost = average, np.inf
+    for _ in range(max_iterations):
+        sums = np.zeros_like(average)
+        counts = np.zeros(len(average))
+        cost = 0.0
+        for sequence in sequences:
+            path, step_costs, _ = dtw.align(average, sequence, normalized=True)
+            if len(path) == 0:
+                continue  # no in-band alignment; leave this sequence out of the round
+            np.add.at(sums, path[:, 0], sequence[path[:, 1]])
+            np.add.at(counts, path[:, 0], 1)
+            cost += float(step_costs.sum())
+
+        # `cost` is that of `average`; keep it if it is the best so far
+        improved = cost < best_cost * (1 - tol)
+        if cost < best_cost:
+            best, best_cost = average, cost
+        if not improved:
+            break
+        # Every frame lies on some path, but guard against sequences that were all skipped
+        covered = counts > 0
+        average = average.copy()
+        average[covered] = sums[covered] / counts[covered, np.newaxis]
+    return best
+
+
+def condense(dtw, sequences: List[np.ndarray], n_templates: int = 1, average: bool = True,
+             distances: Optional[np.ndarray] = None, max_iterations: int = 10) -> List[np.ndarray]:
+    """
+    Reduce one class's recordings to a few representative templates
+
+    The recordings are grouped into n_templates clusters with k-medoids on
+    their DTW distances. Each cluster is then represented by its medoid, or
+    by the DBA average started from the medoid.
+
+    Args:
+        dtw: DTW instance whose band and metric are used
+        sequences: Normalized feature sequences of one class
+        n_templates: Number of templates to produce
+        average: Whether to average each cluster with DBA (otherwise its medoid is used)
+        distances: Pairwise DTW distances of the sequences, if already known
+        max_iterations: Most DBA rounds per cluster
+
+    Returns:
+        Normalized templates, largest cluster first
+    """
+    if len(sequences) == 0:
+        return []
+    if distances is None:
+        distances = pairwise_distances(dtw, sequences)
+    medoids, assignment = k_medoids(distances, n_templates)
+
+    templates = []
+    sizes = np.bincount(assignment, minlength=len(medoids))
+    for c in np.argsort(-sizes, kind='stable'):
+        medoid = sequences[medoids[c]]
+        if average and sizes[c] > 1:
+            members = [sequences[i] for i in np.flatnonzero(assignment == c)]
+            templates.append(dba(dtw, members, medoid, max_iterations))
+        else:
+            templates.append(np.array(medoid, dtype=np.float64))
+    return templates
@@ -0,0 +1,172 @@
+import numpy as np
+from typing import Hashable, List, Optional, Tuple
+
+
+class FrameSynchronousDecoder:
+    def __init__(self, dtw, templates: List[np.ndarray], labels: Optional[List[Hashable]] = None,
+                 beam: float = np.inf, normalized: bool = False, use_time_sync: bool = False):
+        """
+        Time-synchronous DTW decoder that advances every template one test frame at a time
+
+        After each test frame, hypotheses (template, template frame) whose
+        accumulated cost is more than `beam` above the best active hypothesis
+        are dropped, and templates with no surviving hypothesis are removed
+        from the search. Work per frame therefore follows the number of
+        templates inside the beam rather than the size of the template set.
+
+        Args:
+            dtw: DTW instance providing normalization, band and local cost metric
+            templates: List of template feature sequences
+            labels: Class label of each template (default: template index)
+            beam: Pruning threshold relative to the best active hypothesis
+                (default: inf, i.e. no pruning)
+            normalized: Whether the templates are already normalized
+            use_time_sync: Whether to hold paths to the time-synchronous band
+                (at most one frame off the diagonal), as in DTW.recognize
+        """
+        if labels is None:
+            labels = list(range(len(templates)))
+        if len(labels) != len(templates):
+            raise ValueError(f"Got {len(labels)} labels for {len(templates)} templates")
+        if len(templates) == 0:
+            raise ValueError("FrameSynchronousDecoder needs at least one template")
+
+        self.dtw = dtw
+        self.labels = list(labels)
+        self.beam = beam
+        self.use_time_sync = use_time_sync
+
+        # Templates are normalized once and padded into a (B x N_max x D) block
+        templates_norm = [dtw.prepare_features(template, normalized) for template in templates]
+        self.lengths = np.array([len(template) for template in templates_norm])
+        N_max = int(self.lengths.max())
+        D = templates_norm[0].shape[1]
+        self._frames = np.zeros((len(templates_norm), N_max, D), dtype=dtw.dtype)
+        for b, template in enumerate(templates_norm):
+            self._frames[b, :len(template)] = template
+        self._flat = self._frames.reshape(-1, D)
+        self._valid = np.arange(1, N_max + 1)[np.newaxis, :] <= self.lengths[:, np.newaxis]
+
+        self.reset()
+
+    def reset(self, test_length: Optional[int] = None):
+        """
+        Start decoding a new test utterance
+
+        Args:
+            test_length: Total number of test frames when known in advance;
+                enables the same adaptive band as DTW.compute_distance (the
+                time-synchronous band needs no length)
+        """
+        B, N_max = self._valid.shape
+        # Column j of every template's accumulated cost matrix, starting at j = 0
+        self._cost = np.full((B, N_max + 1), np.inf, dtype=self.dtw.dtype)
+        self._cost[:, 0] = 0
+        self.active = np.arange(B)
+        self.n_frames = 0
+        self.cells_evaluated = 0
+        self.active_history: List[int] = []
+
+        if test_length is None:
+            self._bands = np.ones(B, dtype=np.int64) if self.use_time_sync else None
+        else:
+            self._bands = np.array([self.dtw.compute_adaptive_band(N, test_length) for N in self.lengths])
+            if self.use_time_sync:
+                self._bands = np.minimum(self._bands, 1)
+
+    def step(self, frame: np.ndarray):
+        """
+        Advance all active templates by one test frame
+
+        Args:
+            frame: Normalized test feature vector (39,)
+        """
+        with self.dtw.metrics.stage('dtw'):
+            self._step(frame)
+
+    def _step(self, frame: np.ndarray):
+        """Column update behind step()"""
+        self.n_frames += 1
+        j = self.n_frames
+        active = self.active
+        if len(active) == 0:
+            return
+
+        A, N_max = len(active), self._valid.shape[1]
+        prev = self._cost[active]
+
+        rows = np.arange(1, N_max + 1)
+        inside = self._valid[active]
+        if self._bands is not None:
+            inside = inside & (np.abs(rows[np.newaxis, :] - j) <= self._bands[active, np.newaxis])
+        # Rows below the lowest surviving hypothesis of the previous frame are unreachable
+        first_live = np.argmax(np.isfinite(prev), axis=1)
+        inside = inside & (rows[np.newaxis, :] >= np.maximum(first_live, 1)[:, np.newaxis])
+
+        # Local costs only for the cells that can still be reached
+        local = np.zeros((A, N_max), dtype=self.dtw.dtype)
+        cell_b, cell_i = np.nonzero(inside)
+        if len(cell_b):
+            local[cell_b, cell_i] = self.dtw.local_cost(
+                self._flat[active[cell_b] * N_max + cell_i], frame[np.newaxis, :]
+            )[:, 0]
+
+        # C[i, j] = d_i + min(C[i-1, j], C[i, j-1], C[i-1, j-1]). With
+        # a_i = d_i + min(C[i, j-1], C[i-1, j-1]) and S_i = d_1 + ... + d_i this is
+        # C[i, j] = S_i + min_{k <= i} (a_k - S_k), a running minimum along the column.
+        entry = np.where(inside, local + np.minimum(prev[:, 1:], prev[:, :-1]), np.inf)
+        cumulative = np.cumsum(local, axis=1)
+        column = cumulative + np.minimum.accumulate(entry - cumulative, axis=1)
+        column[~inside] = np.inf
+        self.cells_evaluated += len(cell_b)
+        self.dtw.metrics.add('cells', len(cell_b))
+
+        # Global beam relative to the best active hypothesis
+        best = column.min()
+        if np.isfinite(best) and np.isfinite(self.beam):
+            column[column > best + self.beam] = np.inf
+
+        self._cost[active, 0] = np.inf
+        self._cost[active, 1:] = column
+        self.active = active[np.isfinite(column).any(axis=1)]
+        self.active_history.append(len(self.active))
+
+    def scores(self) -> np.ndarray:
+        """
+        Accumulated cost of each template ending at the current test frame
+
+        Returns:
+            Distance per template (inf for templates pruned or not yet finished)
+        """
+        return self._cost[np.arange(len(self.lengths)), self.lengths]
+
+    def best(self) -> Tuple[int, float]:
+        """
+        Best complete match so far
+
+        Returns:
+            Tuple of (template_index, distance); (-1, inf) when nothing matched
+        """
+        scores = self.scores()
+        idx = int(np.argmin(scores))
+        if not np.isfinite(scores[idx]):
+            return -1, float('inf')
+        return idx, float(scores[idx])
+
+    def decode(self, test: np.ndarray, normalized: bool = False) -> Tuple[int, float]:
+        """
+        Decode a complete test utterance frame by frame
+
+        Args:
+            test: Test feature sequence (M x 39)
+            normalized: Whether the test sequence is already normalized
+
+        Returns:
+            Tuple of (template_index, distance)
+        """
+        test_norm = self.dtw.prepare_features(test, normalized)
+        self.reset(test_length=len(test_norm))
+        for frame in test_norm:
+            self.step(frame)
+        self.dtw.metrics.add('full_cells', int(self.lengths.sum()) * len(test_norm))
+        return self.best()
@@ -0,0 +1,83 @@
+import numpy as np
+from typing import Tuple
+from scipy.ndimage import maximum_filter1d, minimum_filter1d
+
+# Metrics whose per-frame cost is bounded by the distance to a per-dimension
+# envelope; LB_Keogh is only valid for these
+KEOGH_METRICS = ('euclidean', 'sqeuclidean', 'cityblock', 'l1')
+
+
+def lb_kim(template: np.ndarray, test: np.ndarray, dist_fn) -> float:
+    """
+    LB_Kim lower bound: cost of the first and last cells every path must visit
+
+    Args:
+        template: Normalized template feature sequence (N x D)
+        test: Normalized test feature sequence (M x D)
+        dist_fn: Local cost function returning a matrix for two frame sets
+
+    Returns:
+        Lower bound on the DTW distance
+    """
+    if len(template) == 1 and len(test) == 1:
+        return float(dist_fn(template, test)[0, 0])
+    corners = dist_fn(template[[0, -1]], test[[0, -1]])
+    return float(corners[0, 0] + corners[1, 1])
+
+
+def keogh_envelope(template: np.ndarray, n_test: int, band: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Upper/lower envelope of the template frames each test frame may align with
+
+    Test frame j can only be matched to template frames i with |i - j| <= band,
+    the same band the DTW recurrence uses.
+
+    Args:
+        template: Normalized template feature sequence (N x D)
+        n_test: Number of test frames M
+        band: Band half-width in frames
+
+    Returns:
+        Tuple of (upper envelope (M x D), lower envelope (M x D),
+        mask of test frames with at least one reachable template frame (M,))
+    """
+    N = len(template)
+    size = 2 * band + 1
+    # Edge replication never changes a max/min over a clipped window
+    padded = template if n_test <= N else np.pad(template, ((0, n_test - N), (0, 0)), mode='edge')
+    upper = maximum_filter1d(padded, size=size, axis=0, mode='nearest')[:n_test]
+    lower = minimum_filter1d(padded, size=size, axis=0, mode='nearest')[:n_test]
+    reachable = np.arange(n_test) - band <= N - 1
+    return upper, lower, reachable
+
+
+def lb_keogh(template: np.ndarray, test: np.ndarray, band: int, metric: str = 'euclidean') -> float:
+    """
+    LB_Keogh lower bound: distance from each test frame to the template envelope
+
+    Every test frame lies on the warping path at least once, and its local
+    cost there is at least its distance to the envelope of the template
+    frames inside the band.
+
+    Args:
+        template: Normalized template feature sequence (N x D)
+        test: Normalized test feature sequence (M x D)
+        band: Band half-width in frames
+        metric: Local cost metric, one of KEOGH_METRICS
+
+    Returns:
+        Lower bound on the DTW distance (0 for metrics without a Keogh bound)
+    """
+    if metric not in KEOGH_METRICS:
+        return 0.0
+
+    upper, lower, reachable = keogh_envelope(template, len(test), band)
+    if not reachable.all():
+        return float('inf')
+
+    excess = np.maximum(test - upper, 0) + np.maximum(lower - test, 0)
+    if metric == 'euclidean':
+        return float(np.sqrt(np.einsum('ij,ij->i', excess, excess)).sum())
+    if metric == 'sqeuclidean':
+        return float(np.einsum('ij,ij->', excess, excess))
+    return float(excess.sum())
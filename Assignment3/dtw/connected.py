@@ -0,0 +1,246 @@
+import numpy as np
+from typing import Hashable, List, Optional, Tuple
+from dtw.kernels import HAVE_NUMBA, as_cost_array
+
+if HAVE_NUMBA:
+    from numba import njit
+
+
+def _connected_loop(local: np.ndarray, lengths: np.ndarray, levels: int, one_pass: bool,
+                    word_penalty: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cell-by-cell connected-word recurrence; see ConnectedWordDecoder._forward"""
+    M, B, N_max = local.shape
+    ends = np.full((levels, M), np.inf, dtype=local.dtype)
+    end_templates = np.zeros((levels, M), dtype=np.int64)
+    end_starts = np.zeros((levels, M), dtype=np.int64)
+    cost = np.full((levels, B, N_max), np.inf, dtype=local.dtype)
+    starts = np.zeros((levels, B, N_max), dtype=np.int64)
+
+    for j in range(M):
+        for l in range(levels):
+            if j == 0:
+                entry = 0.0 if l == 0 else np.inf
+            elif one_pass:
+                entry = ends[0, j - 1] + word_penalty
+            else:
+                entry = ends[l - 1, j - 1] + word_penalty if l > 0 else np.inf
+            for b in range(B):
+                # Diagonal predecessor of row 0 is the word entry; vertical starts out unreachable
+                diagonal, diagonal_start = entry, j
+                vertical, vertical_start = np.inf, 0
+                for i in range(lengths[b]):
+                    horizontal, horizontal_start = cost[l, b, i], starts[l, b, i]
+                    best, best_start = horizontal, horizontal_start
+                    if diagonal < best:
+                        best, best_start = diagonal, diagonal_start
+                    if vertical < best:
+                        best, best_start = vertical, vertical_start
+                    value = local[j, b, i] + best
+                    diagonal, diagonal_start = horizontal, horizontal_start
+                    cost[l, b, i], starts[l, b, i] = value, best_start
+                    vertical, vertical_start = value, best_start
+                last = lengths[b] - 1
+                if cost[l, b, last] < ends[l, j]:
+                    ends[l, j] = cost[l, b, last]
+                    end_templates[l, j] = b
+                    end_starts[l, j] = starts[l, b, last]
+    return ends, end_templates, end_starts
+
+
+if HAVE_NUMBA:
+    _connected_loop = njit(cache=True)(_connected_loop)
+
+
+class ConnectedWordDecoder:
+    def __init__(self, dtw, templates: List[np.ndarray], labels: Optional[List[Hashable]] = None,
+                 word_penalty: float = 0.0, max_words: Optional[int] = None, normalized: bool = False):
+        """
+        One-pass connected-word DTW over a sequence of words spoken without pauses
+
+        Every template is matched against the test with the usual DTW steps
+        (diagonal, horizontal, vertical). In addition, the first frame of any
+        template may follow the last frame of the best template that ended
+        at the previous test frame, at a cost of `word_penalty`. A single
+        left-to-right pass over the test frames thus finds the best string of
+        words and its segmentation, in O(test_frames x total_template_frames)
+        instead of trying every segmentation.
+
+        With max_words set, hypotheses are kept apart by how many words they
+        contain (level building): level l only starts words after words that
+        ended on level l - 1. This bounds the string length at the price of
+        max_words times the work of the unbounded search.
+
+        There is no global band: where each word starts in the test is not
+        known in advance.
+
+        Args:
+            dtw: DTW instance providing normalization and the local cost metric
+            templates: List of template feature sequences
+            labels: Class label of each template (default: template index)
+            word_penalty: Cost added for each word after the first; larger
+                values favour fewer, longer words
+            max_words: Most words in a decoded string (default: unbounded)
+            normalized: Whether the templates are already normalized
+        """
+        if labels is None:
+            labels = list(range(len(templates)))
+        if len(labels) != len(templates):
+            raise ValueError(f"Got {len(labels)} labels for {len(templates)} templates")
+        if len(templates) == 0:
+            raise ValueError("ConnectedWordDecoder needs at least one template")
+        if max_words is not None and max_words < 1:
+            raise ValueError(f"max_words must be at least 1, got {max_words}")
+
+        self.dtw = dtw
+        self.labels = list(labels)
+        self.word_penalty = word_penalty
+        self.max_words = max_words
+
+        # Templates are normalized once; costs are kept in a padded (B x N_max) layout
+        self._templates = [dtw.prepare_features(template, normalized) for template in templates]
+        self.lengths = np.array([len(template) for template in self._templates])
+        N_max = int(self.lengths.max())
+        self._valid = np.arange(N_max)[np.newaxis, :] < self.lengths[:, np.newaxis]
+        self._frames = np.concatenate(self._templates)
+
+    def _local_costs(self, test_norm: np.ndarray) -> np.ndarray:
+        """Local cost of every template frame against every test frame, padded to (M x B x N_max)"""
+        local = self.dtw.packed_local_cost(self._frames, self.lengths, test_norm)
+        padded = np.zeros((len(test_norm),) + self._valid.shape, dtype=local.dtype)
+        padded[:, self._valid] = local.T
+        return padded
+
+    def decode(self, test: np.ndarray,
+               normalized: bool = False) -> Tuple[List[Hashable], float, List[Tuple[int, int, int]]]:
+        """
+        Decode a word string in one pass over the test frames
+
+        Args:
+            test: Test feature sequence (M x 39)
+            normalized: Whether the test sequence is already normalized
+
+        Returns:
+            Tuple of (recognized labels in order, total cost including word
+            penalties, segments as (template index, first test frame, last
+            test frame) per word); ([], inf, []) for an empty test
+        """
+        test_norm = self.dtw.prepare_features(test, normalized)
+        M = len(test_norm)
+        if M == 0:
+            return [], float('inf'), []
+
+        with self.dtw.metrics.stage('dtw'):
+            ends, end_templates, end_starts = self._forward(test_norm)
+
+        # Fewest words wins ties
+        level = int(np.argmin(ends[:, M - 1]))
+        total = float(ends[level, M - 1])
+        if not np.isfinite(total):
+            return [], float('inf'), []
+
+        # Each word started right after the best word end one level down (or on the same level)
+        segments = []
+        j = M - 1
+        while j >= 0:
+            b, start = int(end_templates[level, j]), int(end_starts[level, j])
+            segments.append((b, start, j))
+            j = start - 1
+            if self.max_words is not None:
+                level -= 1
+        segments.reverse()
+        return [self.labels[b] for b, _, _ in segments], total, segments
+
+    def _forward(self, test_norm: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Column-by-column recurrence behind decode(), compiled with numba when available
+
+        Returns:
+            Tuple of (best word-end cost per level and test frame (L x M),
+            template of that word end (L x M), test frame where that word
+            started (L x M))
+        """
+        M = len(test_norm)
+        L = self.max_words if self.max_words is not None else 1
+        local = self._local_costs(test_norm)
+        cells = L * int(self.lengths.sum()) * M
+        self.dtw.metrics.add('cells', cells)
+        self.dtw.metrics.add('full_cells', cells)
+        if HAVE_NUMBA:
+            return _connected_loop(as_cost_array(local), self.lengths.astype(np.int64), L,
+                                   self.max_words is None, float(self.word_penalty))
+        return self._forward_vectorized(local, L)
+
+    def _forward_vectorized(self, local: np.ndarray, L: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """NumPy version of the recurrence, one test frame per step"""
+        M = len(local)
+        B, N_max = self._valid.shape
+        dtype = local.dtype
+        last = self.lengths - 1
+        rows = np.arange(N_max)
+
+        ends = np.full((L, M), np.inf, dtype=dtype)
+        end_templates = np.zeros((L, M), dtype=np.int64)
+        end_starts = np.zeros((L, M), dtype=np.int64)
+
+        # Accumulated cost and word start of every (level, template, template frame) at the previous test frame
+        cost = np.full((L, B, N_max), np.inf, dtype=dtype)
+        starts = np.zeros((L, B, N_max), dtype=np.int64)
+
+        for j in range(M):
+            # Cost of starting a word at this frame on each level
+            entry = np.full(L, np.inf, dtype=dtype)
+            if j == 0:
+                entry[0] = 0
+            elif self.max_words is None:
+                entry[0] = ends[0, j - 1] + self.word_penalty
+            else:
+                entry[1:] = ends[:-1, j - 1] + self.word_penalty
+
+            # Diagonal predecessors; the first template frame is preceded by the word entry
+            diagonal = np.empty_like(cost)
+            diagonal[:, :, 0] = entry[:, np.newaxis]
+            diagonal[:, :, 1:] = cost[:, :, :-1]
+            diagonal_starts = np.empty_like(starts)
+            diagonal_starts[:, :, 0] = j
+            diagonal_starts[:, :, 1:] = starts[:, :, :-1]
+
+            # Same running-minimum form of the vertical step as FrameSynchronousDecoder:
+            # C[i] = S_i + min_{k <= i} (a_k - S_k) with a_k = d_k + min(horizontal, diagonal)
+            d = local[j]
+            horizontal = cost <= diagonal
+            entry_cost = np.where(self._valid, d + np.minimum(cost, diagonal), np.inf)
+            entry_starts = np.where(horizontal, starts, diagonal_starts)
+            cumulative = np.cumsum(d, axis=1)
+            shifted = entry_cost - cumulative
+            running = np.minimum.accumulate(shifted, axis=2)
+            # The latest k where the running minimum was attained is where the path entered the column
+            attained = np.maximum.accumulate(np.where(shifted == running, rows, 0), axis=2)
+            cost = np.where(self._valid, cumulative + running, np.inf)
+            starts = np.take_along_axis(entry_starts, attained, axis=2)
+
+            # Best word ending at this frame on each level
+            word_ends = cost[:, np.arange(B), last]
+            best = np.argmin(word_ends, axis=1)
+            ends[:, j] = word_ends[np.arange(L), best]
+            end_templates[:, j] = best
+            end_starts[:, j] = starts[np.arange(L), best, last[best]]
+        return ends, end_templates, end_starts
+
+
+def word_errors(reference: List[Hashable], hypothesis: List[Hashable]) -> int:
+    """
+    Substitutions, insertions and deletions turning one word string into another
+
+    Args:
+        reference: Words actually spoken
+        hypothesis: Words recognized
+
+    Returns:
+        Levenshtein distance between the two strings
+    """
+    row = np.arange(len(hypothesis) + 1)
+    for i, word in enumerate(reference, 1):
+        diagonal, row[0] = row[0], i
+        for j, recognized in enumerate(hypothesis, 1):
+            diagonal, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, diagonal + (word != recognized))
+    return int(row[-1])
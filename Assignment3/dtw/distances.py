@@ -0,0 +1,151 @@
+import numpy as np
+from typing import Callable, Dict, Optional
+from scipy.spatial.distance import cdist
+
+
+def _row_sq_norms(x: np.ndarray) -> np.ndarray:
+    """Squared Euclidean norm of every row"""
+    return np.einsum('ij,ij->i', x, x)
+
+
+def sq_euclidean_matrix(template: np.ndarray, test: np.ndarray) -> np.ndarray:
+    """
+    Pairwise squared Euclidean distances via ||a||^2 + ||b||^2 - 2ab
+
+    Args:
+        template: Template feature sequence (N x D)
+        test: Test feature sequence (M x D)
+
+    Returns:
+        Squared distance matrix (N x M)
+    """
+    dist = template @ test.T
+    dist *= -2
+    dist += _row_sq_norms(template)[:, np.newaxis]
+    dist += _row_sq_norms(test)[np.newaxis, :]
+    # Cancellation can leave tiny negative values for near-identical frames
+    np.maximum(dist, 0, out=dist)
+    return dist
+
+
+def euclidean_matrix(template: np.ndarray, test: np.ndarray) -> np.ndarray:
+    """Pairwise Euclidean distances (N x M)"""
+    return np.sqrt(sq_euclidean_matrix(template, test))
+
+
+def cosine_matrix(template: np.ndarray, test: np.ndarray) -> np.ndarray:
+    """Pairwise cosine distances, 1 - cos(a, b) (N x M)"""
+    dist = template @ test.T
+    dist /= np.sqrt(_row_sq_norms(template))[:, np.newaxis] + 1e-8
+    dist /= np.sqrt(_row_sq_norms(test))[np.newaxis, :] + 1e-8
+    return 1.0 - dist
+
+
+def cityblock_matrix(template: np.ndarray, test: np.ndarray) -> np.ndarray:
+    """Pairwise L1 (city block) distances (N x M)"""
+    return cdist(template, test, metric='cityblock').astype(template.dtype, copy=False)
+
+
+def mahalanobis_matrix(template: np.ndarray, test: np.ndarray,
+                       variance: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Pairwise diagonal-covariance Mahalanobis distances
+
+    Args:
+        template: Template feature sequence (N x D)
+        test: Test feature sequence (M x D)
+        variance: Per-dimension variance (D,); estimated from both
+            sequences when not given
+
+    Returns:
+        Distance matrix (N x M)
+    """
+    if variance is None:
+        variance = np.var(np.vstack((template, test)), axis=0)
+    scale = (1.0 / np.sqrt(np.asarray(variance) + 1e-8)).astype(template.dtype)
+    return euclidean_matrix(template * scale, test * scale)
+
+
+METRICS: Dict[str, Callable[..., np.ndarray]] = {
+    'euclidean': euclidean_matrix,
+    'sqeuclidean': sq_euclidean_matrix,
+    'cosine': cosine_matrix,
+    'cityblock': cityblock_matrix,
+    'l1': cityblock_matrix,
+    'mahalanobis': mahalanobis_matrix,
+}
+
+
+def local_cost_matrix(template: np.ndarray, test: np.ndarray, metric: str = 'euclidean',
+                      variance: Optional[np.ndarray] = None, dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    Frame-to-frame local cost between two feature sequences in one pass
+
+    Args:
+        template: Template feature sequence (N x D)
+        test: Test feature sequence (M x D)
+        metric: One of METRICS
+        variance: Per-dimension variance for 'mahalanobis'
+        dtype: Precision of the computation and result (float32 or float64)
+
+    Returns:
+        Local cost matrix (N x M); entry [i, j] is the cost of aligning
+        template frame i with test frame j
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown distance metric: {metric!r} (expected one of {sorted(METRICS)})")
+    template = np.asarray(template, dtype=dtype)
+    test = np.asarray(test, dtype=dtype)
+    if metric == 'mahalanobis':
+        return mahalanobis_matrix(template, test, variance)
+    return METRICS[metric](template, test)
+
+
+def banded_local_cost(template: np.ndarray, test: np.ndarray, band: int, metric: str = 'euclidean',
+                      variance: Optional[np.ndarray] = None, block: int = 64,
+                      dtype: np.dtype = np.float64) -> np.ndarray:
+    """
+    Local costs of the cells inside the band only, packed row by row
+
+    Rows of the template are processed in blocks, each block costing one
+    small matrix product against the test frames its band can reach, so
+    the dense N x M matrix is never built.
+
+    Args:
+        template: Template feature sequence (N x D)
+        test: Test feature sequence (M x D)
+        band: Band half-width in frames (clamped to max(N, M) - 1)
+        metric: One of METRICS
+        variance: Per-dimension variance for 'mahalanobis'
+        block: Template rows per matrix product
+        dtype: Precision of the computation and result (float32 or float64)
+
+    Returns:
+        Packed local costs (N x (2 * band + 1)); entry [i, k] is the cost of
+        template frame i against test frame i - band + k, inf outside the matrix
+    """
+    template = np.asarray(template, dtype=dtype)
+    test = np.asarray(test, dtype=dtype)
+    N, M = len(template), len(test)
+    band = min(band, max(N, M) - 1)
+    width = 2 * band + 1
+    packed = np.full((N, width), np.inf, dtype=dtype)
+
+    # Blocks must share one variance estimate to match the dense matrix
+    if metric == 'mahalanobis' and variance is None:
+        variance = np.var(np.vstack((template, test)), axis=0)
+
+    for r0 in range(0, N, block):
+        r1 = min(N, r0 + block)
+        c0 = max(0, r0 - band)
+        c1 = min(M, r1 + band)
+        if c0 >= c1:
+            continue
+
+        sub = local_cost_matrix(template[r0:r1], test[c0:c1], metric, variance, dtype)
+        rows = np.arange(r0, r1)[:, np.newaxis]
+        k = np.arange(c0, c1)[np.newaxis, :] - rows + band
+        inside = (k >= 0) & (k < width)
+        packed[np.broadcast_to(rows, inside.shape)[inside], k[inside]] = sub[inside]
+
+    return packed
@@ -1,18 +1,76 @@
+import logging
 import numpy as np
-from typing import Tuple, List, Optional
+from typing import Any, Tuple, List, Optional, Dict, Hashable
 import matplotlib.pyplot as plt
+from dtw.kernels import get_kernel, get_batch_kernel, get_linear_kernel, get_window_kernel
+from dtw.distances import METRICS, local_cost_matrix, banded_local_cost
+from dtw.bounds import lb_kim, lb_keogh
+from dtw.beam import FrameSynchronousDecoder
+from dtw.connected import ConnectedWordDecoder
+from dtw.alignment import hirschberg_path, path_costs
+from dtw.multiscale import multiscale_dtw
+from dtw.templates import utterance_cmvn
+from metrics import Metrics, NO_METRICS
+
+_log = logging.getLogger(__name__)
 
 class DTW:
-    def __init__(self, band_ratio: float = 0.2, alpha: float = 0.15):
+    def __init__(self, band_ratio: float = 0.2, alpha: float = 0.15, engine: str = 'auto',
+                 metric: str = 'euclidean', variance: Optional[np.ndarray] = None,
+                 metrics: Optional[Metrics] = None, radius: Optional[int] = None,
+                 dtype: str = 'float64'):
         """
         Initialize DTW with adaptive band pruning
         
         Args:
             band_ratio: Base band ratio for pruning (default: 0.2)
             alpha: Adaptive bandwidth factor (default: 0.15)
+            engine: Recurrence kernel - 'loop' (reference per-cell loop),
+                'wavefront' (NumPy anti-diagonal), 'numba' (compiled) or
+                'auto' (numba when installed, otherwise wavefront)
+            metric: Frame distance - 'euclidean', 'sqeuclidean', 'cosine',
+                'cityblock' (L1) or 'mahalanobis' (diagonal covariance)
+            variance: Per-dimension variance for the Mahalanobis metric
+                (default: estimated from each compared pair)
+            metrics: Collector for normalization/DTW time, cell and pruning
+                counters (default: disabled)
+            radius: Refinement radius of the coarse-to-fine (FastDTW) mode,
+                which approximates the banded distance in O((N + M) * radius)
+                cells; None (default) for exact banded DTW
+            dtype: Precision of local and accumulated costs - 'float64'
+                (default) or 'float32', which halves memory traffic
         """
         self.band_ratio = band_ratio
         self.alpha = alpha
+        self.engine = engine
+        self._kernel = get_kernel(engine)
+        self._batch_kernel = get_batch_kernel(engine)
+        self._linear_kernel = get_linear_kernel(engine)
+        self._window_kernel = get_window_kernel(engine)
+        if radius is not None and radius < 0:
+            raise ValueError(f"Coarse-to-fine radius must be non-negative, got {radius}")
+        self.radius = radius
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError(f"DTW costs must be float32 or float64, got {dtype!r}")
+        self.dtype = np.dtype(dtype)
+        if metric not in METRICS:
+            raise ValueError(f"Unknown distance metric: {metric!r} (expected one of {sorted(METRICS)})")
+        self.metric = metric
+        self.variance = variance
+        self.metrics = metrics if metrics is not None else NO_METRICS
+        self.reset_prune_stats()
+    
+    def config(self) -> Dict[str, Any]:
+        """Constructor arguments that recreate an equivalent DTW instance (without the metrics collector)"""
+        return {
+            'band_ratio': self.band_ratio,
+            'alpha': self.alpha,
+            'engine': self.engine,
+            'metric': self.metric,
+            'variance': self.variance,
+            'radius': self.radius,
+            'dtype': self.dtype.name,
+        }
         
     def normalize_features(self, features: np.ndarray) -> np.ndarray:
         """
@@ -25,7 +83,14 @@ class DTW:
             Normalized feature sequence
         """
         # Normalize each feature dimension
-        return (features - np.mean(features, axis=0)) / (np.std(features, axis=0) + 1e-8)
+        return utterance_cmvn(features).astype(self.dtype, copy=False)
+    
+    def prepare_features(self, features: np.ndarray, normalized: bool) -> np.ndarray:
+        """Normalize a sequence unless the caller already did (e.g. via a TemplateStore)"""
+        if normalized:
+            return np.asarray(features, dtype=self.dtype)
+        with self.metrics.stage('normalize'):
+            return self.normalize_features(features)
         
     def compute_adaptive_band(self, len1: int, len2: int) -> int:
         """
@@ -47,7 +112,118 @@ class DTW:
         # Use the larger of the two bands
         return max(base_band, adaptive_band)
         
-    def compute_distance(self, template: np.ndarray, test: np.ndarray, plot_matrix: bool = False) -> Tuple[float, np.ndarray]:
+    def local_cost(self, template_norm: np.ndarray, test_norm: np.ndarray) -> np.ndarray:
+        """
+        Compute the frame-to-frame local cost matrix with the configured metric
+        
+        Args:
+            template_norm: Normalized template feature sequence (N x 39)
+            test_norm: Normalized test feature sequence (M x 39)
+            
+        Returns:
+            Local cost matrix (N x M)
+        """
+        return local_cost_matrix(template_norm, test_norm, self.metric, self.variance, self.dtype)
+        
+    def banded_local_cost(self, template_norm: np.ndarray, test_norm: np.ndarray, band: int) -> np.ndarray:
+        """
+        Compute local costs for the cells inside the band only
+        
+        Args:
+            template_norm: Normalized template feature sequence (N x 39)
+            test_norm: Normalized test feature sequence (M x 39)
+            band: Band width in frames
+            
+        Returns:
+            Band-packed local costs (N x (2 * band + 1))
+        """
+        return banded_local_cost(template_norm, test_norm, band, self.metric, self.variance, dtype=self.dtype)
+    
+    def packed_local_cost(self, packed: np.ndarray, lengths: np.ndarray, test_norm: np.ndarray) -> np.ndarray:
+        """
+        Compute the local costs of ragged-packed templates against one test sequence
+        
+        All templates share one matrix product. An estimated Mahalanobis
+        variance belongs to a single template-test pair, as in
+        compute_distance(), so that metric is computed template by template.
+        
+        Args:
+            packed: Normalized templates stacked row-wise (sum(lengths) x 39)
+            lengths: Number of frames of each template
+            test_norm: Normalized test feature sequence (M x 39)
+            
+        Returns:
+            Local costs, stacked the same way (sum(lengths) x M)
+        """
+        if self.metric == 'mahalanobis' and self.variance is None:
+            templates = np.split(packed, np.cumsum(lengths)[:-1])
+            return np.vstack([self._cost_fn(template, test_norm)(template, test_norm) for template in templates])
+        return self.local_cost(packed, test_norm)
+    
+    def _cost_fn(self, template_norm: np.ndarray, test_norm: np.ndarray):
+        """Local cost function for sub-blocks of one pair, sharing one Mahalanobis variance"""
+        variance = self.variance
+        if self.metric == 'mahalanobis' and variance is None:
+            variance = np.var(np.vstack((template_norm, test_norm)), axis=0)
+        return lambda a, b: local_cost_matrix(a, b, self.metric, variance, self.dtype)
+    
+    def multiscale_dtw(self, template_norm: np.ndarray, test_norm: np.ndarray, band: int,
+                       radius: Optional[int] = None, return_path: bool = True) -> Tuple[float, np.ndarray, int]:
+        """
+        Approximate banded DTW by coarse-to-fine refinement
+        
+        See dtw.multiscale.multiscale_dtw; the distance is never below the
+        exact banded one.
+        
+        Args:
+            template_norm: Normalized template feature sequence (N x 39)
+            test_norm: Normalized test feature sequence (M x 39)
+            band: Band width in frames
+            radius: Refinement radius (default: self.radius)
+            return_path: Whether to trace the warping path (empty otherwise)
+            
+        Returns:
+            Tuple of (distance, warping path (L x 2), cells evaluated)
+        """
+        radius = self.radius if radius is None else radius
+        with self.metrics.stage('dtw'):
+            result = multiscale_dtw(template_norm, test_norm, band, radius,
+                                    self._cost_fn(template_norm, test_norm), self._window_kernel,
+                                    return_path=return_path)
+        self.metrics.count_dtw(len(template_norm), len(test_norm), band, cells=result[2])
+        return result
+        
+    def _banded_dtw(self, template_norm: np.ndarray, test_norm: np.ndarray, band: int,
+                    build_matrix: bool) -> Tuple[float, Optional[np.ndarray]]:
+        """
+        Run the banded recurrence, densely or in linear memory
+        
+        Args:
+            template_norm: Normalized template feature sequence (N x 39)
+            test_norm: Normalized test feature sequence (M x 39)
+            band: Band width in frames
+            build_matrix: Whether to build the full accumulated cost matrix
+            
+        Returns:
+            Tuple of (distance, accumulated cost matrix or None)
+        """
+        N, M = len(template_norm), len(test_norm)
+        if not build_matrix and self.radius is not None:
+            return self.multiscale_dtw(template_norm, test_norm, band, return_path=False)[0], None
+        
+        self.metrics.count_dtw(N, M, band)
+        with self.metrics.stage('dtw'):
+            if build_matrix:
+                # Local costs for every frame pair in one pass, then the banded recurrence
+                cost_matrix = self._kernel(self.local_cost(template_norm, test_norm), band)
+                return cost_matrix[N, M], cost_matrix
+            
+            # Distance only: band-packed local costs and two rolling rows
+            packed = self.banded_local_cost(template_norm, test_norm, band)
+            return self._linear_kernel(packed, M, np.inf), None
+        
+    def compute_distance(self, template: np.ndarray, test: np.ndarray, plot_matrix: bool = False,
+                         return_matrix: bool = False, normalized: bool = False) -> Tuple[float, Optional[np.ndarray]]:
         """
         Compute DTW distance between template and test sequences with adaptive pruning
         
@@ -55,45 +231,33 @@ class DTW:
             template: Template feature sequence (N x 39)
             test: Test feature sequence (M x 39)
             plot_matrix: Whether to plot the cost matrix
+            return_matrix: Whether to build and return the accumulated cost
+                matrix; otherwise the distance is computed in linear memory
+            normalized: Whether both sequences are already normalized
             
         Returns:
-            Tuple of (distance, accumulated cost matrix)
+            Tuple of (distance, accumulated cost matrix or None when it was not built)
         """
-        # Normalize features
-        template_norm = self.normalize_features(template)
-        test_norm = self.normalize_features(test)
+        # Normalize features unless the caller already did
+        template_norm = self.prepare_features(template, normalized)
+        test_norm = self.prepare_features(test, normalized)
         
         N, M = len(template_norm), len(test_norm)
-        cost_matrix = np.full((N + 1, M + 1), np.inf)
-        cost_matrix[0, 0] = 0
         
         # Compute adaptive band width
         band = self.compute_adaptive_band(N, M)
         
-        # Compute cost matrix with adaptive band
-        for i in range(1, N + 1):
-            # Calculate valid j range based on adaptive band
-            j_start = max(1, i - band)
-            j_end = min(M + 1, i + band + 1)
-            
-            for j in range(j_start, j_end):
-                # Compute Euclidean distance between normalized feature vectors
-                dist = np.linalg.norm(template_norm[i-1] - test_norm[j-1])
-                
-                # Update cost matrix
-                cost_matrix[i, j] = dist + min(
-                    cost_matrix[i-1, j],    # insertion
-                    cost_matrix[i, j-1],    # deletion
-                    cost_matrix[i-1, j-1]   # match
-                )
+        # Banded recurrence; the full matrix is only built when needed
+        distance, cost_matrix = self._banded_dtw(template_norm, test_norm, band, plot_matrix or return_matrix)
         
         # Plot cost matrix if requested
         if plot_matrix:
             self.plot_cost_matrix(cost_matrix, "DTW Cost Matrix")
         
-        return cost_matrix[N, M], cost_matrix
+        return distance, cost_matrix
     
-    def time_synchronous_dtw(self, template: np.ndarray, test: np.ndarray, plot_matrix: bool = False) -> Tuple[float, np.ndarray]:
+    def time_synchronous_dtw(self, template: np.ndarray, test: np.ndarray, plot_matrix: bool = False,
+                             return_matrix: bool = False, normalized: bool = False) -> Tuple[float, Optional[np.ndarray]]:
         """
         Compute time-synchronous DTW distance with adaptive pruning
         
@@ -101,40 +265,67 @@ class DTW:
             template: Template feature sequence (N x 39)
             test: Test feature sequence (M x 39)
             plot_matrix: Whether to plot the cost matrix
+            return_matrix: Whether to build and return the accumulated cost
+                matrix; otherwise the distance is computed in linear memory
+            normalized: Whether both sequences are already normalized
             
         Returns:
-            Tuple of (distance, accumulated cost matrix)
+            Tuple of (distance, accumulated cost matrix or None when it was not built)
         """
-        # Normalize features
-        template_norm = self.normalize_features(template)
-        test_norm = self.normalize_features(test)
+        # Normalize features unless the caller already did
+        template_norm = self.prepare_features(template, normalized)
+        test_norm = self.prepare_features(test, normalized)
         
         N, M = len(template_norm), len(test_norm)
-        cost_matrix = np.full((N + 1, M + 1), np.inf)
-        cost_matrix[0, 0] = 0
         
         # Compute adaptive band width
         band = self.compute_adaptive_band(N, M)
         
-        # Compute cost matrix with time-sync constraints and adaptive band
-        for i in range(1, N + 1):
-            # Calculate valid j range based on band and time-sync constraints
-            j_start = max(1, max(i - 1, i - band))
-            j_end = min(M + 1, min(i + 2, i + band + 1))
-            
-            for j in range(j_start, j_end):
-                dist = np.linalg.norm(template_norm[i-1] - test_norm[j-1])
-                cost_matrix[i, j] = dist + min(
-                    cost_matrix[i-1, j],    # insertion
-                    cost_matrix[i, j-1],    # deletion
-                    cost_matrix[i-1, j-1]   # match
-                )
+        # Time-sync constraint keeps j within i +/- 1, intersected with the band
+        distance, cost_matrix = self._banded_dtw(template_norm, test_norm, min(band, 1), plot_matrix or return_matrix)
         
         # Plot cost matrix if requested
         if plot_matrix:
             self.plot_cost_matrix(cost_matrix, "Time-Synchronous DTW Cost Matrix")
         
-        return cost_matrix[N, M], cost_matrix
+        return distance, cost_matrix
+    
+    def align(self, template: np.ndarray, test: np.ndarray,
+              use_time_sync: bool = False, normalized: bool = False) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Compute the optimal warping path in linear memory
+        
+        Uses Hirschberg-style divide and conquer, so the full cost matrix is
+        never stored, or the coarse-to-fine search when a radius is set. The step costs sum to the DTW distance, and dividing by
+        the path length gives a length-normalized distance.
+        
+        Args:
+            template: Template feature sequence (N x 39)
+            test: Test feature sequence (M x 39)
+            use_time_sync: Whether to use the time-synchronous band
+            normalized: Whether both sequences are already normalized
+            
+        Returns:
+            Tuple of (warping path as (L x 2) array of (template frame, test frame),
+            local cost of each path step (L,), path length L); the path is
+            empty when no alignment fits inside the band
+        """
+        template_norm = self.prepare_features(template, normalized)
+        test_norm = self.prepare_features(test, normalized)
+        
+        band = self.compute_adaptive_band(len(template_norm), len(test_norm))
+        if use_time_sync:
+            band = min(band, 1)
+        
+        # Every sub-block must see the same Mahalanobis variance
+        cost_fn = self._cost_fn(template_norm, test_norm)
+        
+        if self.radius is not None:
+            _, path, _ = self.multiscale_dtw(template_norm, test_norm, band)
+        else:
+            path = hirschberg_path(template_norm, test_norm, band, cost_fn)
+        step_costs = path_costs(template_norm, test_norm, path, cost_fn)
+        return path, step_costs, len(path)
     
     def plot_cost_matrix(self, cost_matrix: np.ndarray, title: str):
         """
@@ -153,7 +344,8 @@ class DTW:
         plt.savefig(f"{title.lower().replace(' ', '_')}.png")
         plt.close()
 
-    def recognize(self, templates: List[np.ndarray], test: np.ndarray, use_time_sync: bool = False) -> Tuple[int, float]:
+    def recognize(self, templates: List[np.ndarray], test: np.ndarray, use_time_sync: bool = False,
+                  use_lower_bounds: bool = False, normalized: bool = False) -> Tuple[int, float]:
         """
         Recognize test sequence using multiple templates with pruning
         
@@ -161,38 +353,224 @@ class DTW:
             templates: List of template feature sequences
             test: Test feature sequence
             use_time_sync: Whether to use time-synchronous DTW
+            use_lower_bounds: Whether to skip templates with the LB_Kim/LB_Keogh
+                cascade and early abandoning (same result, fewer DTW cells);
+                off by default because batched scoring is faster unless the
+                bounds actually prune templates
+            normalized: Whether the templates and test are already normalized
             
         Returns:
             Tuple of (template_index, distance)
         """
-        distances = []
-        min_dist = float('inf')
-        best_template_idx = -1
+        if use_lower_bounds:
+            best_template_idx, min_dist, stages = self.search(templates, test, use_time_sync, normalized)
+            if _log.isEnabledFor(logging.DEBUG):
+                for idx, (template, stage) in enumerate(zip(templates, stages)):
+                    band = self.compute_adaptive_band(len(template), len(test))
+                    _log.debug("Template %d: band width = %d, outcome = %s", idx, band, stage)
+            return best_template_idx, min_dist
+        
+        distances, _ = self.score_batch(templates, test, use_time_sync=use_time_sync, normalized=normalized)
+        
+        if len(distances) == 0:
+            return -1, float('inf')
         
-        # Normalize test sequence once
-        test_norm = self.normalize_features(test)
+        if _log.isEnabledFor(logging.DEBUG):
+            for idx, (template, dist) in enumerate(zip(templates, distances)):
+                band = self.compute_adaptive_band(len(template), len(test))
+                _log.debug("Template %d: band width = %d, distance = %.2f", idx, band, dist)
+        
+        # First template wins ties, as in a left-to-right scan
+        best_template_idx = int(np.argmin(distances))
+        min_dist = float(distances[best_template_idx])
+        if not np.isfinite(min_dist):
+            return -1, float('inf')
+        
+        return best_template_idx, min_dist
+    
+    def beam_search(self, templates: List[np.ndarray], test: np.ndarray, beam: float = np.inf,
+                    use_time_sync: bool = False, normalized: bool = False) -> Tuple[int, float]:
+        """
+        Recognize test sequence with frame-synchronous beam search over all templates
         
-        for idx, template in enumerate(templates):
-            # Normalize template
-            template_norm = self.normalize_features(template)
+        Args:
+            templates: List of template feature sequences
+            test: Test feature sequence
+            beam: Pruning threshold relative to the best active hypothesis
+            use_time_sync: Whether to use the time-synchronous band
+            normalized: Whether the templates and test are already normalized
             
-            # Compute adaptive band width for this template
-            band = self.compute_adaptive_band(len(template_norm), len(test_norm))
+        Returns:
+            Tuple of (template_index, distance)
+        """
+        decoder = FrameSynchronousDecoder(self, templates, beam=beam, normalized=normalized,
+                                          use_time_sync=use_time_sync)
+        return decoder.decode(test, normalized=normalized)
+    
+    def recognize_connected(self, templates: List[np.ndarray], test: np.ndarray,
+                            labels: Optional[List[Hashable]] = None, word_penalty: float = 0.0,
+                            max_words: Optional[int] = None,
+                            normalized: bool = False) -> Tuple[List[Hashable], float, List[Tuple[int, int, int]]]:
+        """
+        Recognize a string of words spoken without pauses, in one pass
+        
+        Args:
+            templates: List of template feature sequences
+            test: Test feature sequence
+            labels: Class label of each template (default: template index)
+            word_penalty: Cost added for each word after the first
+            max_words: Most words in the decoded string (default: unbounded)
+            normalized: Whether the templates and test are already normalized
             
-            # Apply pruning by computing cost matrix with band constraints
-            if use_time_sync:
-                dist, cost_matrix = self.time_synchronous_dtw(template_norm, test_norm)
+        Returns:
+            Tuple of (recognized labels, total cost, segments as (template index,
+            first test frame, last test frame))
+        """
+        decoder = ConnectedWordDecoder(self, templates, labels, word_penalty, max_words, normalized)
+        return decoder.decode(test, normalized=normalized)
+    
+    def reset_prune_stats(self):
+        """Reset the template pruning counters accumulated by search()"""
+        self.prune_stats: Dict[str, int] = {
+            'templates': 0,   # templates considered
+            'lb_kim': 0,      # skipped by LB_Kim
+            'lb_keogh': 0,    # skipped by LB_Keogh
+            'abandoned': 0,   # DTW stopped early
+            'dtw': 0          # DTW run to completion
+        }
+    
+    def search(self, templates: List[np.ndarray], test: np.ndarray,
+               use_time_sync: bool = False, normalized: bool = False) -> Tuple[int, float, List[str]]:
+        """
+        Find the nearest template with an LB_Kim -> LB_Keogh cascade and early abandoning
+        
+        Templates are visited in ascending lower-bound order. A template is
+        skipped as soon as one of its bounds exceeds the best distance so far,
+        and a DTW that is run stops once its row minimum exceeds it. The result
+        is the same as scoring every template in full; pruning counts are added
+        to self.prune_stats.
+        
+        Args:
+            templates: List of template feature sequences
+            test: Test feature sequence
+            use_time_sync: Whether to use time-synchronous DTW
+            normalized: Whether the templates and test are already normalized
+            
+        Returns:
+            Tuple of (template_index, distance, outcome per template - one of
+            'lb_kim', 'lb_keogh', 'abandoned' or 'dtw')
+        """
+        test_norm = self.prepare_features(test, normalized)
+        templates_norm = [self.prepare_features(template, normalized) for template in templates]
+        M = len(test_norm)
+        
+        bands = [self.compute_adaptive_band(len(template), M) for template in templates_norm]
+        if use_time_sync:
+            bands = [min(band, 1) for band in bands]
+        
+        with self.metrics.stage('lower_bounds'):
+            # Corner costs need a pairwise metric; the estimated Mahalanobis variance is not
+            if self.metric == 'mahalanobis' and self.variance is None:
+                kim = np.zeros(len(templates_norm))
             else:
-                dist, cost_matrix = self.compute_distance(template_norm, test_norm)
+                kim = np.array([lb_kim(template, test_norm, self.local_cost) for template in templates_norm])
+            keogh = np.array([
+                lb_keogh(template, test_norm, band, self.metric)
+                for template, band in zip(templates_norm, bands)
+            ])
+        
+        best_template_idx = -1
+        min_dist = float('inf')
+        stages = [''] * len(templates_norm)
+        
+        for idx in np.lexsort((np.arange(len(templates_norm)), np.maximum(kim, keogh))):
+            if kim[idx] > min_dist:
+                stages[idx] = 'lb_kim'
+                continue
+            if keogh[idx] > min_dist:
+                stages[idx] = 'lb_keogh'
+                continue
             
-            # Check if this template gives better match
-            if dist < min_dist:
-                min_dist = dist
-                best_template_idx = idx
+            if self.radius is not None:
+                # Never below the exact distance, so the lower bounds still hold; no abandoning
+                dist = self.multiscale_dtw(templates_norm[idx], test_norm, bands[idx], return_path=False)[0]
+            else:
+                # Cells are counted as if the recurrence ran to the end, an upper bound when it is abandoned
+                self.metrics.count_dtw(len(templates_norm[idx]), M, bands[idx])
+                with self.metrics.stage('dtw'):
+                    packed = self.banded_local_cost(templates_norm[idx], test_norm, bands[idx])
+                    dist = self._linear_kernel(packed, M, min_dist)
+            if not np.isfinite(dist):
+                # Without a finite best-so-far nothing can be abandoned; the path is just out of band
+                stages[idx] = 'abandoned' if np.isfinite(min_dist) and self.radius is None else 'dtw'
+                continue
             
-            distances.append(dist)
+            stages[idx] = 'dtw'
+            # Lowest index wins ties, as in a left-to-right scan
+            if dist < min_dist or (dist == min_dist and idx < best_template_idx):
+                min_dist = float(dist)
+                best_template_idx = int(idx)
+        
+        self.prune_stats['templates'] += len(stages)
+        self.metrics.add('templates', len(stages))
+        for stage in stages:
+            self.prune_stats[stage] += 1
+            self.metrics.add(stage)
+        
+        return best_template_idx, min_dist, stages
+    
+    def score_batch(self, templates: List[np.ndarray], test: np.ndarray,
+                    labels: Optional[List[Hashable]] = None,
+                    use_time_sync: bool = False, normalized: bool = False) -> Tuple[np.ndarray, Dict[Hashable, float]]:
+        """
+        Score one test sequence against every template in a single vectorized pass
+        
+        The normalized templates are ragged-packed into one matrix so the local
+        costs come from a single matrix product, and the banded recurrence runs
+        for all templates at once. With a coarse-to-fine radius the templates
+        are scored one by one instead.
+        
+        Args:
+            templates: List of template feature sequences
+            test: Test feature sequence
+            labels: Class label of each template (default: template index)
+            use_time_sync: Whether to use time-synchronous DTW
+            normalized: Whether the templates and test are already normalized
             
-            # Debug: Print band width and distance for each template
-            print(f"Template {idx}: Band width = {band}, Distance = {dist:.2f}")
+        Returns:
+            Tuple of (distance to each template, minimum distance per label)
+        """
+        if labels is None:
+            labels = list(range(len(templates)))
+        if len(labels) != len(templates):
+            raise ValueError(f"Got {len(labels)} labels for {len(templates)} templates")
+        if len(templates) == 0:
+            return np.zeros(0), {}
+        
+        test_norm = self.prepare_features(test, normalized)
+        templates_norm = [self.prepare_features(template, normalized) for template in templates]
+        
+        M = len(test_norm)
+        lengths = np.array([len(template) for template in templates_norm])
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        bands = np.array([self.compute_adaptive_band(N, M) for N in lengths])
+        if use_time_sync:
+            bands = np.minimum(bands, 1)
+        
+        if self.radius is not None:
+            distances = np.array([self.multiscale_dtw(template, test_norm, int(band), return_path=False)[0]
+                                  for template, band in zip(templates_norm, bands)])
+        else:
+            if self.metrics.enabled:
+                for N, band in zip(lengths, bands):
+                    self.metrics.count_dtw(int(N), M, int(band))
+            with self.metrics.stage('dtw'):
+                packed = self.packed_local_cost(np.vstack(templates_norm), lengths, test_norm)
+                distances = self._batch_kernel(packed, offsets, lengths, bands)
+        
+        class_minima: Dict[Hashable, float] = {}
+        for label, dist in zip(labels, distances):
+            if label not in class_minima or dist < class_minima[label]:
+                class_minima[label] = float(dist)
         
-        return best_template_idx, min_dist 
\ No newline at end of file
+        return distances, class_minima
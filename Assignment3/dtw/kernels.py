@@ -0,0 +1,585 @@
+import numpy as np
+from typing import Callable, Dict
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+def as_cost_array(costs: np.ndarray) -> np.ndarray:
+    """
+    Local costs as a C-contiguous float array for the kernels
+
+    float32 costs stay float32, so the recurrence accumulates in single
+    precision; anything else becomes float64.
+    """
+    costs = np.asarray(costs)
+    dtype = np.float32 if costs.dtype == np.float32 else np.float64
+    return np.ascontiguousarray(costs, dtype=dtype)
+
+
+def dtw_loop(dist: np.ndarray, band: int) -> np.ndarray:
+    """
+    Reference banded DTW recurrence, one cell at a time
+
+    Args:
+        dist: Local cost matrix (N x M), template frames on rows
+        band: Band half-width in frames around the diagonal
+
+    Returns:
+        Accumulated cost matrix ((N + 1) x (M + 1))
+    """
+    N, M = dist.shape
+    cost_matrix = np.full((N + 1, M + 1), np.inf, dtype=dist.dtype)
+    cost_matrix[0, 0] = 0
+
+    for i in range(1, N + 1):
+        j_start = max(1, i - band)
+        j_end = min(M + 1, i + band + 1)
+
+        for j in range(j_start, j_end):
+            cost_matrix[i, j] = dist[i-1, j-1] + min(
+                cost_matrix[i-1, j],    # insertion
+                cost_matrix[i, j-1],    # deletion
+                cost_matrix[i-1, j-1]   # match
+            )
+
+    return cost_matrix
+
+
+def dtw_wavefront(dist: np.ndarray, band: int) -> np.ndarray:
+    """
+    Banded DTW recurrence evaluated one anti-diagonal at a time
+
+    Every cell on the anti-diagonal i + j = d depends only on the two
+    previous anti-diagonals, so the whole wavefront is updated with a
+    handful of NumPy operations instead of a Python loop per cell.
+
+    Args:
+        dist: Local cost matrix (N x M), template frames on rows
+        band: Band half-width in frames around the diagonal
+
+    Returns:
+        Accumulated cost matrix ((N + 1) x (M + 1))
+    """
+    N, M = dist.shape
+    cost_matrix = np.full((N + 1, M + 1), np.inf, dtype=dist.dtype)
+    cost_matrix[0, 0] = 0
+
+    for d in range(2, N + M + 1):
+        # Rows on this anti-diagonal that lie inside the matrix and the band
+        i_lo = max(1, d - M, (d - band + 1) // 2)
+        i_hi = min(N, d - 1, (d + band) // 2)
+        if i_lo > i_hi:
+            continue
+
+        i = np.arange(i_lo, i_hi + 1)
+        j = d - i
+
+        cost_matrix[i, j] = dist[i-1, j-1] + np.minimum(
+            np.minimum(cost_matrix[i-1, j], cost_matrix[i, j-1]),
+            cost_matrix[i-1, j-1]
+        )
+
+    return cost_matrix
+
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _dtw_compiled(dist, band):
+        N, M = dist.shape
+        cost_matrix = np.full((N + 1, M + 1), np.inf, dtype=dist.dtype)
+        cost_matrix[0, 0] = 0.0
+
+        for i in range(1, N + 1):
+            j_start = max(1, i - band)
+            j_end = min(M + 1, i + band + 1)
+
+            for j in range(j_start, j_end):
+                best = cost_matrix[i-1, j]
+                if cost_matrix[i, j-1] < best:
+                    best = cost_matrix[i, j-1]
+                if cost_matrix[i-1, j-1] < best:
+                    best = cost_matrix[i-1, j-1]
+                cost_matrix[i, j] = dist[i-1, j-1] + best
+
+        return cost_matrix
+
+    def dtw_compiled(dist: np.ndarray, band: int) -> np.ndarray:
+        """
+        Banded DTW recurrence compiled with numba
+
+        Args:
+            dist: Local cost matrix (N x M), template frames on rows
+            band: Band half-width in frames around the diagonal
+
+        Returns:
+            Accumulated cost matrix ((N + 1) x (M + 1))
+        """
+        return _dtw_compiled(as_cost_array(dist), int(band))
+
+
+def dtw_wavefront_batch(packed: np.ndarray, offsets: np.ndarray, lengths: np.ndarray,
+                        bands: np.ndarray) -> np.ndarray:
+    """
+    Banded DTW of one test sequence against many templates in a single pass
+
+    Templates are ragged-packed: their local cost rows are stacked into one
+    matrix and template b owns rows offsets[b] .. offsets[b] + lengths[b] - 1.
+    All templates advance together one anti-diagonal at a time, keeping only
+    the two previous anti-diagonals (indexed by template row).
+
+    Args:
+        packed: Stacked local cost matrix (sum(lengths) x M)
+        offsets: First packed row of each template (B,)
+        lengths: Number of frames of each template (B,)
+        bands: Band half-width of each template (B,)
+
+    Returns:
+        Accumulated DTW distance of each template (B,)
+    """
+    offsets = np.asarray(offsets, dtype=np.intp)
+    lengths = np.asarray(lengths, dtype=np.intp)
+    bands = np.asarray(bands, dtype=np.intp)
+    B = len(lengths)
+    M = packed.shape[1]
+    if B == 0:
+        return np.zeros(0)
+    N_max = int(lengths.max())
+    max_band = int(bands.max())
+
+    # Packed row of frame i (1-based) of every template; padding rows are masked out
+    rows = np.arange(1, N_max + 1)
+    valid_row = rows[np.newaxis, :] <= lengths[:, np.newaxis]
+    packed_row = np.where(valid_row, offsets[:, np.newaxis] + rows[np.newaxis, :] - 1, 0)
+
+    # Anti-diagonals d - 2 and d - 1, entry i holds C[i, d - i]
+    prev2 = np.full((B, N_max + 1), np.inf, dtype=packed.dtype)
+    prev2[:, 0] = 0
+    prev1 = np.full((B, N_max + 1), np.inf, dtype=packed.dtype)
+    distances = np.full(B, np.inf)
+    finish = lengths + M
+
+    for d in range(2, N_max + M + 1):
+        cur = np.full((B, N_max + 1), np.inf, dtype=packed.dtype)
+        i_lo = max(1, d - M, (d - max_band + 1) // 2)
+        i_hi = min(N_max, d - 1, (d + max_band) // 2)
+
+        if i_lo <= i_hi:
+            i = np.arange(i_lo, i_hi + 1)
+            j = d - i
+
+            local = packed[packed_row[:, i-1], j-1]
+            inside = valid_row[:, i-1] & (np.abs(i - j)[np.newaxis, :] <= bands[:, np.newaxis])
+            best = np.minimum(np.minimum(prev1[:, i-1], prev1[:, i]), prev2[:, i-1])
+            cur[:, i] = np.where(inside, local + best, np.inf)
+
+        done = finish == d
+        if done.any():
+            distances[done] = cur[done, lengths[done]]
+
+        prev2, prev1 = prev1, cur
+
+    return distances
+
+
+def dtw_loop_batch(packed: np.ndarray, offsets: np.ndarray, lengths: np.ndarray,
+                   bands: np.ndarray) -> np.ndarray:
+    """
+    Reference batched DTW: runs dtw_loop on each template's block of rows
+
+    Args:
+        packed: Stacked local cost matrix (sum(lengths) x M)
+        offsets: First packed row of each template (B,)
+        lengths: Number of frames of each template (B,)
+        bands: Band half-width of each template (B,)
+
+    Returns:
+        Accumulated DTW distance of each template (B,)
+    """
+    return np.array([
+        dtw_loop(packed[offset:offset + N], band)[N, -1]
+        for offset, N, band in zip(offsets, lengths, bands)
+    ])
+
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _dtw_batch_compiled(packed, offsets, lengths, bands):
+        B = lengths.shape[0]
+        M = packed.shape[1]
+        distances = np.full(B, np.inf)
+        prev = np.empty(M + 1, packed.dtype)
+        cur = np.empty(M + 1, packed.dtype)
+
+        for b in range(B):
+            N = lengths[b]
+            band = bands[b]
+            offset = offsets[b]
+            prev[:] = np.inf
+            prev[0] = 0.0
+
+            for i in range(1, N + 1):
+                cur[:] = np.inf
+                j_start = max(1, i - band)
+                j_end = min(M + 1, i + band + 1)
+
+                for j in range(j_start, j_end):
+                    best = prev[j]
+                    if cur[j-1] < best:
+                        best = cur[j-1]
+                    if prev[j-1] < best:
+                        best = prev[j-1]
+                    cur[j] = packed[offset + i - 1, j-1] + best
+
+                prev, cur = cur, prev
+
+            distances[b] = prev[M]
+
+        return distances
+
+    def dtw_batch_compiled(packed: np.ndarray, offsets: np.ndarray, lengths: np.ndarray,
+                           bands: np.ndarray) -> np.ndarray:
+        """
+        Batched banded DTW compiled with numba, two rolling rows per template
+
+        Args:
+            packed: Stacked local cost matrix (sum(lengths) x M)
+            offsets: First packed row of each template (B,)
+            lengths: Number of frames of each template (B,)
+            bands: Band half-width of each template (B,)
+
+        Returns:
+            Accumulated DTW distance of each template (B,)
+        """
+        return _dtw_batch_compiled(
+            as_cost_array(packed),
+            np.asarray(offsets, dtype=np.int64),
+            np.asarray(lengths, dtype=np.int64),
+            np.asarray(bands, dtype=np.int64)
+        )
+
+
+def dtw_loop_linear(packed: np.ndarray, M: int, threshold: float = np.inf) -> float:
+    """
+    Reference distance-only banded DTW with two rolling rows
+
+    Reads band-packed local costs, so memory is O(N * band + M) instead of
+    O(N * M). With a finite threshold the DTW is abandoned once a whole row
+    exceeds it: every warping path crosses every template row and costs
+    never decrease along a path, so the final distance must as well.
+
+    Args:
+        packed: Band-packed local costs (N x (2 * band + 1)), see
+            dtw.distances.banded_local_cost
+        M: Number of test frames
+        threshold: Best distance found so far (default: never abandon)
+
+    Returns:
+        DTW distance, or inf when abandoned
+    """
+    N, width = packed.shape
+    band = (width - 1) // 2
+    prev = np.full(M + 1, np.inf, dtype=packed.dtype)
+    prev[0] = 0
+
+    for i in range(1, N + 1):
+        cur = np.full(M + 1, np.inf, dtype=packed.dtype)
+        j_start = max(1, i - band)
+        j_end = min(M + 1, i + band + 1)
+
+        for j in range(j_start, j_end):
+            cur[j] = packed[i-1, j-i+band] + min(prev[j], cur[j-1], prev[j-1])
+
+        if cur.min() > threshold:
+            return np.inf
+        prev = cur
+
+    return prev[M]
+
+
+def dtw_wavefront_linear(packed: np.ndarray, M: int, threshold: float = np.inf) -> float:
+    """
+    Distance-only banded DTW over anti-diagonals, keeping two of them
+
+    A warping path advances by one or two anti-diagonals per step, so it
+    visits at least one of any two consecutive anti-diagonals; with a finite
+    threshold the DTW is abandoned once both are above it.
+
+    Args:
+        packed: Band-packed local costs (N x (2 * band + 1))
+        M: Number of test frames
+        threshold: Best distance found so far (default: never abandon)
+
+    Returns:
+        DTW distance, or inf when abandoned
+    """
+    N, width = packed.shape
+    band = (width - 1) // 2
+    prev2 = np.full(N + 1, np.inf, dtype=packed.dtype)
+    prev2[0] = 0
+    prev1 = np.full(N + 1, np.inf, dtype=packed.dtype)
+
+    for d in range(2, N + M + 1):
+        cur = np.full(N + 1, np.inf, dtype=packed.dtype)
+        i_lo = max(1, d - M, (d - band + 1) // 2)
+        i_hi = min(N, d - 1, (d + band) // 2)
+
+        if i_lo <= i_hi:
+            i = np.arange(i_lo, i_hi + 1)
+            # Cell (i, d - i) sits at offset (d - i) - i + band in row i - 1
+            cur[i] = packed[i-1, d - 2 * i + band] + np.minimum(
+                np.minimum(prev1[i-1], prev1[i]),
+                prev2[i-1]
+            )
+
+        if min(cur.min(), prev1.min()) > threshold:
+            return np.inf
+        prev2, prev1 = prev1, cur
+
+    return prev1[N]
+
+
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def _dtw_linear_compiled(packed, M, threshold):
+        N, width = packed.shape
+        band = (width - 1) // 2
+        prev = np.full(M + 1, np.inf, dtype=packed.dtype)
+        prev[0] = 0.0
+        cur = np.empty(M + 1, packed.dtype)
+
+        for i in range(1, N + 1):
+            cur[:] = np.inf
+            row_min = np.inf
+            j_start = max(1, i - band)
+            j_end = min(M + 1, i + band + 1)
+
+            for j in range(j_start, j_end):
+                best = prev[j]
+                if cur[j-1] < best:
+                    best = cur[j-1]
+                if prev[j-1] < best:
+                    best = prev[j-1]
+                cur[j] = packed[i-1, j-i+band] + best
+                if cur[j] < row_min:
+                    row_min = cur[j]
+
+            if row_min > threshold:
+                return np.inf
+            prev, cur = cur, prev
+
+        return prev[M]
+
+    def dtw_linear_compiled(packed: np.ndarray, M: int, threshold: float = np.inf) -> float:
+        """
+        Distance-only banded DTW compiled with numba, two rolling rows
+
+        Args:
+            packed: Band-packed local costs (N x (2 * band + 1))
+            M: Number of test frames
+            threshold: Best distance found so far (default: never abandon)
+
+        Returns:
+            DTW distance, or inf when abandoned
+        """
+        return _dtw_linear_compiled(
+            as_cost_array(packed), int(M), float(threshold)
+        )
+
+
+def dtw_window_loop(packed: np.ndarray, starts: np.ndarray, widths: np.ndarray) -> np.ndarray:
+    """
+    Reference DTW recurrence over an arbitrary window, one cell at a time
+
+    The window holds one contiguous run of test frames per template row;
+    runs start and end no earlier than the row above (as around a warping
+    path). Local and accumulated costs are packed row by row from the
+    start of each run.
+
+    Args:
+        packed: Window-packed local costs (N x W); entry [i, k] is the cost of
+            template frame i against test frame starts[i] + k
+        starts: First test frame of each row's run (N,)
+        widths: Number of test frames in each row's run (N,)
+
+    Returns:
+        Accumulated costs in the same packing (N x W), inf outside the window
+    """
+    N, W = packed.shape
+    acc = np.full((N, W), np.inf, dtype=packed.dtype)
+    for i in range(N):
+        for k in range(widths[i]):
+            j = starts[i] + k
+            if i == 0 and j == 0:
+                acc[i, k] = packed[i, k]
+                continue
+            best = acc[i, k-1] if k > 0 else np.inf
+            if i > 0:
+                # Same column and the one before it, in the previous row's packing
+                up = j - starts[i-1]
+                if 0 <= up < widths[i-1] and acc[i-1, up] < best:
+                    best = acc[i-1, up]
+                if 0 <= up - 1 < widths[i-1] and acc[i-1, up-1] < best:
+                    best = acc[i-1, up-1]
+            acc[i, k] = packed[i, k] + best
+    return acc
+
+
+def dtw_window_rows(packed: np.ndarray, starts: np.ndarray, widths: np.ndarray) -> np.ndarray:
+    """
+    DTW recurrence over an arbitrary window, one NumPy row at a time
+
+    Within a row, cur[k] = d_k + min(cur[k-1], up_k, diag_k) is a running
+    minimum: with a_k = d_k + min(up_k, diag_k) and S_k = d_0 + ... + d_k,
+    cur[k] = S_k + min_{l <= k} (a_l - S_l).
+
+    Args:
+        packed: Window-packed local costs (N x W)
+        starts: First test frame of each row's run (N,)
+        widths: Number of test frames in each row's run (N,)
+
+    Returns:
+        Accumulated costs in the same packing (N x W), inf outside the window
+    """
+    N, W = packed.shape
+    acc = np.full((N, W), np.inf, dtype=packed.dtype)
+    k = np.arange(W)
+    # Previous row padded with inf on both sides so shifted reads stay in range
+    prev = np.full(3 * W + 2, np.inf, dtype=packed.dtype)
+    prev_start = 0
+    for i in range(N):
+        inside = k < widths[i]
+        local = np.where(inside, packed[i], 0)
+        if i == 0:
+            entry = np.full(W, np.inf, dtype=packed.dtype)
+            if starts[0] == 0:
+                entry[0] = local[0]
+        else:
+            up = W + 1 + k + starts[i] - prev_start
+            entry = local + np.minimum(prev[np.clip(up, 0, len(prev) - 1)],
+                                       prev[np.clip(up - 1, 0, len(prev) - 1)])
+        cumulative = np.cumsum(local)
+        cur = cumulative + np.minimum.accumulate(np.where(inside, entry, np.inf) - cumulative)
+        cur[~inside] = np.inf
+        acc[i] = cur
+        prev[W + 1:2 * W + 1] = cur
+        prev_start = starts[i]
+    return acc
+
+
+if HAVE_NUMBA:
+    _dtw_window_compiled = njit(cache=True)(dtw_window_loop)
+
+    def dtw_window_compiled(packed: np.ndarray, starts: np.ndarray, widths: np.ndarray) -> np.ndarray:
+        """
+        DTW recurrence over an arbitrary window compiled with numba
+
+        Args:
+            packed: Window-packed local costs (N x W)
+            starts: First test frame of each row's run (N,)
+            widths: Number of test frames in each row's run (N,)
+
+        Returns:
+            Accumulated costs in the same packing (N x W), inf outside the window
+        """
+        return _dtw_window_compiled(
+            as_cost_array(packed),
+            np.asarray(starts, dtype=np.int64),
+            np.asarray(widths, dtype=np.int64)
+        )
+
+
+KERNELS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    'loop': dtw_loop,
+    'wavefront': dtw_wavefront,
+}
+if HAVE_NUMBA:
+    KERNELS['numba'] = dtw_compiled
+
+BATCH_KERNELS: Dict[str, Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]] = {
+    'loop': dtw_loop_batch,
+    'wavefront': dtw_wavefront_batch,
+}
+if HAVE_NUMBA:
+    BATCH_KERNELS['numba'] = dtw_batch_compiled
+
+LINEAR_KERNELS: Dict[str, Callable[[np.ndarray, int, float], float]] = {
+    'loop': dtw_loop_linear,
+    'wavefront': dtw_wavefront_linear,
+}
+if HAVE_NUMBA:
+    LINEAR_KERNELS['numba'] = dtw_linear_compiled
+
+
+WINDOW_KERNELS: Dict[str, Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]] = {
+    'loop': dtw_window_loop,
+    'wavefront': dtw_window_rows,
+}
+if HAVE_NUMBA:
+    WINDOW_KERNELS['numba'] = dtw_window_compiled
+
+def _resolve_engine(engine: str) -> str:
+    """Map 'auto' to a concrete engine and validate the name"""
+    if engine == 'auto':
+        engine = 'numba' if HAVE_NUMBA else 'wavefront'
+    if engine not in KERNELS:
+        if engine == 'numba':
+            raise ValueError("DTW engine 'numba' requested but numba is not installed")
+        raise ValueError(f"Unknown DTW engine: {engine!r} (expected one of {sorted(KERNELS)} or 'auto')")
+    return engine
+
+
+def get_kernel(engine: str) -> Callable[[np.ndarray, int], np.ndarray]:
+    """
+    Look up a DTW recurrence kernel by name
+
+    Args:
+        engine: 'loop', 'wavefront', 'numba' or 'auto' (numba when
+            installed, otherwise wavefront)
+
+    Returns:
+        Kernel function taking (local cost matrix, band)
+    """
+    return KERNELS[_resolve_engine(engine)]
+
+
+def get_batch_kernel(engine: str) -> Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+    """
+    Look up a one-vs-many DTW kernel by name
+
+    Args:
+        engine: 'loop', 'wavefront', 'numba' or 'auto'
+
+    Returns:
+        Kernel function taking (packed local costs, offsets, lengths, bands)
+    """
+    return BATCH_KERNELS[_resolve_engine(engine)]
+
+
+def get_linear_kernel(engine: str) -> Callable[[np.ndarray, int, float], float]:
+    """
+    Look up a distance-only, early-abandoning DTW kernel by name
+
+    Args:
+        engine: 'loop', 'wavefront', 'numba' or 'auto'
+
+    Returns:
+        Kernel function taking (band-packed local costs, M, threshold)
+    """
+    return LINEAR_KERNELS[_resolve_engine(engine)]
+
+
+def get_window_kernel(engine: str) -> Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]:
+    """
+    Look up a DTW kernel for arbitrary windows (coarse-to-fine search) by name
+
+    Args:
+        engine: 'loop', 'wavefront' (row-vectorized), 'numba' or 'auto'
+
+    Returns:
+        Kernel function taking (window-packed local costs, starts, widths)
+    """
+    return WINDOW_KERNELS[_resolve_engine(engine)]
@@ -0,0 +1,273 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from dtw.kernels import HAVE_NUMBA, as_cost_array
+from metrics import Metrics, band_cells
+
+if HAVE_NUMBA:
+    from numba import njit
+
+CostFn = Callable[[np.ndarray, np.ndarray], np.ndarray]
+WindowKernel = Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+def coarsen(sequence: np.ndarray) -> np.ndarray:
+    """
+    Halve the frame rate by averaging consecutive pairs of frames
+
+    Args:
+        sequence: Feature sequence (N x D)
+
+    Returns:
+        Sequence of ceil(N / 2) frames; an odd last frame is kept as is
+    """
+    N = len(sequence)
+    pairs = sequence[:N - N % 2].reshape(N // 2, 2, -1).mean(axis=1)
+    if N % 2:
+        pairs = np.vstack((pairs, sequence[-1:]))
+    return pairs
+
+
+def band_window(N: int, M: int, band: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sakoe-Chiba band as a window of one run of test frames per template row
+
+    Returns:
+        Tuple of (first test frame of each row (N,), last test frame of each row (N,))
+    """
+    rows = np.arange(N)
+    return np.maximum(rows - band, 0), np.minimum(rows + band, M - 1)
+
+
+def project_window(path: np.ndarray, N: int, M: int, radius: int,
+                   band: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Window around a coarse path at twice its resolution
+
+    Every coarse cell covers a 2 x 2 block of fine cells. The covered
+    blocks are widened by `radius` frames in both directions and clipped
+    to the band.
+
+    Args:
+        path: Warping path at the coarse level (L x 2)
+        N: Number of fine template frames
+        M: Number of fine test frames
+        radius: Extra frames around the projected path
+        band: Band half-width at the fine level
+
+    Returns:
+        Tuple of (first, last) test frame of each row (N,), or None when
+        clipping to the band leaves no path from corner to corner
+    """
+    coarse_rows = (N + 1) // 2
+    first = np.full(coarse_rows, M, dtype=np.int64)
+    last = np.zeros(coarse_rows, dtype=np.int64)
+    np.minimum.at(first, path[:, 0], path[:, 1])
+    np.maximum.at(last, path[:, 0], path[:, 1])
+
+    rows = np.arange(N)
+    lo = 2 * first[rows // 2]
+    hi = np.minimum(2 * last[rows // 2] + 1, M - 1)
+    # Both ends are non-decreasing along a warping path, so widening rows is a shift
+    lo = np.maximum(lo[np.maximum(rows - radius, 0)] - radius, rows - band)
+    hi = np.minimum(hi[np.minimum(rows + radius, N - 1)] + radius, rows + band)
+    lo, hi = np.maximum(lo, 0), np.minimum(hi, M - 1)
+
+    # Each row must be reachable from the one above, and the corners must be inside
+    if lo[0] != 0 or hi[-1] != M - 1 or np.any(lo > hi) or np.any(lo[1:] > hi[:-1] + 1):
+        return None
+    return lo, hi
+
+
+def window_local_cost(template: np.ndarray, test: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+                      cost_fn: CostFn, block: int = 32) -> np.ndarray:
+    """
+    Local costs of the cells inside a window only, packed row by row
+
+    Args:
+        template: Template feature sequence (N x D)
+        test: Test feature sequence (M x D)
+        lo: First test frame of each row's run (N,)
+        hi: Last test frame of each row's run (N,)
+        cost_fn: Local cost function returning a matrix for two frame sets
+        block: Template rows per matrix product
+
+    Returns:
+        Packed local costs (N x W), W the widest run; entry [i, k] is the cost
+        of template frame i against test frame lo[i] + k, inf past the run;
+        float32 when the sequences are, float64 otherwise
+    """
+    N = len(template)
+    widths = hi - lo + 1
+    width = int(widths.max())
+    packed = np.full((N, width), np.inf, dtype=np.promote_types(template.dtype, np.float32))
+    k = np.arange(width)[np.newaxis, :]
+
+    for r0 in range(0, N, block):
+        r1 = min(N, r0 + block)
+        # Runs only move right, so the block needs the columns from its first start to its last end
+        c0, c1 = int(lo[r0]), int(hi[r1 - 1]) + 1
+        sub = cost_fn(template[r0:r1], test[c0:c1])
+        cols = np.minimum(lo[r0:r1, np.newaxis] + k, c1 - 1) - c0
+        values = np.take_along_axis(sub, cols, axis=1)
+        packed[r0:r1] = np.where(k < widths[r0:r1, np.newaxis], values, np.inf)
+
+    return packed
+
+
+def _trace_window(acc: np.ndarray, lo: np.ndarray, M: int) -> np.ndarray:
+    N, W = acc.shape
+    path = np.empty((N + M - 1, 2), dtype=np.int64)
+    i, j = N - 1, M - 1
+    n = 0
+    path[n, 0], path[n, 1] = i, j
+    while i > 0 or j > 0:
+        # Diagonal, up, left; the first of equal costs wins, so ties go diagonal
+        best, bi, bj = np.inf, i, j - 1
+        if i > 0 and j > 0 and 0 <= j - 1 - lo[i-1] < W and acc[i-1, j-1-lo[i-1]] < best:
+            best, bi, bj = acc[i-1, j-1-lo[i-1]], i - 1, j - 1
+        if i > 0 and 0 <= j - lo[i-1] < W and acc[i-1, j-lo[i-1]] < best:
+            best, bi, bj = acc[i-1, j-lo[i-1]], i - 1, j
+        if j > 0 and 0 <= j - 1 - lo[i] < W and acc[i, j-1-lo[i]] < best:
+            best, bi, bj = acc[i, j-1-lo[i]], i, j - 1
+        i, j = bi, bj
+        n += 1
+        path[n, 0], path[n, 1] = i, j
+    return path[n::-1]
+
+
+if HAVE_NUMBA:
+    _trace_window = njit(cache=True)(_trace_window)
+
+
+def window_path(acc: np.ndarray, lo: np.ndarray, M: int) -> np.ndarray:
+    """
+    Trace the optimal path back through window-packed accumulated costs
+
+    Args:
+        acc: Accumulated costs from a window kernel (N x W)
+        lo: First test frame of each row's run (N,)
+        M: Number of test frames
+
+    Returns:
+        Warping path as (L x 2) array of (template frame, test frame)
+    """
+    return _trace_window(as_cost_array(acc), np.asarray(lo, dtype=np.int64), int(M))
+
+
+def multiscale_dtw(template: np.ndarray, test: np.ndarray, band: int, radius: int,
+                   cost_fn: CostFn, kernel: WindowKernel,
+                   min_size: Optional[int] = None, return_path: bool = True) -> Tuple[float, np.ndarray, int]:
+    """
+    Approximate banded DTW by coarse-to-fine refinement (FastDTW)
+
+    Both sequences are halved by averaging frame pairs until one of them
+    is down to min_size frames, where banded DTW is solved exactly. The
+    warping path found at each level is projected onto the next finer one
+    and widened by `radius` frames, and DTW is solved again inside that
+    window only. Each level therefore costs O((N + M) * radius) cells
+    instead of O(N * band).
+
+    The window always lies inside the band, so the result is never below
+    the exact banded distance. When clipping to the band breaks the
+    projected window, that level falls back to the full band.
+
+    Args:
+        template: Normalized template feature sequence (N x D)
+        test: Normalized test feature sequence (M x D)
+        band: Band half-width at full resolution
+        radius: Frames kept around the projected path at each level
+        cost_fn: Local cost function returning a matrix for two frame sets
+        kernel: Window recurrence, see dtw.kernels.get_window_kernel
+        min_size: Length at which refinement stops (default: 2 * radius + 2)
+        return_path: Whether to trace the full-resolution path (the coarser
+            ones are always traced)
+
+    Returns:
+        Tuple of (distance, warping path (L x 2), cells evaluated over all
+        levels); the distance is inf and the path empty when no path fits
+        inside the band or it was not asked for
+    """
+    N, M = len(template), len(test)
+    if N == 0 or M == 0 or abs(N - M) > band:
+        return np.inf, np.zeros((0, 2), dtype=int), 0
+    if min_size is None:
+        min_size = 2 * radius + 2
+
+    # Build the pyramid first; the band shrinks with the frame rate
+    levels = [(template, test, band)]
+    while min(len(levels[-1][0]), len(levels[-1][1])) > min_size and levels[-1][2] > radius:
+        coarse_template, coarse_test, coarse_band = levels[-1]
+        levels.append((coarsen(coarse_template), coarsen(coarse_test), -(-coarse_band // 2)))
+
+    path = None
+    cells = 0
+    for level in range(len(levels) - 1, -1, -1):
+        level_template, level_test, level_band = levels[level]
+        n, m = len(level_template), len(level_test)
+        window = project_window(path, n, m, radius, level_band) if path is not None else None
+        lo, hi = window if window is not None else band_window(n, m, level_band)
+
+        packed = window_local_cost(level_template, level_test, lo, hi, cost_fn)
+        acc = kernel(packed, lo, hi - lo + 1)
+        cells += int((hi - lo + 1).sum())
+        if not np.isfinite(acc[-1, m - 1 - lo[-1]]):
+            return np.inf, np.zeros((0, 2), dtype=int), cells
+        if level > 0 or return_path:
+            path = window_path(acc, lo, m)
+
+    if not return_path:
+        path = np.zeros((0, 2), dtype=int)
+    return float(acc[-1, M - 1 - lo[-1]]), path, cells
+
+
+def approximation_error(dtw, templates: Sequence[np.ndarray], tests: Sequence[np.ndarray],
+                        radius: int, metrics: Metrics, normalized: bool = False) -> Dict[str, float]:
+    """
+    Error of coarse-to-fine DTW against exact banded DTW, pair by pair
+
+    Args:
+        dtw: DTW instance whose band, metric and engine are used (its own
+            radius setting is ignored)
+        templates: Template feature sequences
+        tests: Test feature sequences, compared with templates pairwise
+        radius: Refinement radius to evaluate
+        metrics: Collector given to the coarse-to-fine DTW, whose 'cells'
+            counter yields the cells it evaluated
+        normalized: Whether the sequences are already normalized
+
+    Returns:
+        Dict with the number of 'pairs' with an in-band path, 'mean_error'
+        and 'max_error' relative to the exact distance, 'exact_fraction'
+        (pairs where both distances agree) and 'cell_fraction' (cells
+        evaluated relative to the exact band)
+    """
+    # Same settings as `dtw`, once exact and once coarse-to-fine with a cell counter
+    config = dtw.config()
+    exact_dtw = type(dtw)(**dict(config, radius=None))
+    approx_dtw = type(dtw)(**dict(config, radius=radius), metrics=metrics)
+
+    errors: List[float] = []
+    cells = exact_cells = 0
+    for template, test in zip(templates, tests):
+        template_norm = dtw.prepare_features(template, normalized)
+        test_norm = dtw.prepare_features(test, normalized)
+        exact, _ = exact_dtw.compute_distance(template_norm, test_norm, normalized=True)
+        if not np.isfinite(exact):
+            continue
+        counted = approx_dtw.metrics.counters['cells']
+        approx, _ = approx_dtw.compute_distance(template_norm, test_norm, normalized=True)
+        errors.append((approx - exact) / exact if exact > 0 else 0.0)
+        cells += approx_dtw.metrics.counters['cells'] - counted
+        N, M = len(template_norm), len(test_norm)
+        exact_cells += band_cells(N, M, dtw.compute_adaptive_band(N, M))
+
+    if not errors:
+        return {'pairs': 0, 'mean_error': 0.0, 'max_error': 0.0, 'exact_fraction': 1.0, 'cell_fraction': 0.0}
+    errors_arr = np.array(errors)
+    return {
+        'pairs': len(errors),
+        'mean_error': float(errors_arr.mean()),
+        'max_error': float(errors_arr.max()),
+        'exact_fraction': float(np.mean(errors_arr <= 1e-9)),
+        'cell_fraction': cells / exact_cells,
+    }
@@ -0,0 +1,222 @@
+import numpy as np
+from typing import Hashable, Iterable, List, Optional, Tuple
+from metrics import Metrics, NO_METRICS
+
+
+def utterance_cmvn(features: np.ndarray) -> np.ndarray:
+    """
+    Per-utterance mean and variance normalization of each feature dimension
+
+    Args:
+        features: Input feature sequence (n_frames x dim)
+
+    Returns:
+        Normalized feature sequence
+    """
+    return (features - np.mean(features, axis=0)) / (np.std(features, axis=0) + 1e-8)
+
+
+def corpus_cmvn_stats(sequences: Iterable[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and standard deviation of every feature dimension over a whole corpus
+
+    Args:
+        sequences: Feature sequences (n_frames x dim)
+
+    Returns:
+        Tuple of (mean (dim,), std (dim,))
+    """
+    count = 0
+    total = None
+    total_sq = None
+    for features in sequences:
+        features = np.asarray(features, dtype=np.float64)
+        if total is None:
+            total = np.zeros(features.shape[1])
+            total_sq = np.zeros(features.shape[1])
+        count += len(features)
+        total += features.sum(axis=0)
+        total_sq += np.einsum('ij,ij->j', features, features)
+    if count == 0:
+        raise ValueError("Cannot compute CMVN statistics from an empty corpus")
+
+    mean = total / count
+    std = np.sqrt(np.maximum(total_sq / count - mean ** 2, 0))
+    return mean, std
+
+
+# Storage types of TemplateStore
+STORE_DTYPES = ('float64', 'float32', 'int8')
+
+
+class TemplateStore:
+    def __init__(self, cmvn: Optional[Tuple[np.ndarray, np.ndarray]] = None, dim: int = 39,
+                 metrics: Optional[Metrics] = None, dtype: str = 'float64', headroom: float = 0.1):
+        """
+        Normalized templates kept in one contiguous, C-ordered block
+
+        Each template is normalized exactly once, when it is added, so DTW
+        entry points can be called with normalized=True on its templates.
+
+        With dtype='int8' every feature dimension is quantized to 256 levels
+        between a per-dimension offset and scale, a quarter of the float32
+        size. The range grows as templates are added: a template outside
+        it widens the range (plus `headroom` of its width on each side)
+        and the stored frames are re-quantized, which mostly happens for
+        the first few templates. Each re-quantization can add up to half a
+        step of rounding error to the frames already stored.
+
+        Args:
+            cmvn: Corpus-level (mean, std) to normalize with; per-utterance
+                normalization when None
+            dim: Feature dimension
+            metrics: Collector timing the 'normalize' stage (default: disabled)
+            dtype: Storage of the frames - 'float64' (default), 'float32' or
+                'int8'; int8 templates are read back as float32
+            headroom: Fraction of the range added on each side when an int8
+                range has to grow
+        """
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unknown template storage: {dtype!r} (expected one of {STORE_DTYPES})")
+        self.cmvn = None if cmvn is None else (np.asarray(cmvn[0], dtype=np.float64),
+                                               np.asarray(cmvn[1], dtype=np.float64))
+        self.dim = dim
+        self.metrics = metrics if metrics is not None else NO_METRICS
+        self.dtype = np.dtype(dtype)
+        # Precision templates and normalized sequences are handed out in
+        self.float_dtype = np.dtype(np.float64 if dtype == 'float64' else np.float32)
+        self.headroom = headroom
+        self.labels: List[Hashable] = []
+        self._lengths: List[int] = []
+        self._buffer = np.empty((0, dim), dtype=self.dtype)
+        self._n_rows = 0
+        # int8 only: per-dimension value range, frame = q * scale + offset
+        self._low: Optional[np.ndarray] = None
+        self._high: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+        self.offset: Optional[np.ndarray] = None
+        # int8 only: dequantized frames, rebuilt after the store changes
+        self._dequantized: Optional[np.ndarray] = None
+
+    def normalize(self, features: np.ndarray) -> np.ndarray:
+        """
+        Normalize a sequence the same way the stored templates were
+
+        Args:
+            features: Input feature sequence (n_frames x dim)
+
+        Returns:
+            Normalized, C-contiguous feature sequence in float_dtype
+        """
+        with self.metrics.stage('normalize'):
+            features = np.asarray(features, dtype=np.float64)
+            if self.cmvn is None:
+                normalized = utterance_cmvn(features)
+            else:
+                mean, std = self.cmvn
+                normalized = (features - mean) / (std + 1e-8)
+            return np.ascontiguousarray(normalized, dtype=self.float_dtype)
+
+    def _quantize(self, frames: np.ndarray) -> np.ndarray:
+        """Map frames into the current int8 range"""
+        levels = np.rint((frames - self.offset) / self.scale)
+        return np.clip(levels, -128, 127).astype(np.int8)
+
+    def _fit_range(self, template: np.ndarray):
+        """Grow the int8 range to cover a template, re-quantizing the stored frames"""
+        low, high = template.min(axis=0), template.max(axis=0)
+        if self._low is not None:
+            if np.all(low >= self._low) and np.all(high <= self._high):
+                return
+            stored = self.packed
+            low, high = np.minimum(low, self._low), np.maximum(high, self._high)
+        else:
+            stored = None
+        margin = (high - low) * self.headroom
+        self._low, self._high = low - margin, high + margin
+        self.scale = np.maximum((self._high - self._low) / 255, 1e-6).astype(np.float32)
+        self.offset = (self._low + 128 * self.scale).astype(np.float32)
+        if stored is not None and len(stored):
+            self._buffer[:self._n_rows] = self._quantize(stored)
+
+    def add(self, label: Hashable, features: np.ndarray, normalized: bool = False):
+        """
+        Normalize a template and append it to the store
+
+        Args:
+            label: Class label of the template
+            features: Raw template feature sequence (n_frames x dim)
+            normalized: Whether the sequence is already normalized like the
+                store's templates (e.g. a DBA average of normalized templates)
+        """
+        if normalized:
+            template = np.ascontiguousarray(features, dtype=np.float64)
+        else:
+            template = self.normalize(features)
+        if template.ndim != 2 or template.shape[1] != self.dim:
+            raise ValueError(f"Expected a (n_frames x {self.dim}) template, got shape {template.shape}")
+        if self.dtype == np.int8:
+            if len(template):
+                self._fit_range(template)
+            template = self._quantize(template)
+
+        # Grow geometrically so appends stay amortized O(frames)
+        needed = self._n_rows + len(template)
+        if needed > len(self._buffer):
+            grown = np.empty((max(needed, 2 * len(self._buffer)), self.dim), dtype=self.dtype)
+            grown[:self._n_rows] = self._buffer[:self._n_rows]
+            self._buffer = grown
+        self._buffer[self._n_rows:needed] = template
+        self._n_rows = needed
+        self._dequantized = None
+
+        self.labels.append(label)
+        self._lengths.append(len(template))
+
+    def extend(self, label: Hashable, sequences: Iterable[np.ndarray], normalized: bool = False):
+        """Add several templates with the same label"""
+        for features in sequences:
+            self.add(label, features, normalized)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stored frames (excluding unused capacity)"""
+        return self._n_rows * self.dim * self.dtype.itemsize
+
+    @property
+    def packed(self) -> np.ndarray:
+        """
+        All normalized template frames stacked in insertion order (sum(lengths) x dim)
+
+        A view of the storage, except for int8 where the frames are
+        dequantized into a read-only float32 array. That array is kept until
+        the next add(), so repeated reads between additions cost nothing.
+        """
+        stored = self._buffer[:self._n_rows]
+        if self.dtype != np.int8:
+            return stored
+        if self.scale is None:
+            return np.empty((0, self.dim), dtype=np.float32)
+        if self._dequantized is None:
+            self._dequantized = stored * self.scale + self.offset
+            self._dequantized.flags.writeable = False
+        return self._dequantized
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Number of frames of each template"""
+        return np.array(self._lengths, dtype=np.intp)
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """First packed row of each template"""
+        return np.concatenate(([0], np.cumsum(self._lengths)[:-1])).astype(np.intp)
+
+    @property
+    def templates(self) -> List[np.ndarray]:
+        """Normalized templates as views into the packed block (of the cached dequantized copy for int8)"""
+        packed = self.packed
+        return [packed[o:o + n] for o, n in zip(self.offsets, self._lengths)]
@@ -0,0 +1,111 @@
+import numpy as np
+from collections import deque
+from typing import List, Tuple
+
+
+def chunk_energy_zcr(samples: np.ndarray) -> Tuple[float, float]:
+    """
+    Average amplitude and zero crossing rate of one audio chunk
+
+    ZCR = (number of sign changes) / (total samples - 1), as in
+    Assignment1.zero_crossing_rate().
+
+    Args:
+        samples: 16-bit audio samples
+
+    Returns:
+        Tuple of (average absolute amplitude, zero crossing rate)
+    """
+    samples = np.asarray(samples)
+    if len(samples) == 0:
+        return 0.0, 0.0
+    avg_amplitude = float(np.abs(samples.astype(np.int32)).mean())
+    if len(samples) < 2:
+        return avg_amplitude, 0.0
+    non_negative = samples >= 0
+    zcr = float(np.count_nonzero(non_negative[1:] != non_negative[:-1]) / (len(samples) - 1))
+    return avg_amplitude, zcr
+
+
+class Endpointer:
+    # States reported by update()
+    SILENCE = 'silence'
+    START = 'start'
+    SPEECH = 'speech'
+    END = 'end'
+
+    def __init__(self, rate: int = 16000, chunk_size: int = 1024, amplitude_threshold: float = 15,
+                 zcr_threshold: float = 2.0, max_silence_len: float = 0.8, pre_roll: int = 2,
+                 max_utterance_len: float = 3.0):
+        """
+        Chunk-level speech endpoint detection for a continuous audio stream
+
+        Uses the silence rule of record_audio(): a chunk is silent when its
+        average amplitude and its ZCR are both below their thresholds. An
+        utterance starts at the first non-silent chunk (plus a few chunks of
+        pre-roll) and ends after more than max_silence_len seconds of
+        consecutive silence, or when it reaches max_utterance_len.
+
+        Args:
+            rate: Sample rate in Hz
+            chunk_size: Samples per chunk
+            amplitude_threshold: Below this is considered "quiet"
+            zcr_threshold: Below this is considered "low Zero-Crossing Rate"
+            max_silence_len: Silence duration in seconds that ends an utterance
+            pre_roll: Silent chunks kept before the start of an utterance
+            max_utterance_len: Longest utterance in seconds before it is cut
+        """
+        self.amplitude_threshold = amplitude_threshold
+        self.zcr_threshold = zcr_threshold
+        self.silent_chunk_thresh = int(max_silence_len * (rate / chunk_size))
+        self.max_chunks = max(1, int(max_utterance_len * rate / chunk_size))
+        self.pre_roll = pre_roll
+        self.reset()
+
+    def reset(self):
+        """Forget the current utterance and the pre-roll"""
+        self.in_speech = False
+        self.silent_chunk_count = 0
+        self.utterance_chunks = 0
+        self._pre_roll = deque(maxlen=self.pre_roll)
+
+    def is_silent(self, samples: np.ndarray) -> bool:
+        """Whether a chunk counts as silence"""
+        avg_amplitude, zcr_value = chunk_energy_zcr(samples)
+        return avg_amplitude < self.amplitude_threshold and zcr_value < self.zcr_threshold
+
+    def update(self, samples: np.ndarray) -> str:
+        """
+        Classify the next chunk
+
+        Args:
+            samples: Next audio chunk
+
+        Returns:
+            SILENCE outside an utterance, START for the first chunk of an
+            utterance, SPEECH inside it and END for its last chunk
+        """
+        silent = self.is_silent(samples)
+
+        if not self.in_speech:
+            if silent:
+                self._pre_roll.append(samples)
+                return self.SILENCE
+            self.in_speech = True
+            self.silent_chunk_count = 0
+            self.utterance_chunks = 1
+            return self.START
+
+        self.utterance_chunks += 1
+        self.silent_chunk_count = self.silent_chunk_count + 1 if silent else 0
+        if self.silent_chunk_count > self.silent_chunk_thresh or self.utterance_chunks >= self.max_chunks:
+            self.in_speech = False
+            self._pre_roll.clear()
+            return self.END
+        return self.SPEECH
+
+    def take_pre_roll(self) -> List[np.ndarray]:
+        """Silent chunks that preceded the utterance that just started"""
+        chunks = list(self._pre_roll)
+        self._pre_roll.clear()
+        return chunks
@@ -0,0 +1,220 @@
+import os
+import json
+import hashlib
+import numpy as np
+from multiprocessing import Pool
+from typing import Any, Dict, Hashable, List, Optional, Sequence
+from dtw.dtw import DTW
+from dtw.templates import TemplateStore
+from recognition import publish_features, attach_features
+
+
+def _distance_column(dtw: DTW, sequences: List[np.ndarray], test_idx: int, use_time_sync: bool) -> np.ndarray:
+    """DTW distance of every utterance, as template, to one utterance as test"""
+    distances, _ = dtw.score_batch(sequences, sequences[test_idx], use_time_sync=use_time_sync, normalized=True)
+    return distances
+
+
+# Per-worker state, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec: Dict[str, Any], config: Dict[str, Any], use_time_sync: bool):
+    """Attach the shared utterances and build this worker's DTW"""
+    shm, views = attach_features(spec)
+    _worker.update(shm=shm, dtw=DTW(**config), sequences=views, use_time_sync=use_time_sync)
+
+
+def _column_task(test_idx: int) -> np.ndarray:
+    """Compute one column of the distance matrix in a worker"""
+    return _distance_column(_worker['dtw'], _worker['sequences'], test_idx, _worker['use_time_sync'])
+
+
+class DistanceMatrix:
+    def __init__(self, distances: np.ndarray, labels: Sequence[Hashable], fingerprint: str = ''):
+        """
+        All-pairs DTW distances between the utterances of a corpus
+
+        Entry [a, b] is the DTW distance with utterance a as template and
+        utterance b as test. Any split of the corpus into templates and tests
+        is then evaluated by indexing, without further DTW runs.
+
+        Args:
+            distances: Distance matrix (U x U)
+            labels: Class label of each utterance
+            fingerprint: Identifies the corpus and DTW settings the matrix was computed for
+        """
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.labels = np.array(labels)
+        self.fingerprint = fingerprint
+
+    @staticmethod
+    def flatten(recordings: Dict[Hashable, List[np.ndarray]]):
+        """Utterances and labels of a recordings dict in a fixed order"""
+        sequences = [features for recs in recordings.values() for features in recs]
+        labels = [label for label, recs in recordings.items() for _ in recs]
+        return sequences, labels
+
+    @staticmethod
+    def make_fingerprint(sequences: List[np.ndarray], dtw: DTW, use_time_sync: bool,
+                         cmvn: Optional[tuple] = None) -> str:
+        """Hash of the utterances and every setting that affects the distances"""
+        digest = hashlib.sha1()
+        config = dtw.config()
+        config['variance'] = None if config['variance'] is None else np.asarray(config['variance']).tolist()
+        config.pop('engine')  # engines agree, so a matrix from any of them can be reused
+        digest.update(json.dumps({'dtw': config, 'use_time_sync': use_time_sync}, sort_keys=True).encode())
+        for part in ([] if cmvn is None else cmvn):
+            digest.update(np.ascontiguousarray(part, dtype=np.float64).tobytes())
+        for features in sequences:
+            features = np.ascontiguousarray(features, dtype=np.float64)
+            digest.update(str(features.shape).encode())
+            digest.update(features.tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def compute(cls, recordings: Dict[Hashable, List[np.ndarray]], dtw: DTW, use_time_sync: bool = False,
+                workers: int = 1, cmvn: Optional[tuple] = None) -> 'DistanceMatrix':
+        """
+        Compute the all-pairs matrix, one test utterance (column) per task
+
+        Args:
+            recordings: Feature sequences per class label
+            dtw: DTW instance whose settings are used
+            use_time_sync: Whether to use time-synchronous DTW
+            workers: Number of worker processes (1 = serial)
+            cmvn: Corpus-level (mean, std); per-utterance normalization when None
+
+        Returns:
+            DistanceMatrix over all utterances
+        """
+        sequences, labels = cls.flatten(recordings)
+        fingerprint = cls.make_fingerprint(sequences, dtw, use_time_sync, cmvn)
+
+        # Every utterance is normalized once, whether it serves as template or test
+        store = TemplateStore(cmvn=cmvn, dim=sequences[0].shape[1])
+        for label, features in zip(labels, sequences):
+            store.add(label, features)
+        normalized = store.templates
+
+        if workers > 1:
+            shm, spec = publish_features(normalized)
+            try:
+                with Pool(processes=workers, initializer=_init_worker,
+                          initargs=(spec, dtw.config(), use_time_sync)) as pool:
+                    chunksize = max(1, len(normalized) // (4 * workers))
+                    columns = pool.map(_column_task, range(len(normalized)), chunksize=chunksize)
+            finally:
+                shm.close()
+                shm.unlink()
+        else:
+            columns = [_distance_column(dtw, normalized, b, use_time_sync) for b in range(len(normalized))]
+
+        return cls(np.stack(columns, axis=1), labels, fingerprint)
+
+    @classmethod
+    def load_or_compute(cls, path: str, recordings: Dict[Hashable, List[np.ndarray]], dtw: DTW,
+                        use_time_sync: bool = False, workers: int = 1,
+                        cmvn: Optional[tuple] = None) -> 'DistanceMatrix':
+        """Load the matrix saved at `path` if it matches the corpus and settings, else compute and save it"""
+        sequences, _ = cls.flatten(recordings)
+        fingerprint = cls.make_fingerprint(sequences, dtw, use_time_sync, cmvn)
+        if os.path.exists(path):
+            try:
+                matrix = cls.load(path)
+                if matrix.fingerprint == fingerprint:
+                    return matrix
+            except (OSError, ValueError, KeyError):
+                pass  # unreadable file, recompute it
+        matrix = cls.compute(recordings, dtw, use_time_sync, workers, cmvn)
+        matrix.save(path)
+        return matrix
+
+    def save(self, path: str):
+        """Write the matrix, labels and fingerprint to an .npz file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, distances=self.distances, labels=self.labels, fingerprint=np.array(self.fingerprint))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'DistanceMatrix':
+        """Read a matrix written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['distances'], data['labels'], str(data['fingerprint']))
+
+    def split_accuracy(self, template_idx: Sequence[int], test_idx: Sequence[int]) -> float:
+        """
+        Nearest-template accuracy of a template/test split
+
+        Args:
+            template_idx: Utterances used as templates
+            test_idx: Utterances used as tests
+
+        Returns:
+            Accuracy in percent
+        """
+        template_idx = np.asarray(template_idx, dtype=int)
+        test_idx = np.asarray(test_idx, dtype=int)
+        if len(test_idx) == 0:
+            raise ValueError("Split has no test utterances")
+        if len(template_idx) == 0:
+            return 0.0
+
+        block = self.distances[np.ix_(template_idx, test_idx)]
+        # First template wins ties, as in DTW.recognize()
+        best = np.argmin(block, axis=0)
+        found = np.isfinite(block[best, np.arange(len(test_idx))])
+        correct = found & (self.labels[template_idx[best]] == self.labels[test_idx])
+        return float(correct.mean() * 100)
+
+    def class_indices(self) -> Dict[Hashable, np.ndarray]:
+        """Utterance indices of each class, in corpus order"""
+        return {label: np.flatnonzero(self.labels == label) for label in dict.fromkeys(self.labels.tolist())}
+
+    def leave_one_out(self) -> float:
+        """Accuracy when each utterance is recognized against all the others"""
+        distances = self.distances.copy()
+        np.fill_diagonal(distances, np.inf)
+        # Lowest index wins ties
+        best = np.argmin(distances, axis=0)
+        found = np.isfinite(distances[best, np.arange(len(best))])
+        return float((found & (self.labels[best] == self.labels)).mean() * 100)
+
+    def k_fold(self, k: int = 5, seed: int = 0) -> float:
+        """
+        Accuracy averaged over k stratified folds; each fold is tested against the rest
+
+        Args:
+            k: Number of folds
+            seed: Seed for the shuffle within each class
+
+        Returns:
+            Mean accuracy in percent
+        """
+        rng = np.random.default_rng(seed)
+        fold = np.empty(len(self.labels), dtype=int)
+        for indices in self.class_indices().values():
+            fold[rng.permutation(indices)] = np.arange(len(indices)) % k
+
+        accuracies = []
+        for f in range(k):
+            test_idx = np.flatnonzero(fold == f)
+            if len(test_idx):
+                accuracies.append(self.split_accuracy(np.flatnonzero(fold != f), test_idx))
+        return float(np.mean(accuracies))
+
+    def template_count_accuracy(self, n_templates: int, n_tests: int = 5) -> float:
+        """
+        Accuracy of the split used by DigitRecognizer.test_recognition()
+
+        The first n_templates utterances of each class are templates and
+        utterances 1 .. n_tests are tests.
+        """
+        classes = self.class_indices().values()
+        template_idx = np.concatenate([indices[:n_templates] for indices in classes])
+        test_idx = np.concatenate([indices[1:n_tests + 1] for indices in classes])
+        return self.split_accuracy(template_idx, test_idx)
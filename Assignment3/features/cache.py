@@ -0,0 +1,213 @@
+import os
+import json
+import hashlib
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-1 of a file's content"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir: str, config: Dict):
+        """
+        On-disk cache of feature arrays keyed by file content and feature configuration
+
+        Entries are .npy files named after a hash of the source file content
+        and the configuration, so an edited recording or a changed MFCC setting
+        simply misses and is recomputed. An index of (size, mtime) per source
+        file and configuration lets unchanged files skip re-hashing. Each
+        configuration keeps its own entries, so runs with different settings
+        (e.g. float64 and float32 features) share a directory without evicting
+        each other; an entry is deleted once a file no longer maps to it under
+        that configuration.
+
+        Args:
+            cache_dir: Directory holding the cached arrays
+            config: Parameters that determine the features (e.g. MFCC.config())
+        """
+        self.cache_dir = cache_dir
+        self.config_tag = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index_path = os.path.join(cache_dir, self.INDEX_FILE)
+        self._index = self._read_index()
+        self._dirty = False
+        self._pending: Dict[str, Tuple[os.stat_result, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _read_index(self) -> Dict[str, Dict[str, Dict]]:
+        """Load the source file index, starting over if it is missing, unreadable or in an older layout"""
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(index, dict):
+            return {}
+        # path -> config tag -> record; a flat path -> record index predates per-config records
+        if not all(isinstance(records, dict) and all(isinstance(r, dict) for r in records.values())
+                   for records in index.values()):
+            return {}
+        return index
+
+    def _records(self):
+        """Every index record, over all source files and configurations"""
+        return (record for records in self._index.values() for record in records.values())
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.npy')
+
+    def _key(self, path: str, stat: os.stat_result) -> str:
+        """Cache key of a source file, hashing its content only when its stat changed"""
+        record = self._index.get(os.path.abspath(path), {}).get(self.config_tag)
+        if (record is not None
+                and record.get('size') == stat.st_size and record.get('mtime_ns') == stat.st_mtime_ns):
+            return record['key']
+        return hashlib.sha1((file_digest(path) + self.config_tag).encode()).hexdigest()
+
+    def load(self, path: str, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """
+        Features of a source file, from the cache when possible
+
+        Args:
+            path: Source file (e.g. a WAV recording)
+            compute: Computes the features on a cache miss
+
+        Returns:
+            Feature array; cached arrays are read-only memory maps
+        """
+        return self.load_many([path], lambda missing: [compute()])[0]
+
+    def load_many(self, paths: List[str],
+                  compute_many: Callable[[List[str]], List[np.ndarray]]) -> List[np.ndarray]:
+        """
+        Features of several source files, computing all cache misses in one call
+
+        Args:
+            paths: Source files
+            compute_many: Computes the features of a list of missing source files
+
+        Returns:
+            Feature array per source file, in input order; cached arrays are
+            read-only memory maps
+        """
+        results: List[Optional[np.ndarray]] = [self.get(path) for path in paths]
+        missing = [i for i, features in enumerate(results) if features is None]
+        if missing:
+            computed = compute_many([paths[i] for i in missing])
+            for i, features in zip(missing, computed):
+                results[i] = self.put(paths[i], features)
+        return results
+
+    def get(self, path: str) -> Optional[np.ndarray]:
+        """
+        Cached features of a source file
+
+        Args:
+            path: Source file
+
+        Returns:
+            Read-only memory map of the features, or None on a miss; the
+            features of a miss are then stored with put()
+        """
+        stat = os.stat(path)
+        key = self._key(path, stat)
+        features = self._read_entry(key)
+        if features is None:
+            # Remember the key so put() does not hash the file again
+            self._pending[os.path.abspath(path)] = (stat, key)
+            return None
+        self.hits += 1
+        self._record(path, stat, key)
+        return features
+
+    def put(self, path: str, features: np.ndarray) -> np.ndarray:
+        """
+        Store the computed features of a source file
+
+        Args:
+            path: Source file
+            features: Its features
+
+        Returns:
+            The stored features
+        """
+        pending = self._pending.pop(os.path.abspath(path), None)
+        if pending is None:
+            stat = os.stat(path)
+            pending = (stat, self._key(path, stat))
+        stat, key = pending
+        features = self._write_entry(key, features)
+        self.misses += 1
+        self._record(path, stat, key)
+        return features
+
+    def _read_entry(self, key: str) -> Optional[np.ndarray]:
+        """Memory-map a cached array, or None if it is missing or unreadable"""
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            return None
+        try:
+            return np.load(entry, mmap_mode='r')
+        except (OSError, ValueError):
+            return None  # truncated or corrupt entry, recompute it
+
+    def _write_entry(self, key: str, features: np.ndarray) -> np.ndarray:
+        """Store a computed array under its key"""
+        features = np.ascontiguousarray(features)
+        entry = self._entry_path(key)
+        # Write to a temporary file first so readers never see a partial entry
+        tmp = entry + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, features)
+        os.replace(tmp, entry)
+        return features
+
+    def _record(self, path: str, stat: os.stat_result, key: str):
+        """Point the index entry of a source file under this configuration at its current key"""
+        records = self._index.setdefault(os.path.abspath(path), {})
+        record = records.get(self.config_tag)
+        if record is None or record.get('key') != key or record.get('mtime_ns') != stat.st_mtime_ns:
+            records[self.config_tag] = {'key': key, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            # The entry this file used to map to under this configuration is stale now
+            if record is not None and record.get('key') != key:
+                self._remove_entry(record['key'])
+            self._dirty = True
+
+    def _remove_entry(self, key: str):
+        """Delete a cached array unless another source file or configuration still maps to it"""
+        if any(record.get('key') == key for record in self._records()):
+            return
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+
+    def prune(self):
+        """Forget source files that no longer exist and delete arrays no source file maps to"""
+        for path in [p for p in self._index if not os.path.exists(p)]:
+            del self._index[path]
+            self._dirty = True
+        live = {record['key'] + '.npy' for record in self._records()}
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npy') and name not in live:
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def save(self):
+        """Write the source file index back to disk if it changed"""
+        if not self._dirty:
+            return
+        tmp = self._index_path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+        self._dirty = False
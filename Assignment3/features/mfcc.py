@@ -1,7 +1,79 @@
 import numpy as np
 from scipy.fftpack import dct
-from typing import Tuple
+from typing import List, Optional, Tuple
+from functools import lru_cache
 import librosa
+from metrics import Metrics, NO_METRICS
+
+# Bump when the feature computation changes so cached features are recomputed
+FEATURE_VERSION = 3
+
+# Frames per filterbank product; see _mel_energies()
+MEL_BLOCK = 256
+
+
+@lru_cache(maxsize=None)
+def _hamming_window(frame_length: int) -> np.ndarray:
+    """Hamming window, built once per frame length"""
+    window = np.hamming(frame_length)
+    window.flags.writeable = False
+    return window
+
+
+@lru_cache(maxsize=None)
+def _mel_filterbank(sample_rate: int, n_fft: int, n_filters: int, low_freq: int, high_freq: int) -> np.ndarray:
+    """Mel filterbank, built once per configuration"""
+    mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_filters, fmin=low_freq, fmax=high_freq)
+    mel_basis.flags.writeable = False
+    return mel_basis
+
+
+def _mel_energies(mel_basis: np.ndarray, power_frames: np.ndarray) -> np.ndarray:
+    """
+    Filterbank energies of power spectra, in fixed blocks of MEL_BLOCK frames
+
+    BLAS picks its kernel by matrix shape, so a frame's result could change
+    with the number of frames processed together. Running one product of
+    the same shape per block, with the last block zero-padded, keeps every
+    frame's result the same whether it comes from a long batch or a few
+    streamed frames, at BLAS speed.
+
+    Args:
+        mel_basis: Mel filterbank (n_filters x n_bins)
+        power_frames: Power spectra, one per column (n_bins x n_frames)
+
+    Returns:
+        Filterbank energies (n_filters x n_frames)
+    """
+    n_frames = power_frames.shape[1]
+    energies = np.empty((len(mel_basis), n_frames), dtype=np.result_type(mel_basis, power_frames))
+    full = n_frames - n_frames % MEL_BLOCK
+    for start in range(0, full, MEL_BLOCK):
+        np.matmul(mel_basis, power_frames[:, start:start + MEL_BLOCK], out=energies[:, start:start + MEL_BLOCK])
+    if full < n_frames:
+        # Only the last, partial block is zero-padded to the full width
+        tail = np.zeros((power_frames.shape[0], MEL_BLOCK), dtype=power_frames.dtype)
+        tail[:, :n_frames - full] = power_frames[:, full:]
+        energies[:, full:] = (mel_basis @ tail)[:, :n_frames - full]
+    return energies
+
+
+def deltas_from_padded(padded: np.ndarray, N: int = 2) -> np.ndarray:
+    """
+    Delta features of frames that already carry N frames of context on each side
+
+    Args:
+        padded: Features with N context frames before and after (T + 2N x dim)
+        N: Number of frames on each side used for delta computation
+
+    Returns:
+        Delta features of the T inner frames
+    """
+    T = len(padded) - 2 * N
+    numerator = np.zeros((T, padded.shape[1]))
+    for n in range(1, N + 1):
+        numerator += n * (padded[N + n:N + n + T] - padded[N - n:N - n + T])
+    return numerator / (2 * sum(n * n for n in range(1, N + 1)))
 
 class MFCC:
     def __init__(self, 
@@ -9,7 +81,9 @@ class MFCC:
                  n_filters: int = 40,
                  n_ceps: int = 13,
                  low_freq: int = 50,
-                 high_freq: int = 7000):
+                 high_freq: int = 7000,
+                 metrics: Optional[Metrics] = None,
+                 dtype: str = 'float64'):
         """
         Initialize MFCC computation parameters
         
@@ -19,12 +93,34 @@ class MFCC:
             n_ceps: Number of cepstral coefficients
             low_freq: Lower frequency bound
             high_freq: Upper frequency bound
+            metrics: Collector timing the 'mfcc' stage (default: disabled)
+            dtype: Precision of the returned features ('float64' or
+                'float32'); computation is always float64, so float32
+                features are rounded float64 ones
         """
         self.sample_rate = sample_rate
         self.n_filters = n_filters
         self.n_ceps = n_ceps
         self.low_freq = low_freq
         self.high_freq = high_freq
+        self.frame_length = int(0.025 * sample_rate)  # 25ms
+        self.frame_step = int(0.010 * sample_rate)    # 10ms
+        self.metrics = metrics if metrics is not None else NO_METRICS
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError(f"MFCC features must be float32 or float64, got {dtype!r}")
+        self.dtype = np.dtype(dtype)
+    
+    def config(self) -> dict:
+        """Parameters that determine the computed features"""
+        return {
+            'sample_rate': self.sample_rate,
+            'n_filters': self.n_filters,
+            'n_ceps': self.n_ceps,
+            'low_freq': self.low_freq,
+            'high_freq': self.high_freq,
+            'version': FEATURE_VERSION,
+            'dtype': self.dtype.name,
+        }
         
     def compute_features(self, audio: np.ndarray) -> np.ndarray:
         """
@@ -36,19 +132,55 @@ class MFCC:
         Returns:
             39-dimensional feature vectors
         """
-        # Compute basic MFCC features
-        mfcc = self._compute_mfcc(audio)
+        with self.metrics.stage('mfcc'):
+            # Compute basic MFCC features
+            mfcc = self._compute_mfcc(audio)
+            
+            # Compute deltas
+            delta = self._compute_deltas(mfcc)
+            
+            # Compute double deltas
+            delta2 = self._compute_deltas(delta)
+            
+            # Concatenate features
+            features = np.hstack((mfcc, delta, delta2))
         
-        # Compute deltas
-        delta = self._compute_deltas(mfcc)
+        return features.astype(self.dtype, copy=False)
+    
+    def compute_features_batch(self, audios: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Compute 39-dimensional features of many utterances in one pass
         
-        # Compute double deltas
-        delta2 = self._compute_deltas(delta)
+        The frames of all utterances go through a single FFT, filterbank and
+        DCT pass, and deltas are computed over all utterances at once. Results
+        equal compute_features() on each utterance.
         
-        # Concatenate features
-        features = np.hstack((mfcc, delta, delta2))
+        Args:
+            audios: Input audio signals
+            
+        Returns:
+            39-dimensional feature vectors of each utterance, in input order
+        """
+        if len(audios) == 0:
+            return []
         
-        return features
+        with self.metrics.stage('mfcc'):
+            # Frame every utterance; pre-emphasis as in _compute_mfcc()
+            pre_emphasis = 0.97
+            frame_blocks = []
+            for audio in audios:
+                emphasized_audio = np.append(audio[0], audio[1:] - pre_emphasis * audio[:-1])
+                frame_blocks.append(
+                    librosa.util.frame(emphasized_audio, frame_length=self.frame_length, hop_length=self.frame_step)
+                )
+            counts = [block.shape[1] for block in frame_blocks]
+            
+            mfcc = self._frames_to_mfcc(np.hstack(frame_blocks))
+            delta = self._compute_deltas_ragged(mfcc, counts)
+            delta2 = self._compute_deltas_ragged(delta, counts)
+            features = np.hstack((mfcc, delta, delta2))
+        
+        return np.split(features.astype(self.dtype, copy=False), np.cumsum(counts)[:-1])
     
     def _compute_mfcc(self, audio: np.ndarray) -> np.ndarray:
         """Compute basic MFCC features"""
@@ -57,12 +189,22 @@ class MFCC:
         emphasized_audio = np.append(audio[0], audio[1:] - pre_emphasis * audio[:-1])
         
         # Framing
-        frame_length = int(0.025 * self.sample_rate)  # 25ms
-        frame_step = int(0.010 * self.sample_rate)    # 10ms
-        frames = librosa.util.frame(emphasized_audio, frame_length=frame_length, hop_length=frame_step)
+        frames = librosa.util.frame(emphasized_audio, frame_length=self.frame_length, hop_length=self.frame_step)
         
+        return self._frames_to_mfcc(frames)
+    
+    def _frames_to_mfcc(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Compute basic MFCC features of pre-emphasized frames
+        
+        Args:
+            frames: Pre-emphasized frames, one per column (frame_length x n_frames)
+            
+        Returns:
+            Cepstral coefficients (n_frames x n_ceps)
+        """
         # Windowing
-        window = np.hamming(frame_length)
+        window = _hamming_window(self.frame_length)
         windowed_frames = frames * window[:, np.newaxis]
         
         # FFT
@@ -70,14 +212,10 @@ class MFCC:
         power_frames = np.abs(fft_frames) ** 2
         
         # Mel filterbank
-        mel_basis = librosa.filters.mel(
-            sr=self.sample_rate,
-            n_fft=frame_length,
-            n_mels=self.n_filters,
-            fmin=self.low_freq,
-            fmax=self.high_freq
-        )
-        mel_features = np.dot(mel_basis, power_frames)
+        mel_basis = _mel_filterbank(self.sample_rate, self.frame_length, self.n_filters,
+                                    self.low_freq, self.high_freq)
+        # Fixed-size blocks, so streamed frames match batch ones exactly
+        mel_features = _mel_energies(mel_basis, power_frames)
         
         # Log
         log_mel_features = np.log(mel_features + 1e-10)
@@ -91,6 +229,10 @@ class MFCC:
         """
         Compute delta features
         
+        The first and last frames are replicated at the edges, so each delta
+        only depends on frames at most N away and can also be computed on a
+        stream (see StreamingMFCC).
+        
         Args:
             features: Input features
             N: Number of frames to use for delta computation
@@ -98,19 +240,36 @@ class MFCC:
         Returns:
             Delta features
         """
-        n_frames = len(features)
-        deltas = np.zeros_like(features)
+        if len(features) == 0:
+            return np.zeros_like(features)
+        padded = np.pad(features, ((N, N), (0, 0)), mode='edge')
+        return deltas_from_padded(padded, N)
+    
+    def _compute_deltas_ragged(self, features: np.ndarray, counts: List[int], N: int = 2) -> np.ndarray:
+        """
+        Delta features of several utterances stacked into one array
         
-        for t in range(n_frames):
-            numerator = 0
-            denominator = 0
-            
-            for n in range(1, N + 1):
-                if t + n < n_frames:
-                    numerator += n * (features[t + n] - features[t - n])
-                    denominator += n * n
+        Args:
+            features: Features of all utterances, stacked (sum(counts) x dim)
+            counts: Number of frames of each utterance
+            N: Number of frames to use for delta computation
             
-            if denominator != 0:
-                deltas[t] = numerator / (2 * denominator)
+        Returns:
+            Delta features, stacked the same way
+        """
+        counts = np.asarray(counts)
+        if counts.sum() == 0:
+            return np.zeros_like(features)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        
+        # Edge-pad each utterance by N frames, then run one filter over the whole stack
+        rows = np.concatenate([
+            np.clip(np.arange(-N, n + N), 0, n - 1) + start
+            for start, n in zip(starts, counts) if n > 0
+        ])
+        deltas = deltas_from_padded(features[rows], N)
         
-        return deltas 
\ No newline at end of file
+        # Output row r is centered on padded row r + N; keep the centers that are real frames
+        padded_starts = np.concatenate(([0], np.cumsum(counts[counts > 0] + 2 * N)[:-1]))
+        keep = np.concatenate([np.arange(n) + s for s, n in zip(padded_starts, counts[counts > 0])])
+        return deltas[keep]
@@ -0,0 +1,142 @@
+import numpy as np
+from typing import List
+from features.mfcc import MFCC, deltas_from_padded
+
+
+class _DeltaStream:
+    def __init__(self, N: int, dim: int):
+        """
+        Incremental delta computation with edge replication
+
+        Delta of frame t is final once frame t + N has arrived, or once the
+        stream has ended and the last frame is replicated in its place.
+
+        Args:
+            N: Number of frames on each side used for delta computation
+            dim: Feature dimension
+        """
+        self.N = N
+        self._frames = np.zeros((0, dim))
+        self._base = 0   # stream index of self._frames[0]
+        self._next = 0   # stream index of the next delta to emit
+
+    def push(self, frames: np.ndarray, final: bool = False) -> np.ndarray:
+        """
+        Add frames and return the deltas that became final
+
+        Args:
+            frames: New frames (k x dim)
+            final: Whether the stream ends after these frames
+
+        Returns:
+            Deltas of the frames that are now complete, in order
+        """
+        self._frames = np.vstack((self._frames, frames))
+        total = self._base + len(self._frames)
+        stop = total if final else total - self.N
+        if stop <= self._next or total == 0:
+            return np.zeros((0, self._frames.shape[1]))
+
+        # Context rows t - N .. t + N for every emitted t, clamped to the frames that exist
+        rows = np.clip(np.arange(self._next - self.N, stop + self.N), 0, total - 1) - self._base
+        deltas = deltas_from_padded(self._frames[rows], self.N)
+        self._next = stop
+
+        # Only frames that a later delta can still reach are kept
+        keep_from = max(self._next - self.N, 0)
+        self._frames = self._frames[keep_from - self._base:]
+        self._base = keep_from
+        return deltas
+
+
+class StreamingMFCC:
+    def __init__(self, mfcc: MFCC = None, N: int = 2):
+        """
+        Incremental 39-dimensional MFCC extraction from audio chunks of any size
+
+        Pre-emphasis state and the framing overlap are carried across chunks,
+        so the concatenated output equals MFCC.compute_features() on the whole
+        signal. A frame is emitted once its delta-deltas are final, i.e. with
+        a fixed look-ahead of 2N frames; flush() emits the rest at the end.
+
+        Args:
+            mfcc: Batch extractor whose configuration is used
+            N: Number of frames on each side used for delta computation
+        """
+        self.mfcc = mfcc if mfcc is not None else MFCC()
+        self.N = N
+        self.reset()
+
+    @property
+    def lookahead(self) -> int:
+        """Frames an output frame waits for after its own analysis window"""
+        return 2 * self.N
+
+    def reset(self):
+        """Start a new utterance"""
+        self._last_sample = None           # previous raw sample, for pre-emphasis
+        self._buffer = np.zeros(0)         # pre-emphasized samples from the next frame start on
+        n_ceps = self.mfcc.n_ceps
+        self._delta = _DeltaStream(self.N, n_ceps)
+        self._delta2 = _DeltaStream(self.N, n_ceps)
+        self._static: List[np.ndarray] = []   # static frames waiting for their deltas
+        self._deltas: List[np.ndarray] = []   # deltas waiting for their delta-deltas
+        self.frames_emitted = 0
+
+    def push(self, chunk: np.ndarray) -> np.ndarray:
+        """
+        Add an audio chunk
+
+        Args:
+            chunk: Next audio samples (any length)
+
+        Returns:
+            Feature frames that became final (k x 39), possibly none
+        """
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+        if len(chunk) == 0:
+            return self._emit(np.zeros((0, self.mfcc.n_ceps)), final=False)
+
+        # Pre-emphasis; the first sample of the utterance is kept as is
+        emphasized = np.empty_like(chunk)
+        emphasized[0] = chunk[0] if self._last_sample is None else chunk[0] - 0.97 * self._last_sample
+        emphasized[1:] = chunk[1:] - 0.97 * chunk[:-1]
+        self._last_sample = chunk[-1]
+        self._buffer = np.concatenate((self._buffer, emphasized))
+
+        # Frame every complete analysis window and keep the overlap
+        length, step = self.mfcc.frame_length, self.mfcc.frame_step
+        if len(self._buffer) < length:
+            return self._emit(np.zeros((0, self.mfcc.n_ceps)), final=False)
+        frames = np.lib.stride_tricks.sliding_window_view(self._buffer, length)[::step].T
+        self._buffer = self._buffer[frames.shape[1] * step:]
+        with self.mfcc.metrics.stage('mfcc'):
+            static = self.mfcc._frames_to_mfcc(frames)
+        return self._emit(static, final=False)
+
+    def flush(self) -> np.ndarray:
+        """
+        End the utterance and return the remaining frames
+
+        Returns:
+            Final feature frames (k x 39); the extractor is reset afterwards
+        """
+        features = self._emit(np.zeros((0, self.mfcc.n_ceps)), final=True)
+        self.reset()
+        return features
+
+    def _emit(self, static: np.ndarray, final: bool) -> np.ndarray:
+        """Feed new static frames through both delta stages and assemble finished frames"""
+        self._static.extend(static)
+        delta = self._delta.push(static, final)
+        self._deltas.extend(delta)
+        delta2 = self._delta2.push(delta, final)
+
+        k = len(delta2)
+        features = np.zeros((k, 3 * self.mfcc.n_ceps))
+        if k:
+            features = np.hstack((np.array(self._static[:k]), np.array(self._deltas[:k]), delta2))
+            del self._static[:k]
+            del self._deltas[:k]
+        self.frames_emitted += k
+        return features.astype(self.mfcc.dtype, copy=False)
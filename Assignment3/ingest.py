@@ -0,0 +1,183 @@
+import os
+import numpy as np
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import Pool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from corpus import read_wav
+from features.mfcc import MFCC
+from features.cache import FeatureCache
+from metrics import Metrics, NO_METRICS
+
+
+class Ingested(NamedTuple):
+    """Features of one recording"""
+    label: str
+    path: str
+    features: np.ndarray
+
+
+def scan_recordings(recordings_dir: str, labels: Sequence[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Recordings in a directory whose file name starts with one of the labels
+
+    Args:
+        recordings_dir: Directory to scan (not recursive)
+        labels: Class labels, matched as file name prefixes; the longest matching
+            label wins, so 'to' and 'today' can share a directory
+
+    Returns:
+        Iterator over (label, path), in directory order; other files are skipped
+    """
+    labels = sorted(labels, key=len, reverse=True)
+    with os.scandir(recordings_dir) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            for label in labels:
+                if entry.name.startswith(label):
+                    yield label, entry.path
+                    break
+
+
+class _Batch:
+    """Recordings decoded and featurized together"""
+    def __init__(self):
+        self.items: List[Tuple[str, str]] = []            # (label, path)
+        self.future: Optional[Future] = None              # set once the batch is submitted
+        self.features: Optional[List[np.ndarray]] = None  # set once the result is collected
+
+
+# Per-worker state, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(mfcc: MFCC):
+    """Keep this worker's feature extractor"""
+    _worker['mfcc'] = mfcc
+
+
+def _features_task(audios: List[np.ndarray]) -> List[np.ndarray]:
+    """Compute the features of one batch in a worker"""
+    return _worker['mfcc'].compute_features_batch(audios)
+
+
+def ingest_recordings(items: Iterable[Tuple[str, str]], mfcc: Optional[MFCC] = None,
+                      cache: Optional[FeatureCache] = None,
+                      decode: Callable[[str], np.ndarray] = read_wav,
+                      workers: int = 1, decode_threads: int = 4, batch_size: int = 16,
+                      max_pending: int = 4, metrics: Optional[Metrics] = None) -> Iterator[Ingested]:
+    """
+    Streaming ingestion pipeline: scan -> decode (threads) -> features (processes)
+
+    Recordings missing from the feature cache are grouped into batches.
+    A thread pool decodes each batch, and a process pool runs the batched
+    MFCC front-end on it. At most max_pending batches are in flight, so
+    memory stays flat however large the corpus is. Results are yielded as
+    their batch completes, in input order so that templates stay
+    deterministic.
+
+    Args:
+        items: (label, path) of each recording, e.g. from scan_recordings()
+        mfcc: Feature extractor (default: MFCC())
+        cache: Feature cache consulted before decoding and filled afterwards
+        decode: Reads the samples of a recording
+        workers: Number of feature worker processes (1 = in the decode threads)
+        decode_threads: Number of decode threads
+        batch_size: Recordings per feature batch
+        max_pending: Most batches decoded or featurized at the same time
+        metrics: Collector timing the 'decode' stage (default: disabled); the
+            'mfcc' stage is timed by the extractor's own collector
+
+    Returns:
+        Iterator over the ingested recordings
+    """
+    if mfcc is None:
+        mfcc = MFCC()
+    if metrics is None:
+        metrics = NO_METRICS
+    pool = Pool(processes=workers, initializer=_init_worker, initargs=(mfcc,)) if workers > 1 else None
+
+    def run_batch(paths: List[str]):
+        """Decode a batch, then featurize it in the pool or right here"""
+        with metrics.stage('decode'):
+            audios = [decode(path) for path in paths]
+        if pool is not None:
+            return pool.apply_async(_features_task, (audios,))
+        return mfcc.compute_features_batch(audios)
+
+    # One entry per recording in input order: Ingested for cache hits,
+    # (batch, index in batch) for recordings being computed
+    pending: deque = deque()
+    in_flight = 0
+    open_batch: Optional[_Batch] = None
+
+    def front_ready() -> bool:
+        """Whether the oldest entry can be yielded without waiting"""
+        entry = pending[0]
+        if isinstance(entry, Ingested):
+            return True
+        batch = entry[0]
+        if batch.features is not None:
+            return True
+        future = batch.future
+        return future is not None and future.done() and (pool is None or future.result().ready())
+
+    def collect(batch: _Batch):
+        """Wait for a batch and store its features in the cache"""
+        nonlocal in_flight
+        result = batch.future.result()
+        features = result.get() if pool is not None else result
+        in_flight -= 1
+        if cache is not None:
+            features = [cache.put(path, feats) for (_, path), feats in zip(batch.items, features)]
+        batch.features = features
+
+    def drain_front() -> Ingested:
+        """Remove the oldest entry, waiting for its batch if necessary"""
+        entry = pending.popleft()
+        if isinstance(entry, Ingested):
+            return entry
+        batch, idx = entry
+        if batch.features is None:
+            collect(batch)
+        label, path = batch.items[idx]
+        return Ingested(label, path, batch.features[idx])
+
+    def submit(executor: ThreadPoolExecutor) -> Iterator[Ingested]:
+        """Start the open batch once fewer than max_pending batches are in flight"""
+        nonlocal in_flight, open_batch
+        # Recordings of older batches all precede the open one's, so draining the front frees a slot
+        while in_flight >= max_pending:
+            yield drain_front()
+        open_batch.future = executor.submit(run_batch, [path for _, path in open_batch.items])
+        in_flight += 1
+        open_batch = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=decode_threads) as executor:
+            for label, path in items:
+                features = cache.get(path) if cache is not None else None
+                if features is not None:
+                    pending.append(Ingested(label, path, features))
+                else:
+                    if open_batch is None:
+                        open_batch = _Batch()
+                    pending.append((open_batch, len(open_batch.items)))
+                    open_batch.items.append((label, path))
+                # A full batch starts, and so does a partial one that cache hits are queued behind
+                if open_batch is not None and (len(open_batch.items) == batch_size
+                                               or len(pending) >= batch_size * max_pending):
+                    yield from submit(executor)
+                # Hand out whatever is already complete at the front
+                while pending and front_ready():
+                    yield drain_front()
+
+            if open_batch is not None:
+                yield from submit(executor)
+            while pending:
+                yield drain_front()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
@@ -0,0 +1,274 @@
+import time
+import wave
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Dict, Hashable, Iterator, List, NamedTuple, Optional, Sequence
+from dtw.dtw import DTW
+from dtw.beam import FrameSynchronousDecoder
+from dtw.templates import TemplateStore
+from features.mfcc import MFCC
+from features.streaming import StreamingMFCC
+from endpointing import Endpointer
+from capture import CallbackRecorder
+
+
+class AudioSource(ABC):
+    """Produces 16-bit mono audio as a sequence of chunks"""
+    rate: int = 16000
+    chunk_size: int = 1024
+
+    @abstractmethod
+    def chunks(self) -> Iterator[np.ndarray]:
+        """Yield audio chunks (int16 samples) until the source is exhausted or closed"""
+
+
+class WavSource(AudioSource):
+    def __init__(self, path: str, chunk_size: int = 1024, realtime: bool = False):
+        """
+        Audio source that plays back a 16-bit WAV file
+
+        Args:
+            path: WAV file
+            chunk_size: Samples per chunk
+            realtime: Whether to deliver chunks at the pace of a live microphone
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        with wave.open(path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"{path}: expected 16-bit samples, got {8 * wf.getsampwidth()}-bit")
+            self.rate = wf.getframerate()
+            self.channels = wf.getnchannels()
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        start = time.perf_counter()
+        delivered = 0
+        with wave.open(self.path, 'rb') as wf:
+            while True:
+                data = wf.readframes(self.chunk_size)
+                if not data:
+                    return
+                # First channel only for multi-channel files
+                samples = np.frombuffer(data, dtype='<i2')[::self.channels]
+                delivered += len(samples)
+                if self.realtime:
+                    # A microphone hands over a chunk only once it has been captured
+                    time.sleep(max(0.0, start + delivered / self.rate - time.perf_counter()))
+                yield samples
+
+
+class MicrophoneSource(AudioSource):
+    def __init__(self, rate: int = 16000, chunk_size: int = 1024, max_duration: Optional[float] = None):
+        """
+        Audio source reading from the default microphone through a PyAudio callback
+
+        Args:
+            rate: Sample rate in Hz
+            chunk_size: Samples per chunk
+            max_duration: Stop after this many seconds (None to run until interrupted)
+        """
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.max_duration = max_duration
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        # Capture runs in the PyAudio callback, so slow processing never stalls it
+        recorder = CallbackRecorder(rate=self.rate, chunk_size=self.chunk_size)
+        delivered = 0
+        with recorder:
+            while self.max_duration is None or delivered < self.max_duration * self.rate:
+                chunk = recorder.read_chunk()
+                if chunk is None:
+                    return  # the stream stopped
+                delivered += len(chunk)
+                yield chunk
+
+
+class UtteranceEvent(NamedTuple):
+    """Feature frames completed by one audio chunk"""
+    frames: np.ndarray  # finished feature frames (k x 39), possibly none
+    start: bool         # first event of an utterance
+    end: bool           # last event of an utterance; frames include the flushed look-ahead
+    start_time: float   # utterance start in the stream, seconds
+    end_time: float     # stream position after this chunk, seconds
+    arrival: float      # time.perf_counter() when the chunk was received
+
+
+def stream_utterances(source: AudioSource, endpointer: Optional[Endpointer] = None,
+                      features: Optional[StreamingMFCC] = None) -> Iterator[UtteranceEvent]:
+    """
+    Split an audio stream into utterances and extract their features incrementally
+
+    Args:
+        source: Audio to process
+        endpointer: Endpoint detector (default: one matching the audio source)
+        features: Streaming feature extractor (default: StreamingMFCC())
+
+    Returns:
+        Iterator over the chunks that belong to an utterance, in stream order
+    """
+    if endpointer is None:
+        endpointer = Endpointer(rate=source.rate, chunk_size=source.chunk_size)
+    if features is None:
+        features = StreamingMFCC()
+    endpointer.reset()
+
+    position = 0
+    start = 0
+    for chunk in source.chunks():
+        arrival = time.perf_counter()
+        state = endpointer.update(chunk)
+        position += len(chunk)
+        if state == Endpointer.SILENCE:
+            continue
+
+        if state == Endpointer.START:
+            pre_roll = endpointer.take_pre_roll()
+            start = position - len(chunk) - sum(len(c) for c in pre_roll)
+            features.reset()
+            frames = [features.push(previous) for previous in pre_roll]
+            frames.append(features.push(chunk))
+        else:
+            frames = [features.push(chunk)]
+        if state == Endpointer.END:
+            frames.append(features.flush())
+
+        yield UtteranceEvent(np.vstack(frames), state == Endpointer.START, state == Endpointer.END,
+                             start / source.rate, position / source.rate, arrival)
+
+    # Stream ended in the middle of an utterance
+    if endpointer.in_speech:
+        endpointer.reset()
+        yield UtteranceEvent(features.flush(), False, True, start / source.rate, position / source.rate,
+                             time.perf_counter())
+
+
+def extract_utterances(source: AudioSource, endpointer: Optional[Endpointer] = None,
+                       mfcc: Optional[MFCC] = None) -> List[np.ndarray]:
+    """
+    Features of every utterance in an audio stream, segmented exactly as LiveRecognizer does
+
+    Templates for live recognition should come from here, so that they are
+    cut by the same endpointing as the live test utterances.
+
+    Args:
+        source: Audio to process
+        endpointer: Endpoint detector (default: one matching the audio source)
+        mfcc: Feature extractor configuration (default: MFCC())
+
+    Returns:
+        Feature sequence (n_frames x 39) per utterance
+    """
+    utterances: List[np.ndarray] = []
+    frames: List[np.ndarray] = []
+    for event in stream_utterances(source, endpointer, StreamingMFCC(mfcc)):
+        if event.start:
+            frames = []
+        frames.append(event.frames)
+        if event.end:
+            utterance = np.vstack(frames)
+            if len(utterance):
+                utterances.append(utterance)
+    return utterances
+
+
+class LiveResult(NamedTuple):
+    """One recognized utterance"""
+    label: Optional[Hashable]
+    distance: float
+    start: float    # utterance start in the stream, seconds
+    end: float      # endpoint in the stream, seconds
+    latency: float  # seconds from receiving the endpoint chunk to the result
+
+
+class LiveRecognizer:
+    def __init__(self, store: TemplateStore, dtw: Optional[DTW] = None, mfcc: Optional[MFCC] = None,
+                 endpointer: Optional[Endpointer] = None, beam: float = np.inf):
+        """
+        Continuous recognition: audio chunks -> endpointing -> streaming MFCC -> DTW
+
+        With corpus-level CMVN in the template store every feature frame is
+        normalized and scored by the frame-synchronous decoder as soon as it
+        is extracted, so after the endpoint only the look-ahead frames remain.
+        With per-utterance normalization the statistics need the whole
+        utterance, so its frames are buffered and decoded at the endpoint;
+        the delay is then bounded by the endpointer's maximum utterance length.
+
+        Args:
+            store: Templates to recognize against
+            dtw: DTW settings (default: DTW())
+            mfcc: Feature extractor configuration (default: MFCC())
+            endpointer: Endpoint detector (default: one matching the audio source);
+                templates should be cut with the same one (see extract_utterances())
+            beam: Pruning threshold of the frame-synchronous decoder
+        """
+        self.store = store
+        self.dtw = dtw if dtw is not None else DTW()
+        self.features = StreamingMFCC(mfcc)
+        self.endpointer = endpointer
+        self.decoder = FrameSynchronousDecoder(self.dtw, store.templates, store.labels, beam, normalized=True)
+        self.online = store.cmvn is not None
+        self.latencies: List[float] = []
+
+    def listen(self, source: AudioSource) -> Iterator[LiveResult]:
+        """
+        Recognize every utterance in an audio stream
+
+        Args:
+            source: Audio to listen to
+
+        Returns:
+            Iterator over the recognized utterances, each yielded as soon as it is decided
+        """
+        for event in stream_utterances(source, self.endpointer, self.features):
+            if event.start:
+                self._begin()
+            self._consume(event.frames)
+            if event.end:
+                label, distance = self._finish()
+                latency = time.perf_counter() - event.arrival
+                self.latencies.append(latency)
+                yield LiveResult(label, distance, event.start_time, event.end_time, latency)
+
+    def latency_percentiles(self, percentiles: Sequence[float] = (50, 90, 99)) -> Dict[float, float]:
+        """
+        Endpoint-to-result latency percentiles over all utterances so far
+
+        Args:
+            percentiles: Percentiles to report
+
+        Returns:
+            Latency in seconds per percentile (empty before the first utterance)
+        """
+        if not self.latencies:
+            return {}
+        values = np.percentile(self.latencies, percentiles)
+        return {p: float(v) for p, v in zip(percentiles, values)}
+
+    def _begin(self):
+        """Start a new utterance"""
+        self._frames: List[np.ndarray] = []
+        if self.online:
+            self.decoder.reset()
+
+    def _consume(self, frames: np.ndarray):
+        """Score new feature frames right away, or keep them until the endpoint"""
+        if not len(frames):
+            return
+        if self.online:
+            for frame in self.store.normalize(frames):
+                self.decoder.step(frame)
+        else:
+            self._frames.append(frames)
+
+    def _finish(self):
+        """Decide the utterance once all of its frames are in"""
+        if self.online:
+            idx, distance = self.decoder.best()
+        else:
+            frames = np.vstack(self._frames) if self._frames else np.zeros((0, 3 * self.features.mfcc.n_ceps))
+            if len(frames) == 0:
+                return None, float('inf')
+            idx, distance = self.decoder.decode(self.store.normalize(frames), normalized=True)
+        return (self.store.labels[idx] if idx >= 0 else None), distance
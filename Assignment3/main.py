@@ -1,16 +1,28 @@
 import os
 import numpy as np
 import matplotlib.pyplot as plt
-from typing import List, Dict
-import wave
-import struct
+from typing import List, Dict, Optional, Sequence
 import sys
 import logging
+import tempfile
 from datetime import datetime
 sys.path.append('.')  # Add current directory to Python path
 from Assignment1 import record_audio
 from dtw.dtw import DTW
+from dtw.beam import FrameSynchronousDecoder
+from dtw.templates import TemplateStore, corpus_cmvn_stats
+from dtw.barycenter import condense
+from dtw.connected import word_errors
+from recognition import classify_utterance, classify_parallel, classify_from_db
+from sweep import RecognitionSweep, SweepConfig
+from evaluation import DistanceMatrix
+from live import AudioSource, LiveRecognizer, MicrophoneSource, WavSource, extract_utterances
 from features.mfcc import MFCC
+from features.cache import FeatureCache
+from corpus import RecordingCorpus, read_wav
+from template_db import TemplateDB
+from ingest import scan_recordings, ingest_recordings
+from metrics import Metrics, NO_METRICS
 
 # Setup logging
 def setup_logging():
@@ -31,52 +43,160 @@ def setup_logging():
     return logging.getLogger(__name__)
 
 def read_wav_file(filename: str) -> np.ndarray:
-    """Read WAV file and return audio samples"""
-    with wave.open(filename, 'rb') as wf:
-        n_frames = wf.getnframes()
-        frames = wf.readframes(n_frames)
-        samples = struct.unpack(str(n_frames) + 'h', frames)
-        return np.array(samples)
+    """Read a 16-bit mono WAV file and return audio samples (int16)"""
+    return read_wav(filename)
+
+# Default vocabulary; recordings are named '<word>_<n>.wav'
+DIGITS = ('zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine')
+
+# Ways setup_templates() can choose the templates of each digit
+TEMPLATE_STRATEGIES = ('first', 'medoids', 'dba')
+
+# Precision modes: (feature dtype, template storage, DTW cost dtype)
+PRECISIONS = {
+    'float64': ('float64', 'float64', 'float64'),
+    'float32': ('float32', 'float32', 'float32'),
+    'int8': ('float32', 'int8', 'float32'),
+}
 
 class DigitRecognizer:
-    def __init__(self, logger):
-        self.mfcc = MFCC()
-        self.dtw = DTW()
+    def __init__(self, logger, cache_dir: Optional[str] = "feature_cache",
+                 corpus_dir: Optional[str] = "recording_corpus", metrics: Optional[Metrics] = None,
+                 precision: str = 'float64', vocabulary: Sequence[str] = DIGITS, db_dir: Optional[str] = None,
+                 memory_budget: int = 64 << 20):
+        """
+        cache_dir: where computed MFCC features of recordings are cached (None to disable)
+        corpus_dir: where recordings are packed into one memory-mapped file (None to read each WAV)
+        metrics: collector for stage timings and DTW counters (None to disable)
+        precision: one of PRECISIONS - float64 throughout, float32 features, templates and
+            DTW costs, or int8-quantized templates with float32 features and costs
+        vocabulary: words to recognize; recordings are named '<word>_<n>.wav'
+        db_dir: keep recording features in a TemplateDB there and load them on demand
+            instead of holding them all in memory (None to disable)
+        memory_budget: bytes of features the TemplateDB keeps resident
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision!r} (expected one of {sorted(PRECISIONS)})")
+        self.precision = precision
+        self.feature_dtype, self.template_dtype, self.cost_dtype = PRECISIONS[precision]
+        self.metrics = metrics if metrics is not None else NO_METRICS
+        self.mfcc = MFCC(metrics=self.metrics, dtype=self.feature_dtype)
+        self.vocabulary = list(vocabulary)
+        self.cache_dir = cache_dir
+        self.corpus_dir = corpus_dir
+        self.db_dir = db_dir
+        self.memory_budget = memory_budget
+        self.template_db: Optional[TemplateDB] = None
+        self.corpus: Optional[RecordingCorpus] = None
+        self.dtw = DTW(metrics=self.metrics, dtype=self.cost_dtype)
         self.templates: Dict[str, List[np.ndarray]] = {}
-        self.recordings: Dict[str, List[np.ndarray]] = {}
+        self.template_store = TemplateStore(metrics=self.metrics, dtype=self.template_dtype)
+        # Plain lists, or lazy TemplateDB views when db_dir is set
+        self.recordings: Dict[str, Sequence[np.ndarray]] = {}
+        self.recording_files: Dict[str, List[str]] = {}
         self.logger = logger
         
-    def load_existing_recordings(self):
-        """Load existing recordings from the recordings directory"""
+    def load_existing_recordings(self, workers: int = 1):
+        """
+        Load existing recordings from the recordings directory
+        
+        workers: number of processes computing features of uncached recordings (1 = in-process)
+        """
         recordings_dir = "recordings"
         if not os.path.exists(recordings_dir):
             self.logger.error(f"Recordings directory not found: {recordings_dir}")
             return False
-            
-        digits = ['zero', 'one', 'two', 'three', 'four', 
-                 'five', 'six', 'seven', 'eight', 'nine']
         
+        digits = self.vocabulary
+        
+        # Features are only recomputed for new or changed recordings, or a new MFCC config
+        cache = FeatureCache(self.cache_dir, self.mfcc.config()) if self.cache_dir else None
+        
+        items = scan_recordings(recordings_dir, digits)
+        decode = read_wav_file
+        # All recordings are served from one packed, memory-mapped file
+        if self.corpus_dir:
+            items = list(items)
+            self.corpus = RecordingCorpus.load_or_pack(self.corpus_dir, items)
+            decode = self.corpus.audio
+        
+        if self.db_dir:
+            return self._load_into_db(items, cache, decode, workers)
+        
+        # Scan -> decode -> features, streamed with a bounded number of batches in flight
+        recordings: Dict[str, List[np.ndarray]] = {digit: [] for digit in digits}
+        recording_files: Dict[str, List[str]] = {digit: [] for digit in digits}
+        for recording in ingest_recordings(items, self.mfcc, cache, decode, workers=workers,
+                                           metrics=self.metrics):
+            recordings[recording.label].append(recording.features)
+            recording_files[recording.label].append(recording.path)
+            self.logger.info(f"Loaded recording: {os.path.basename(recording.path)}")
+        
+        # A digit without recordings is left out rather than failing the whole load
+        self.recordings = {}
+        self.recording_files = {}
         for digit in digits:
-            self.recordings[digit] = []
-            digit_files = [f for f in os.listdir(recordings_dir) if f.startswith(digit)]
-            
-            if not digit_files:
-                self.logger.error(f"No recordings found for digit: {digit}")
-                return False
-                
-            for file in digit_files:
-                file_path = os.path.join(recordings_dir, file)
-                audio = read_wav_file(file_path)
-                features = self.mfcc.compute_features(audio)
-                self.recordings[digit].append(features)
-                self.logger.info(f"Loaded recording: {file}")
+            if not recordings[digit]:
+                self.logger.warning(f"No recordings found for digit: {digit}")
+                continue
+            self.recordings[digit] = recordings[digit]
+            self.recording_files[digit] = recording_files[digit]
+        
+        if cache is not None:
+            cache.prune()
+            cache.save()
+            self.logger.info(f"Feature cache: {cache.hits} hits, {cache.misses} recomputed")
+        
+        if not self.recordings:
+            self.logger.error(f"No recordings found in {recordings_dir}")
+            return False
+        return True
+    
+    def _load_into_db(self, items, cache: Optional[FeatureCache], decode, workers: int) -> bool:
+        """Bring the TemplateDB up to date with the recordings and serve them from it"""
+        items = list(items)
+        if self.template_db is None:
+            self.template_db = TemplateDB(self.db_dir, self.mfcc.config(), self.memory_budget, self.metrics)
+        db = self.template_db
         
+        # Only new or changed recordings are featurized; the rest stay on disk until used
+        stale = [(label, path) for label, path in items if not db.is_current(path)]
+        for recording in ingest_recordings(stale, self.mfcc, cache, decode, workers=workers,
+                                           metrics=self.metrics):
+            db.put(recording.label, recording.features, source=recording.path)
+            self.logger.info(f"Added recording: {os.path.basename(recording.path)}")
+        removed = db.remove_missing(path for _, path in items)
+        db.save()
+        if cache is not None:
+            cache.prune()
+            cache.save()
+        self.logger.info(f"Template database: {len(db)} entries of {len(db.labels)} words, "
+                         f"{len(stale)} added or updated, {removed} removed")
+        
+        self.recordings = db.by_label(self.vocabulary)
+        self.recording_files = {label: view.sources for label, view in self.recordings.items()}
+        for digit in self.vocabulary:
+            if digit not in self.recordings:
+                self.logger.warning(f"No recordings found for digit: {digit}")
+        if not self.recordings:
+            self.logger.error("No recordings found")
+            return False
         return True
         
+    def _fill_db(self, db_dir: str) -> TemplateDB:
+        """TemplateDB in db_dir holding the features of the loaded recordings"""
+        db = TemplateDB(db_dir, self.mfcc.config(), self.memory_budget, self.metrics)
+        for digit, files in self.recording_files.items():
+            for features, path in zip(self.recordings[digit], files):
+                if not db.is_current(path):
+                    db.put(digit, features, source=path)
+        db.remove_missing(path for files in self.recording_files.values() for path in files)
+        db.save()
+        return db
+        
     def record_digits(self, n_instances: int = 10):
         """Record multiple instances of each digit"""
-        digits = ['zero', 'one', 'two', 'three', 'four', 
-                 'five', 'six', 'seven', 'eight', 'nine']
+        digits = self.vocabulary
         
         self.logger.info("\n=== Recording Instructions ===")
         self.logger.info("1. You will be asked to record each digit multiple times")
@@ -89,6 +209,7 @@ class DigitRecognizer:
         
         for digit in digits:
             self.recordings[digit] = []
+            self.recording_files[digit] = []
             self.logger.info(f"\n=== Recording digit: '{digit}' ===")
             
             for i in range(n_instances):
@@ -113,70 +234,257 @@ class DigitRecognizer:
                 audio = read_wav_file(output_file)
                 features = self.mfcc.compute_features(audio)
                 self.recordings[digit].append(features)
+                self.recording_files[digit].append(output_file)
+                if self.template_db is not None:
+                    self.template_db.put(digit, features, source=output_file)
                 
                 self.logger.info(f"Recording {i+1} completed for '{digit}'")
+        
+        if self.template_db is not None:
+            self.template_db.save()
     
-    def setup_templates(self, n_templates: int = 1):
-        """Setup templates from recordings"""
+    def setup_templates(self, n_templates: int = 1, global_cmvn: bool = False, strategy: str = 'first',
+                        n_source: Optional[int] = None, n_tests: int = 5):
+        """
+        Setup templates from recordings
+        
+        global_cmvn: normalize with statistics of the whole corpus instead of per utterance
+        strategy: how each digit's n_templates templates are chosen
+            'first'   - the first n_templates recordings
+            'medoids' - medoids of n_templates k-medoids clusters of the recordings
+            'dba'     - DTW Barycenter Average of each k-medoids cluster
+        n_source: recordings per digit that 'medoids'/'dba' draw from (default: all
+            outside the tests)
+        n_tests: test utterances per digit of test_recognition() (recordings 1 .. n_tests),
+            which 'medoids'/'dba' never draw from
+        """
+        if strategy not in TEMPLATE_STRATEGIES:
+            raise ValueError(f"Unknown template strategy: {strategy!r} (expected one of {TEMPLATE_STRATEGIES})")
         self.templates = {}
+        cmvn = None
+        if global_cmvn:
+            cmvn = corpus_cmvn_stats(f for recordings in self.recordings.values() for f in recordings)
+        # Templates are normalized once here, not on every comparison
+        self.template_store = TemplateStore(cmvn=cmvn, metrics=self.metrics, dtype=self.template_dtype)
         for digit, recordings in self.recordings.items():
-            self.templates[digit] = recordings[:n_templates]
+            if strategy == 'first':
+                self.templates[digit] = recordings[:n_templates]
+                self.template_store.extend(digit, self.templates[digit])
+                continue
+            # Clustering and averaging work on normalized sequences, so the results are stored as is
+            held_out = [f for i, f in enumerate(recordings) if not 1 <= i <= n_tests]
+            source = [self.template_store.normalize(f) for f in held_out[:n_source]]
+            self.templates[digit] = condense(self.dtw, source, n_templates, average=(strategy == 'dba'))
+            self.template_store.extend(digit, self.templates[digit], normalized=True)
+    
+    def live_recognition(self, source: AudioSource, n_templates: int = 3, global_cmvn: bool = False,
+                         beam: float = np.inf):
+        """
+        Recognize digits continuously from an audio source until it ends (or Ctrl+C)
+        
+        Templates are re-segmented from the first n_templates recordings of each
+        digit with the live endpointing, so they match the live utterances.
+        global_cmvn: normalize with corpus statistics, which lets every frame be
+        scored as it arrives instead of at the endpoint
+        """
+        templates: Dict[str, List[np.ndarray]] = {}
+        for digit, paths in self.recording_files.items():
+            templates[digit] = [u for path in paths[:n_templates] for u in extract_utterances(WavSource(path))]
+        
+        cmvn = None
+        if global_cmvn:
+            cmvn = corpus_cmvn_stats(u for utterances in templates.values() for u in utterances)
+        store = TemplateStore(cmvn=cmvn, metrics=self.metrics, dtype=self.template_dtype)
+        for digit, utterances in templates.items():
+            store.extend(digit, utterances)
+        
+        recognizer = LiveRecognizer(store, DTW(metrics=self.metrics, dtype=self.cost_dtype), self.mfcc, beam=beam)
+        self.logger.info("\n=== Live Recognition (Ctrl+C to stop) ===")
+        try:
+            for result in recognizer.listen(source):
+                self.logger.info(
+                    f"[{result.start:7.2f}s - {result.end:7.2f}s] Recognized as: {result.label} "
+                    f"(distance {result.distance:.2f}, latency {result.latency * 1000:.1f} ms)"
+                )
+        except KeyboardInterrupt:
+            pass
+        
+        percentiles = recognizer.latency_percentiles()
+        if percentiles:
+            self.logger.info("Endpoint-to-result latency: " + ", ".join(
+                f"p{p:g} {latency * 1000:.1f} ms" for p, latency in percentiles.items()
+            ))
+        return recognizer.latencies
     
-    def test_recognition(self, n_tests: int = 5, use_time_sync: bool = False, use_pruning: bool = False, band_ratio: float = None):
-        """Test recognition accuracy"""
+    def test_recognition(self, n_tests: int = 5, use_time_sync: bool = False, use_pruning: bool = False, band_ratio: float = None,
+                         use_lower_bounds: bool = False, beam: Optional[float] = None, workers: int = 1):
+        """
+        Test recognition accuracy
+        
+        beam: run frame-synchronous beam search with this beam width
+        workers: number of processes to spread test utterances over (1 = serial)
+        """
         # Create DTW instance with pruning if enabled
         if use_pruning and band_ratio is not None:
-            self.dtw = DTW(band_ratio=band_ratio)
+            self.dtw = DTW(band_ratio=band_ratio, metrics=self.metrics, dtype=self.cost_dtype)
         else:
-            self.dtw = DTW()
+            self.dtw = DTW(metrics=self.metrics, dtype=self.cost_dtype)
             
         digits = list(self.templates.keys())
-        correct = 0
-        total = 0
+        template_list = self.template_store.templates
+        template_labels = self.template_store.labels
+        # Use the next recording as test, normalized like the templates
+        tests = [(digit, i, self.template_store.normalize(self.recordings[digit][i + 1]))
+                 for digit in digits for i in range(n_tests)]
         
         self.logger.info("\n=== Testing Recognition ===")
+        self.logger.info(f"Templates: {len(self.template_store)} stored as {self.template_store.dtype}, "
+                         f"{self.template_store.nbytes / 1024:.1f} KiB")
         
-        for digit in digits:
-            self.logger.info(f"\nTesting digit '{digit}'")
+        if workers > 1:
+            results = classify_parallel(
+                self.dtw, [features for _, _, features in tests], template_list, template_labels,
+                workers, use_time_sync, use_lower_bounds, beam, normalized=True
+            )
+        else:
+            decoder = (FrameSynchronousDecoder(self.dtw, template_list, template_labels, beam, normalized=True,
+                                               use_time_sync=use_time_sync)
+                       if beam is not None else None)
+            results = [
+                classify_utterance(self.dtw, features, template_list, template_labels,
+                                   use_time_sync, use_lower_bounds, decoder, normalized=True)
+                for _, _, features in tests
+            ]
+        
+        correct = 0
+        total = 0
+        totals: Dict[str, int] = {}
+        
+        for (digit, i, _), (recognized_digit, min_dist, stats) in zip(tests, results):
+            if i == 0:
+                self.logger.info(f"\nTesting digit '{digit}'")
+            self.logger.info(f"\nTest {i+1}/{n_tests}")
             
-            for i in range(n_tests):
-                self.logger.info(f"\nTest {i+1}/{n_tests}")
-                test_features = self.recordings[digit][i + 1]  # Use the next recording as test
-                
-                # Try recognition with each template
-                min_dist = float('inf')
-                recognized_digit = None
-                
-                for template_digit, templates in self.templates.items():
-                    # Use recognize method which properly applies pruning
-                    template_idx, dist = self.dtw.recognize(templates, test_features, use_time_sync)
-                    
-                    if dist < min_dist:
-                        min_dist = dist
-                        recognized_digit = template_digit
-                
-                if recognized_digit == digit:
-                    correct += 1
-                total += 1
-                
-                self.logger.info(f"Recognized as: {recognized_digit}")
-                self.logger.info(f"Actual digit: {digit}")
+            if recognized_digit == digit:
+                correct += 1
+            total += 1
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+            
+            self.logger.info(f"Recognized as: {recognized_digit}")
+            self.logger.info(f"Actual digit: {digit}")
         
         accuracy = correct / total * 100
         self.logger.info(f"\nOverall accuracy: {accuracy:.2f}%")
+        if beam is not None:
+            self.logger.info(f"Beam search evaluated {totals.get('cells', 0)} DTW cells (beam = {beam})")
+        elif use_lower_bounds:
+            self.logger.info(
+                f"Templates pruned: LB_Kim {totals.get('lb_kim', 0)}, LB_Keogh {totals.get('lb_keogh', 0)}, "
+                f"early abandon {totals.get('abandoned', 0)}, full DTW {totals.get('dtw', 0)} "
+                f"(of {totals.get('templates', 0)})"
+            )
+        return accuracy
+    
+    def test_database_recognition(self, n_tests: int = 5, use_time_sync: bool = False,
+                                  max_ratio: Optional[float] = None, db_dir: Optional[str] = None):
+        """
+        Test recognition against every other entry of the template database
+        
+        The tests are the same recordings as in test_recognition(); all remaining
+        entries serve as templates. Only templates whose length can match a test
+        are loaded and compared.
+        
+        max_ratio: skip templates more than this many times longer or shorter than the test
+        db_dir: without a database from the constructor's db_dir, fill one there with the
+            loaded recordings
+        """
+        if self.template_db is not None:
+            db = self.template_db
+        elif db_dir is not None:
+            db = self._fill_db(db_dir)
+        else:
+            raise RuntimeError("No template database; pass db_dir or construct DigitRecognizer with db_dir")
+        tests = [(digit, db.ids(digit)[i + 1]) for digit in self.recordings
+                 for i in range(min(n_tests, len(db.ids(digit)) - 1))]
+        exclude = {idx for _, idx in tests}
+        
+        correct = 0
+        skipped = 0
+        for digit, idx in tests:
+            recognized_digit, _, stats = classify_from_db(self.dtw, db.load(idx), db, use_time_sync,
+                                                          max_ratio, exclude=exclude)
+            correct += recognized_digit == digit
+            skipped += stats['skipped']
+        
+        accuracy = correct / len(tests) * 100 if tests else 0.0
+        self.logger.info(f"Database recognition: {accuracy:.2f}% accuracy, {skipped} of "
+                         f"{len(tests) * (len(db) - len(exclude))} comparisons skipped by length "
+                         f"(max ratio {max_ratio}), {db.misses} loads, {db.evictions} evictions")
+        return accuracy
+    
+    def recognize_digit_string(self, audio: np.ndarray, max_digits: Optional[int] = None,
+                               word_penalty: float = 0.0) -> List[str]:
+        """
+        Recognize digits spoken one after another, without segmenting the audio first
+        
+        Uses the templates of the last setup_templates() call.
+        
+        max_digits: most digits in the string (default: unbounded)
+        word_penalty: cost added per digit after the first; raise it if digits get inserted
+        """
+        features = self.template_store.normalize(self.mfcc.compute_features(audio))
+        digits, _, _ = self.dtw.recognize_connected(
+            self.template_store.templates, features, self.template_store.labels,
+            word_penalty, max_digits, normalized=True
+        )
+        return digits
+    
+    def test_connected_recognition(self, n_strings: int = 20, max_digits: int = 4,
+                                   word_penalty: float = 0.0, seed: int = 0):
+        """
+        Test connected-digit recognition on strings made by joining test recordings
+        
+        Each string joins the audio of 2 to max_digits random recordings without
+        pauses. Recordings are drawn from those after the first n_templates of each
+        digit, i.e. ones 'first' templates were not made from.
+        
+        Returns:
+            Word accuracy in percent (100 minus the word error rate)
+        """
+        rng = np.random.default_rng(seed)
+        digits = list(self.templates.keys())
+        errors = 0
+        words = 0
+        correct_strings = 0
+        for _ in range(n_strings):
+            spoken = [digits[k] for k in rng.integers(0, len(digits), int(rng.integers(2, max_digits + 1)))]
+            tests = [self.recording_files[digit][len(self.templates[digit]):] for digit in spoken]
+            audio = np.concatenate([read_wav_file(files[int(rng.integers(len(files)))]) for files in tests])
+            recognized = self.recognize_digit_string(audio, max_digits, word_penalty)
+            string_errors = word_errors(spoken, recognized)
+            errors += string_errors
+            words += len(spoken)
+            correct_strings += string_errors == 0
+            self.logger.info(f"Spoken: {' '.join(spoken)} | Recognized: {' '.join(recognized)}")
+        
+        accuracy = 100 - errors / words * 100
+        self.logger.info(f"Word accuracy: {accuracy:.2f}%, strings fully correct: {correct_strings}/{n_strings}")
         return accuracy
 
 def main():
     # Setup logging
     logger = setup_logging()
-    recognizer = DigitRecognizer(logger)
+    # Stage timings and DTW counters of the recognizer, reported at the end
+    recognizer = DigitRecognizer(logger, metrics=Metrics())
     
     # Ask user whether to record new digits or use existing recordings
     while True:
-        choice = input("\nDo you want to:\n1. Record new digits\n2. Use existing recordings\nEnter your choice (1 or 2): ")
-        if choice in ['1', '2']:
+        choice = input("\nDo you want to:\n1. Record new digits\n2. Use existing recordings\n"
+                       "3. Live recognition from the microphone\nEnter your choice (1, 2 or 3): ")
+        if choice in ['1', '2', '3']:
             break
-        print("Invalid choice. Please enter 1 or 2.")
+        print("Invalid choice. Please enter 1, 2 or 3.")
     
     if choice == '1':
         logger.info("=== Starting Recording Process ===")
@@ -186,33 +494,38 @@ def main():
         recognizer.record_digits(n_instances=10)
     else:
         logger.info("=== Loading Existing Recordings ===")
-        if not recognizer.load_existing_recordings():
+        if not recognizer.load_existing_recordings(workers=os.cpu_count() or 1):
             logger.error("Failed to load existing recordings. Exiting...")
             return
+        if choice == '3':
+            recognizer.live_recognition(MicrophoneSource())
+            recognizer.metrics.log(logger)
+            return
+    
+    # Every setting below is evaluated from one set of local distances
+    band_ratios = [0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4]
+    template_counts = range(1, 6)  # 1 to 5 templates
+    configs = (
+        [SweepConfig(n_templates=1), SweepConfig(n_templates=1, use_time_sync=True)]
+        + [SweepConfig(band_ratio=ratio, use_time_sync=True) for ratio in band_ratios]
+        + [SweepConfig(n_templates=n, use_time_sync=True) for n in template_counts]
+    )
+    sweep = RecognitionSweep(recognizer.recordings, n_tests=5, max_templates=max(template_counts))
+    # Test utterances are spread over all cores; templates and tests go through shared memory
+    accuracies = sweep.evaluate(configs, workers=os.cpu_count() or 1)
+    accuracy_single, accuracy_time_sync = accuracies[:2]
+    accuracies_band = accuracies[2:2 + len(band_ratios)]
+    accuracies_templates = accuracies[2 + len(band_ratios):]
     
-    # Test with single template
     logger.info("\n=== Testing with Single Template ===")
-    recognizer.setup_templates(n_templates=1)
-    accuracy_single = recognizer.test_recognition(n_tests=5, use_time_sync=False)
+    logger.info(f"Overall accuracy: {accuracy_single:.2f}%")
     
-    # Test with time-synchronous DTW
     logger.info("\n=== Testing with Time-Synchronous DTW ===")
-    accuracy_time_sync = recognizer.test_recognition(n_tests=5, use_time_sync=True)
+    logger.info(f"Overall accuracy: {accuracy_time_sync:.2f}%")
     
-    # Test with different band ratios
     logger.info("\n=== Testing with Different Band Ratios ===")
-    band_ratios = [0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4]
-    accuracies_band = []
-    
-    for band_ratio in band_ratios:
-        logger.info(f"\nTesting with band ratio: {band_ratio}")
-        accuracy = recognizer.test_recognition(
-            n_tests=5, 
-            use_time_sync=True,
-            use_pruning=True,
-            band_ratio=band_ratio
-        )
-        accuracies_band.append(accuracy)
+    for band_ratio, accuracy in zip(band_ratios, accuracies_band):
+        logger.info(f"Band ratio {band_ratio}: {accuracy:.2f}% accuracy")
     
     # Plot band ratio results
     plt.figure(figsize=(10, 6))
@@ -224,16 +537,9 @@ def main():
     plt.savefig('band_ratio_results.png')
     plt.close()
     
-    # Test with different numbers of templates
     logger.info("\n=== Testing with Different Numbers of Templates ===")
-    template_counts = range(1, 6)  # 1 to 5 templates
-    accuracies_templates = []
-    
-    for n_templates in template_counts:
-        logger.info(f"\nTesting with {n_templates} template(s)...")
-        recognizer.setup_templates(n_templates=n_templates)
-        accuracy = recognizer.test_recognition(n_tests=5, use_time_sync=True)
-        accuracies_templates.append(accuracy)
+    for n_templates, accuracy in zip(template_counts, accuracies_templates):
+        logger.info(f"{n_templates} template(s): {accuracy:.2f}% accuracy")
     
     # Plot template count results
     plt.figure(figsize=(10, 6))
@@ -245,10 +551,29 @@ def main():
     plt.savefig('template_results.png')
     plt.close()
     
+    # Cross-validated accuracy from one all-pairs distance matrix, reused across runs
+    logger.info("\n=== Cross-Validation over All Recordings ===")
+    matrix = DistanceMatrix.load_or_compute(
+        "distance_matrix.npz", recognizer.recordings, DTW(), workers=os.cpu_count() or 1
+    )
+    accuracy_loo = matrix.leave_one_out()
+    accuracy_kfold = matrix.k_fold(k=5)
+    logger.info(f"Leave-one-out accuracy: {accuracy_loo:.2f}%")
+    logger.info(f"5-fold accuracy: {accuracy_kfold:.2f}%")
+    
+    logger.info("\n=== Recognition from the Template Database ===")
+    # The database only lives for this test
+    with tempfile.TemporaryDirectory() as db_dir:
+        recognizer.test_database_recognition(n_tests=5, max_ratio=3.0, db_dir=db_dir)
+    
+    logger.info("\n=== Connected-Digit Recognition ===")
+    recognizer.setup_templates(n_templates=3)
+    recognizer.test_connected_recognition(n_strings=20, max_digits=4)
+    
     # Plot DTW cost matrices for a sample comparison
     logger.info("\n=== Generating DTW Cost Matrix Visualizations ===")
-    sample_digit = list(recognizer.templates.keys())[0]
-    sample_template = recognizer.templates[sample_digit][0]
+    sample_digit = list(recognizer.recordings.keys())[0]
+    sample_template = recognizer.recordings[sample_digit][0]
     sample_test = recognizer.recordings[sample_digit][1]
     
     dtw = DTW(band_ratio=0.2)
@@ -272,17 +597,25 @@ def main():
     best_template_count = template_counts[np.argmax(accuracies_templates)]
     logger.info(f"   - Best performing template count: {best_template_count} ({max(accuracies_templates):.2f}% accuracy)")
     
-    logger.info("\n4. Overall Best Configuration:")
+    logger.info("\n4. Cross-Validation (standard DTW, all recordings):")
+    logger.info(f"   - Leave-one-out accuracy: {accuracy_loo:.2f}%")
+    logger.info(f"   - 5-fold accuracy: {accuracy_kfold:.2f}%")
+    
+    logger.info("\n5. Overall Best Configuration:")
     logger.info(f"   - Best accuracy achieved: {max(max(accuracies_band), max(accuracies_templates)):.2f}%")
     logger.info(f"   - Recommended settings:")
     logger.info(f"     * Band ratio: {best_band_ratio:.2f}")
     logger.info(f"     * Number of templates: {best_template_count}")
     logger.info(f"     * Time-synchronous DTW: {'Yes' if accuracy_time_sync > accuracy_single else 'No'}")
     
-    logger.info("\n5. Visualization Files:")
+    logger.info("\n6. Visualization Files:")
     logger.info("   - Band ratio results: 'band_ratio_results.png'")
     logger.info("   - Template count results: 'template_results.png'")
     logger.info("   - DTW cost matrices: 'dtw_cost_matrix.png' and 'time_synchronous_dtw_cost_matrix.png'")
+    
+    logger.info("\n7. Where Time Went (recognizer stages):")
+    for line in recognizer.metrics.summary():
+        logger.info(f"   - {line}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
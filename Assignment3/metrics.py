@@ -0,0 +1,175 @@
+import time
+import logging
+import threading
+import numpy as np
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+
+def band_cells(N: int, M: int, band: int) -> int:
+    """Number of cells (i, j) of an N x M matrix with |i - j| <= band"""
+    if N == 0 or M == 0:
+        return 0
+    i = np.arange(1, N + 1)
+    return int(np.clip(np.minimum(M, i + band) - np.maximum(1, i - band) + 1, 0, None).sum())
+
+
+class _Stage:
+    """Context manager adding its wall time to one stage of a Metrics collector"""
+    __slots__ = ('_metrics', '_name', '_start')
+
+    def __init__(self, metrics: 'Metrics', name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self._metrics.add_time(self._name, time.perf_counter() - self._start)
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self):
+        """
+        Collector of per-stage wall time and search counters
+
+        Stages are timed with `with metrics.stage('dtw'): ...`. Counters
+        record DTW cells evaluated against the full N x M, the band of each
+        recurrence and the templates pruned. Components take a collector as
+        their `metrics` argument and default to NO_METRICS, whose methods do
+        nothing. Collection therefore costs almost nothing unless it is
+        switched on.
+
+        Updates are thread-safe. Collectors copied into worker processes are
+        not merged back.
+        """
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __getstate__(self):
+        # Locks cannot be pickled; a copy in a worker process gets its own
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Clear all timings and counters"""
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def stage(self, name: str) -> _Stage:
+        """Context manager timing one call of a stage (e.g. 'decode', 'mfcc', 'normalize', 'dtw')"""
+        return _Stage(self, name)
+
+    def add_time(self, name: str, seconds: float):
+        """Add the wall time of one call of a stage"""
+        with self._lock:
+            self.seconds[name] += seconds
+            self.calls[name] += 1
+
+    def add(self, name: str, value: int = 1):
+        """Increase a counter"""
+        with self._lock:
+            self.counters[name] += value
+
+    def count_dtw(self, N: int, M: int, band: int, cells: Optional[int] = None):
+        """
+        Record one banded recurrence over an N x M local cost matrix
+
+        `cells` overrides the count of the full band, for searches that
+        evaluate only part of it (coarse-to-fine DTW).
+        """
+        if cells is None:
+            cells = band_cells(N, M, band)
+        with self._lock:
+            self.counters['dtw_pairs'] += 1
+            self.counters['cells'] += cells
+            self.counters['full_cells'] += N * M
+            self.counters['band_sum'] += band
+
+    def snapshot(self) -> Dict:
+        """
+        Current values as plain dicts
+
+        Returns:
+            Dict with 'seconds' and 'calls' per stage and 'counters', plus
+            the derived 'cell_fraction' (cells / full_cells) and 'mean_band'
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            snapshot = {'seconds': dict(self.seconds), 'calls': dict(self.calls), 'counters': counters}
+        if counters.get('full_cells'):
+            snapshot['cell_fraction'] = counters.get('cells', 0) / counters['full_cells']
+        if counters.get('dtw_pairs'):
+            snapshot['mean_band'] = counters.get('band_sum', 0) / counters['dtw_pairs']
+        return snapshot
+
+    def summary(self) -> List[str]:
+        """Human-readable report, one line per stage or counter"""
+        snapshot = self.snapshot()
+        lines = []
+        total = sum(snapshot['seconds'].values())
+        for name, seconds in sorted(snapshot['seconds'].items(), key=lambda item: -item[1]):
+            calls = snapshot['calls'][name]
+            share = seconds / total * 100 if total else 0.0
+            lines.append(f"{name:<12} {seconds * 1000:10.1f} ms  {share:5.1f}%  "
+                         f"({calls} calls, {seconds / calls * 1e6:.1f} us each)")
+        counters = snapshot['counters']
+        if 'cell_fraction' in snapshot:
+            lines.append(f"DTW cells: {counters.get('cells', 0)} of {counters['full_cells']} "
+                         f"({snapshot['cell_fraction'] * 100:.1f}%)")
+        if 'mean_band' in snapshot:
+            lines.append(f"Mean band: {snapshot['mean_band']:.1f} frames over {counters['dtw_pairs']} pairs")
+        if 'templates' in counters:
+            lines.append(f"Templates: {counters['templates']} considered, LB_Kim {counters.get('lb_kim', 0)}, "
+                         f"LB_Keogh {counters.get('lb_keogh', 0)}, abandoned {counters.get('abandoned', 0)}, "
+                         f"full DTW {counters.get('dtw', 0)}")
+        return lines
+
+    def log(self, logger: logging.Logger, level: int = logging.INFO):
+        """Write summary() to a logger"""
+        for line in self.summary():
+            logger.log(level, line)
+
+
+class NullMetrics:
+    """Disabled collector: every method is a no-op"""
+    enabled = False
+    _stage = nullcontext()
+
+    def reset(self):
+        pass
+
+    def stage(self, name: str):
+        return self._stage
+
+    def add_time(self, name: str, seconds: float):
+        pass
+
+    def add(self, name: str, value: int = 1):
+        pass
+
+    def count_dtw(self, N: int, M: int, band: int, cells: Optional[int] = None):
+        pass
+
+    def snapshot(self) -> Dict:
+        return {'seconds': {}, 'calls': {}, 'counters': {}}
+
+    def summary(self) -> List[str]:
+        return []
+
+    def log(self, logger: logging.Logger, level: int = logging.INFO):
+        pass
+
+
+# Shared default for components created without a collector
+NO_METRICS = NullMetrics()
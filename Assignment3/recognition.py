@@ -0,0 +1,218 @@
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+from dtw.dtw import DTW
+from dtw.beam import FrameSynchronousDecoder
+
+
+def classify_utterance(dtw: DTW, test_features: np.ndarray, template_list: List[np.ndarray],
+                       template_labels: List[Hashable], use_time_sync: bool = False,
+                       use_lower_bounds: bool = False,
+                       decoder: Optional[FrameSynchronousDecoder] = None,
+                       normalized: bool = False) -> Tuple[Optional[Hashable], float, Dict[str, int]]:
+    """
+    Recognize one test utterance against a flat template list
+
+    Args:
+        dtw: DTW instance
+        test_features: Test feature sequence
+        template_list: Templates of all classes
+        template_labels: Class label of each template
+        use_time_sync: Whether to use time-synchronous DTW
+        use_lower_bounds: Whether to use the lower-bound cascade (otherwise batched full scoring)
+        decoder: Frame-synchronous decoder over the same templates; takes precedence when given
+        normalized: Whether the templates and test are already normalized (e.g. by a TemplateStore)
+
+    Returns:
+        Tuple of (recognized label or None, distance, search counters for this utterance)
+    """
+    stats: Dict[str, int] = {}
+
+    if decoder is not None:
+        # All templates advance together, one test frame at a time
+        template_idx, min_dist = decoder.decode(test_features, normalized)
+        stats['cells'] = decoder.cells_evaluated
+        return (template_labels[template_idx] if template_idx >= 0 else None), min_dist, stats
+
+    if use_lower_bounds:
+        # Nearest template overall via the lower-bound cascade
+        template_idx, min_dist, stages = dtw.search(template_list, test_features, use_time_sync, normalized)
+        stats['templates'] = len(stages)
+        for stage in stages:
+            stats[stage] = stats.get(stage, 0) + 1
+        return (template_labels[template_idx] if template_idx >= 0 else None), min_dist, stats
+
+    # Score against every template of every digit in one batched pass
+    _, class_minima = dtw.score_batch(template_list, test_features, template_labels, use_time_sync, normalized)
+    min_dist = float('inf')
+    recognized = None
+    for label, dist in class_minima.items():
+        if dist < min_dist:
+            min_dist = dist
+            recognized = label
+    return recognized, min_dist, stats
+
+
+def classify_from_db(dtw: DTW, test_features: np.ndarray, db, use_time_sync: bool = False,
+                     max_ratio: Optional[float] = None, labels: Optional[List[Hashable]] = None,
+                     exclude: Optional[Set[int]] = None,
+                     use_lower_bounds: bool = False) -> Tuple[Optional[Hashable], float, Dict[str, int]]:
+    """
+    Recognize one test utterance against the entries of a TemplateDB
+
+    Only the entries whose length can match the test under the band (and
+    within max_ratio) are loaded and compared; the rest are counted as
+    'skipped'. Templates and test are normalized per call.
+
+    Args:
+        dtw: DTW instance
+        test_features: Test feature sequence
+        db: TemplateDB holding the templates
+        use_time_sync: Whether to use time-synchronous DTW
+        max_ratio: Largest allowed ratio between template and test length (None: band only)
+        labels: Labels to consider (default: all)
+        exclude: Entries to leave out, e.g. the test utterance itself
+        use_lower_bounds: Whether to use the lower-bound cascade (otherwise batched full scoring)
+
+    Returns:
+        Tuple of (recognized label or None, distance, search counters for this utterance)
+    """
+    ids = db.candidates(len(test_features), dtw, use_time_sync, max_ratio, labels)
+    if exclude:
+        ids = [i for i in ids if i not in exclude]
+    total = len(db) if labels is None else sum(len(db.ids(label)) for label in labels)
+    if exclude:
+        total -= sum(1 for i in exclude if labels is None or db.records[i]['label'] in labels)
+
+    template_list = [db.load(i) for i in ids]
+    template_labels = [db.records[i]['label'] for i in ids]
+    if template_list:
+        label, min_dist, stats = classify_utterance(dtw, test_features, template_list, template_labels,
+                                                    use_time_sync, use_lower_bounds)
+    else:
+        label, min_dist, stats = None, float('inf'), {}
+    stats['skipped'] = total - len(ids)
+    return label, min_dist, stats
+
+
+def publish_features(arrays: List[np.ndarray]) -> Tuple[SharedMemory, Dict[str, Any]]:
+    """
+    Copy feature arrays into one shared memory block
+
+    float32 arrays are shared as float32, at half the size.
+
+    Args:
+        arrays: Feature sequences (n_frames x dim), all with the same dim
+
+    Returns:
+        Tuple of (shared memory block - the caller must close and unlink it,
+        spec that attach_features() needs to map the arrays back)
+    """
+    lengths = np.array([len(a) for a in arrays], dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+    dim = arrays[0].shape[1]
+    total = int(lengths.sum())
+    dtype = np.result_type(np.float32, *[a.dtype for a in arrays])
+
+    shm = SharedMemory(create=True, size=max(total * dim * dtype.itemsize, 1))
+    packed = np.ndarray((total, dim), dtype=dtype, buffer=shm.buf)
+    for offset, array in zip(offsets, arrays):
+        packed[offset:offset + len(array)] = array
+
+    spec = {'name': shm.name, 'shape': (total, dim), 'dtype': dtype.str, 'offsets': offsets, 'lengths': lengths}
+    return shm, spec
+
+
+def attach_features(spec: Dict[str, Any]) -> Tuple[SharedMemory, List[np.ndarray]]:
+    """
+    Map arrays published by publish_features() without copying them
+
+    Args:
+        spec: Spec returned by publish_features()
+
+    Returns:
+        Tuple of (attached shared memory block, read-only feature views)
+    """
+    # Pool workers share the parent's resource tracker, so attaching does not
+    # take ownership; the publishing process unlinks the block
+    shm = SharedMemory(name=spec['name'])
+    packed = np.ndarray(spec['shape'], dtype=spec['dtype'], buffer=shm.buf)
+    packed.flags.writeable = False
+    views = [packed[o:o + n] for o, n in zip(spec['offsets'], spec['lengths'])]
+    return shm, views
+
+
+# Per-worker state, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec: Dict[str, Any], n_templates: int, template_labels: List[Hashable],
+                 config: Dict[str, Any], options: Dict[str, Any]):
+    """Attach the shared features and build this worker's DTW and decoder"""
+    shm, views = attach_features(spec)
+    dtw = DTW(**config)
+    template_list = views[:n_templates]
+    beam = options['beam']
+    _worker.update(
+        shm=shm,
+        dtw=dtw,
+        templates=template_list,
+        tests=views[n_templates:],
+        labels=template_labels,
+        options=options,
+        decoder=(FrameSynchronousDecoder(dtw, template_list, template_labels, beam, options['normalized'],
+                                         options['use_time_sync'])
+                 if beam is not None else None),
+    )
+
+
+def _classify_task(test_idx: int) -> Tuple[Optional[Hashable], float, Dict[str, int]]:
+    """Recognize one published test utterance in a worker"""
+    options = _worker['options']
+    return classify_utterance(
+        _worker['dtw'], _worker['tests'][test_idx], _worker['templates'], _worker['labels'],
+        options['use_time_sync'], options['use_lower_bounds'], _worker['decoder'], options['normalized']
+    )
+
+
+def classify_parallel(dtw: DTW, tests: List[np.ndarray], template_list: List[np.ndarray],
+                      template_labels: List[Hashable], workers: int, use_time_sync: bool = False,
+                      use_lower_bounds: bool = False,
+                      beam: Optional[float] = None,
+                      normalized: bool = False) -> List[Tuple[Optional[Hashable], float, Dict[str, int]]]:
+    """
+    Recognize many test utterances on a process pool
+
+    Templates and test features are published once through shared memory;
+    each task only carries the index of its test utterance. Results come
+    back in the order of `tests`, whatever order the workers finish in.
+
+    Args:
+        dtw: DTW instance whose configuration the workers copy
+        tests: Test feature sequences
+        template_list: Templates of all classes
+        template_labels: Class label of each template
+        workers: Number of worker processes
+        use_time_sync: Whether to use time-synchronous DTW
+        use_lower_bounds: Whether to use the lower-bound cascade
+        beam: Beam width for frame-synchronous decoding (None to disable)
+        normalized: Whether the templates and tests are already normalized
+
+    Returns:
+        classify_utterance() result for every test utterance, in input order
+    """
+    shm, spec = publish_features(list(template_list) + list(tests))
+    options = {'use_time_sync': use_time_sync, 'use_lower_bounds': use_lower_bounds, 'beam': beam,
+               'normalized': normalized}
+    try:
+        with Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(spec, len(template_list), list(template_labels), dtw.config(), options)
+        ) as pool:
+            chunksize = max(1, len(tests) // (4 * workers))
+            return pool.map(_classify_task, range(len(tests)), chunksize=chunksize)
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,172 @@
+import numpy as np
+from multiprocessing import Pool
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from dtw.dtw import DTW
+from dtw.kernels import get_batch_kernel
+from dtw.templates import TemplateStore
+from recognition import publish_features, attach_features
+
+
+class SweepConfig(NamedTuple):
+    """One recognition setting evaluated by RecognitionSweep"""
+    band_ratio: float = 0.2
+    alpha: float = 0.15
+    use_time_sync: bool = False
+    n_templates: int = 1
+
+
+class RecognitionSweep:
+    def __init__(self, recordings: Dict[Hashable, List[np.ndarray]], n_tests: int = 5, max_templates: int = 5,
+                 engine: str = 'auto', metric: str = 'euclidean', variance: Optional[np.ndarray] = None,
+                 cmvn: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        """
+        Evaluate many recognition settings over the same template/test pairs
+
+        Uses the split of DigitRecognizer.test_recognition(): the first
+        n_templates recordings of each digit are templates and recordings
+        1 .. n_tests are tests. The local cost matrix of a test against every
+        template is computed once and shared by all settings, and settings
+        that give a pair the same band share its DTW recurrence too.
+
+        Args:
+            recordings: Feature sequences per class label
+            n_tests: Test utterances per class
+            max_templates: Largest n_templates any setting may use
+            engine: Recurrence kernel (see DTW)
+            metric: Frame distance (see DTW)
+            variance: Per-dimension variance for the Mahalanobis metric
+            cmvn: Corpus-level (mean, std); per-utterance normalization when None
+        """
+        self.dtw = DTW(engine=engine, metric=metric, variance=variance)
+        self._batch_kernel = get_batch_kernel(engine)
+        self.n_tests = n_tests
+        self.max_templates = max_templates
+
+        # Templates and tests are normalized once for the whole sweep
+        self.store = TemplateStore(cmvn=cmvn)
+        rank = []  # position of each template within its class
+        for label, sequences in recordings.items():
+            for r, features in enumerate(sequences[:max_templates]):
+                self.store.add(label, features)
+                rank.append(r)
+        self.rank = np.array(rank)
+        self.tests = [(label, self.store.normalize(sequences[i + 1]))
+                      for label, sequences in recordings.items() for i in range(n_tests)]
+
+    def evaluate(self, configs: List[SweepConfig], workers: int = 1) -> List[float]:
+        """
+        Recognition accuracy of every setting in one pass over the test utterances
+
+        Args:
+            configs: Settings to evaluate
+            workers: Number of processes to spread the test utterances over (1 = serial)
+
+        Returns:
+            Accuracy in percent per setting, in input order
+        """
+        for config in configs:
+            if not 1 <= config.n_templates <= self.max_templates:
+                raise ValueError(f"n_templates must be in 1..{self.max_templates}, got {config.n_templates}")
+
+        if workers > 1 and len(self.tests) > 1:
+            best = self._evaluate_parallel(configs, workers)
+        else:
+            state = self._state(configs)
+            best = [_best_templates(state, test_norm) for _, test_norm in self.tests]
+
+        labels = self.store.labels
+        correct = np.zeros(len(configs), dtype=int)
+        for (actual, _), best_idx in zip(self.tests, best):
+            for c, idx in enumerate(best_idx):
+                if idx >= 0 and labels[idx] == actual:
+                    correct[c] += 1
+        return (correct / len(self.tests) * 100).tolist()
+
+    def _state(self, configs: List[SweepConfig]) -> Dict[str, Any]:
+        """Everything _best_templates() needs besides the test itself"""
+        return {
+            'dtw': self.dtw,
+            'batch_kernel': self._batch_kernel,
+            'packed': self.store.packed,
+            'offsets': self.store.offsets,
+            'lengths': self.store.lengths,
+            'rank': self.rank,
+            'configs': configs,
+        }
+
+    def _evaluate_parallel(self, configs: List[SweepConfig], workers: int) -> List[np.ndarray]:
+        """Best template per setting for every test, computed on a process pool"""
+        # Templates and tests are published once; each task only carries a test index
+        shm, spec = publish_features([self.store.packed] + [test_norm for _, test_norm in self.tests])
+        try:
+            with Pool(
+                processes=workers,
+                initializer=_init_worker,
+                initargs=(spec, self.store.offsets, self.store.lengths, self.rank,
+                          self.dtw.config(), configs)
+            ) as pool:
+                chunksize = max(1, len(self.tests) // (4 * workers))
+                return pool.map(_sweep_task, range(len(self.tests)), chunksize=chunksize)
+        finally:
+            shm.close()
+            shm.unlink()
+
+
+def _bands(lengths: np.ndarray, config: SweepConfig, M: int) -> np.ndarray:
+    """Band of every template against a test of M frames under one setting"""
+    dtw = DTW(band_ratio=config.band_ratio, alpha=config.alpha)
+    bands = np.array([dtw.compute_adaptive_band(N, M) for N in lengths])
+    return np.minimum(bands, 1) if config.use_time_sync else bands
+
+
+def _best_templates(state: Dict[str, Any], test_norm: np.ndarray) -> np.ndarray:
+    """
+    Nearest template of one normalized test under every setting
+
+    Returns:
+        Template index per setting (-1 when no template has an in-band path)
+    """
+    configs, lengths = state['configs'], state['lengths']
+    M = len(test_norm)
+    # One local cost matrix against all templates, reused by every setting
+    local = state['dtw'].packed_local_cost(state['packed'], lengths, test_norm)
+
+    bands = np.array([_bands(lengths, config, M) for config in configs])
+    in_use = np.array([state['rank'] < config.n_templates for config in configs])
+
+    # Run each distinct (template, band) recurrence once
+    template_idx = np.broadcast_to(np.arange(len(lengths)), bands.shape)[in_use]
+    pairs, inverse = np.unique(np.stack((template_idx, bands[in_use]), axis=1), axis=0,
+                               return_inverse=True)
+    pair_dist = state['batch_kernel'](local, state['offsets'][pairs[:, 0]], lengths[pairs[:, 0]], pairs[:, 1])
+
+    distances = np.full(bands.shape, np.inf)
+    distances[in_use] = pair_dist[inverse.ravel()]
+    # First template wins ties, as in DTW.recognize()
+    best = np.argmin(distances, axis=1)
+    return np.where(np.isfinite(distances[np.arange(len(configs)), best]), best, -1)
+
+
+# Per-worker state, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec: Dict[str, Any], offsets: np.ndarray, lengths: np.ndarray, rank: np.ndarray,
+                 config: Dict[str, Any], configs: List[SweepConfig]):
+    """Attach the shared templates and tests and build this worker's DTW"""
+    shm, views = attach_features(spec)
+    dtw = DTW(**config)
+    _worker.update(shm=shm, tests=views[1:], state={
+        'dtw': dtw,
+        'batch_kernel': get_batch_kernel(dtw.engine),
+        'packed': views[0],
+        'offsets': offsets,
+        'lengths': lengths,
+        'rank': rank,
+        'configs': configs,
+    })
+
+
+def _sweep_task(test_idx: int) -> np.ndarray:
+    """Best template per setting for one published test in a worker"""
+    return _best_templates(_worker['state'], _worker['tests'][test_idx])
@@ -0,0 +1,319 @@
+import os
+import json
+import math
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+from metrics import Metrics, NO_METRICS
+
+
+class LabelView(Sequence):
+    """The sequences of one label, loaded from a TemplateDB on access"""
+
+    def __init__(self, db: 'TemplateDB', ids: Sequence[int]):
+        self.db = db
+        self.ids = list(ids)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[np.ndarray, List[np.ndarray]]:
+        if isinstance(idx, slice):
+            return [self.db.load(i) for i in self.ids[idx]]
+        return self.db.load(self.ids[idx])
+
+    @property
+    def lengths(self) -> List[int]:
+        """Number of frames of each sequence, from the index"""
+        return [self.db.records[i]['length'] for i in self.ids]
+
+    @property
+    def sources(self) -> List[Optional[str]]:
+        """Source file of each sequence, from the index"""
+        return [self.db.records[i]['source'] for i in self.ids]
+
+
+class TemplateDB:
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, db_dir: str, config: Optional[Dict] = None, memory_budget: int = 64 << 20,
+                 metrics: Optional[Metrics] = None):
+        """
+        Feature sequences of any vocabulary, indexed on disk and loaded on demand
+
+        The index keeps every entry's label, length, speaker and source file,
+        so lookups by label or length never touch the feature files. Each
+        sequence lives in its own .npy file and is read when first needed.
+        Loaded sequences stay resident until their total size exceeds
+        memory_budget, after which the least recently used ones are dropped.
+        Arrays a caller still holds stay alive, so the budget only bounds
+        what the database keeps.
+
+        Entries are addressed by their position in `records`; remove_missing()
+        renumbers them. A database written under a different config is
+        emptied on opening.
+
+        Args:
+            db_dir: Directory of the database (created if missing)
+            config: Parameters that determine the features (e.g. MFCC.config())
+            memory_budget: Bytes of loaded sequences to keep resident
+            metrics: Collector timing the 'load' stage (default: disabled)
+        """
+        self.db_dir = db_dir
+        self.memory_budget = memory_budget
+        self.metrics = metrics if metrics is not None else NO_METRICS
+        os.makedirs(db_dir, exist_ok=True)
+
+        index_path = os.path.join(db_dir, self.INDEX_FILE)
+        self.config = config
+        index = {'records': [], 'next_file': 0, 'config': config}
+        if os.path.exists(index_path):
+            try:
+                with open(index_path) as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                pass  # unreadable index, start over; unreferenced files are overwritten
+        self.records: List[Dict] = index['records']
+        self._next_file: int = index['next_file']
+        self._dirty = False
+        if index.get('config') != json.loads(json.dumps(config)):
+            # Features computed with other settings; drop them all
+            for record in self.records:
+                self._remove_file(record['file'])
+            self.records = []
+            self._dirty = True
+            self.save()
+
+        self._resident: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._reindex()
+
+    def _reindex(self):
+        """Rebuild the label, source and length lookups from the records"""
+        self._by_label: Dict[str, List[int]] = {}
+        self._by_source: Dict[str, int] = {}
+        for idx, record in enumerate(self.records):
+            self._by_label.setdefault(record['label'], []).append(idx)
+            if record['source'] is not None:
+                self._by_source[record['source']] = idx
+        self._buckets = None
+
+    def _length_buckets(self):
+        """Entries sorted by length, the distinct lengths and where each one starts, built on demand"""
+        if self._buckets is None:
+            lengths = np.array([record['length'] for record in self.records], dtype=np.int64)
+            order = np.argsort(lengths, kind='stable')
+            bucket_lengths, starts = np.unique(lengths[order], return_index=True)
+            self._buckets = order, bucket_lengths, np.append(starts, len(order))
+        return self._buckets
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def labels(self) -> List[str]:
+        """Distinct labels, in order of first appearance"""
+        return list(self._by_label)
+
+    def ids(self, label: str) -> List[int]:
+        """Entries of one label, in insertion order"""
+        return list(self._by_label.get(label, []))
+
+    def _source_stat(self, source: str) -> Dict[str, int]:
+        stat = os.stat(source)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def is_current(self, source: str) -> bool:
+        """Whether the database holds an entry of this source file, made from its current version"""
+        idx = self._by_source.get(os.path.abspath(source))
+        if idx is None:
+            return False
+        record = self.records[idx]
+        try:
+            stat = self._source_stat(source)
+        except FileNotFoundError:
+            return False
+        return record['size'] == stat['size'] and record['mtime_ns'] == stat['mtime_ns']
+
+    def put(self, label: str, features: np.ndarray, speaker: Optional[str] = None,
+            source: Optional[str] = None) -> int:
+        """
+        Store a feature sequence
+
+        An entry made from the same source file is replaced in place, so
+        entries keep their order when a recording changes.
+
+        Args:
+            label: Word the sequence is an example of
+            features: Feature sequence (n_frames x dim)
+            speaker: Speaker of the recording, if known
+            source: File the features were computed from, if any
+
+        Returns:
+            Position of the entry in `records`
+        """
+        features = np.ascontiguousarray(features)
+        file = f'{self._next_file:08d}.npy'
+        self._next_file += 1
+        path = os.path.join(self.db_dir, file)
+        # Write to a temporary file first so readers never see a partial entry
+        tmp = path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, features)
+        os.replace(tmp, path)
+
+        record = {'label': label, 'length': len(features), 'speaker': speaker, 'source': None,
+                  'size': None, 'mtime_ns': None, 'file': file}
+        if source is not None:
+            record['source'] = os.path.abspath(source)
+            record.update(self._source_stat(source))
+
+        idx = self._by_source.get(record['source']) if source is not None else None
+        if idx is None:
+            idx = len(self.records)
+            self.records.append(record)
+            self._by_label.setdefault(label, []).append(idx)
+            if record['source'] is not None:
+                self._by_source[record['source']] = idx
+            self._buckets = None
+        else:
+            self._drop_resident(idx)
+            self._remove_file(self.records[idx]['file'])
+            self.records[idx] = record
+            self._reindex()
+        self._dirty = True
+        return idx
+
+    def remove_missing(self, sources: Iterable[str]) -> int:
+        """
+        Drop entries whose source file is not among `sources`
+
+        Entries without a source are kept. Remaining entries are renumbered.
+
+        Returns:
+            Number of entries removed
+        """
+        keep = {os.path.abspath(source) for source in sources}
+        kept = [r for r in self.records if r['source'] is None or r['source'] in keep]
+        removed = len(self.records) - len(kept)
+        if removed:
+            for record in self.records:
+                if record['source'] is not None and record['source'] not in keep:
+                    self._remove_file(record['file'])
+            self.records = kept
+            self._resident.clear()
+            self.resident_bytes = 0
+            self._reindex()
+            self._dirty = True
+        return removed
+
+    def _remove_file(self, file: str):
+        try:
+            os.remove(os.path.join(self.db_dir, file))
+        except FileNotFoundError:
+            pass
+
+    def save(self):
+        """Write the index if it changed"""
+        if not self._dirty:
+            return
+        index_path = os.path.join(self.db_dir, self.INDEX_FILE)
+        tmp = index_path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'records': self.records, 'next_file': self._next_file, 'config': self.config}, f)
+        os.replace(tmp, index_path)
+        self._dirty = False
+
+    def load(self, idx: int) -> np.ndarray:
+        """
+        Feature sequence of an entry, read from disk unless it is resident
+
+        Args:
+            idx: Position of the entry in `records`
+
+        Returns:
+            Read-only feature sequence
+        """
+        features = self._resident.get(idx)
+        if features is not None:
+            self._resident.move_to_end(idx)
+            self.hits += 1
+            return features
+
+        self.misses += 1
+        with self.metrics.stage('load'):
+            features = np.load(os.path.join(self.db_dir, self.records[idx]['file']))
+        features.flags.writeable = False
+        self._resident[idx] = features
+        self.resident_bytes += features.nbytes
+        # Least recently used first; the entry just loaded always stays
+        while self.resident_bytes > self.memory_budget and len(self._resident) > 1:
+            _, evicted = self._resident.popitem(last=False)
+            self.resident_bytes -= evicted.nbytes
+            self.evictions += 1
+        return features
+
+    def _drop_resident(self, idx: int):
+        features = self._resident.pop(idx, None)
+        if features is not None:
+            self.resident_bytes -= features.nbytes
+
+    def by_label(self, labels: Optional[Sequence[str]] = None) -> Dict[str, LabelView]:
+        """
+        Lazily loaded sequences of each label, shaped like DigitRecognizer.recordings
+
+        Args:
+            labels: Labels to include, in this order (default: all, in order of appearance)
+
+        Returns:
+            Dict from label to its sequences; labels without entries are left out
+        """
+        labels = self.labels if labels is None else labels
+        return {label: LabelView(self, self._by_label[label]) for label in labels if label in self._by_label}
+
+    def candidates(self, test_length: int, dtw=None, use_time_sync: bool = False,
+                   max_ratio: Optional[float] = None, labels: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        Entries whose length allows a match with a test sequence of test_length frames
+
+        Only the index is consulted: the length buckets within the ratio
+        window are found by binary search, and each bucket is checked once
+        against the DTW band. DTW's adaptive band always admits |N - M|
+        frames, so the band alone only rules out lengths in time-synchronous
+        mode; max_ratio bounds the length ratio in either direction.
+
+        Args:
+            test_length: Number of test frames
+            dtw: DTW instance whose band is required to hold the length difference
+            use_time_sync: Whether the time-synchronous band is used
+            max_ratio: Largest allowed ratio between template and test length
+            labels: Labels to keep (default: all)
+
+        Returns:
+            Positions of the candidate entries, ascending
+        """
+        order, bucket_lengths, bounds = self._length_buckets()
+        lo, hi = 0, len(bucket_lengths)
+        if max_ratio is not None:
+            lo = int(np.searchsorted(bucket_lengths, math.ceil(test_length / max_ratio), 'left'))
+            hi = int(np.searchsorted(bucket_lengths, math.floor(test_length * max_ratio), 'right'))
+
+        ids = []
+        for b in range(lo, hi):
+            length = int(bucket_lengths[b])
+            if dtw is not None:
+                band = dtw.compute_adaptive_band(length, test_length)
+                if use_time_sync:
+                    band = min(band, 1)
+                if abs(length - test_length) > band:
+                    continue
+            ids.append(order[bounds[b]:bounds[b + 1]])
+        ids = np.sort(np.concatenate(ids)) if ids else np.zeros(0, dtype=np.int64)
+
+        if labels is not None:
+            wanted = set(labels)
+            ids = ids[[self.records[i]['label'] in wanted for i in ids]] if len(ids) else ids
+        return ids
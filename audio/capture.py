@@ -0,0 +1,3 @@
+# The ring buffer and callback recorder live in Assignment3/capture.py, which
+# Assignment3 imports as a top-level module when run from its own directory.
+from Assignment3.capture import RingBuffer, CallbackRecorder
@@ -1,10 +1,10 @@
 import os
 import sys
 import wave
-import struct
-import pyaudio
+import numpy as np
 
-from audio.utils import zero_crossing_rate
+from audio.capture import CallbackRecorder
+from audio.utils import zero_crossing_rate, average_amplitude
 from config import (
     SAMPLING_RATE,
     CHANNELS,
@@ -17,68 +17,63 @@ from config import (
 )
 
 
-def record_audio(output_filename):
+def record_audio(output_filename, verbose=False):
     """
     Records audio from the microphone using automatic endpoint detection.
     Stops recording after MAX_SILENCE_DURATION seconds of silence.
     Saves as 16-bit PCM .wav file at 16kHz.
+
+    Capture runs in the PyAudio callback, which only copies samples into a
+    ring buffer, so endpoint detection here never delays the microphone.
+    Set verbose to print the amplitude and ZCR of every chunk.
     """
 
     # Ensure recordings directory exists
     os.makedirs(RECORDINGS_DIR, exist_ok=True)
 
-    audio = pyaudio.PyAudio()
-    stream = audio.open(
-        format=pyaudio.paInt16, # ← 16-bit PCM format
-        channels=CHANNELS,
+    recorder = CallbackRecorder(
         rate=SAMPLING_RATE, # ← This sets sampling rate to 16kHz
-        input=True,
-        frames_per_buffer=CHUNK_SIZE
+        chunk_size=CHUNK_SIZE,
+        channels=CHANNELS
     )
 
-
     print("Recording started. Speak into the microphone...")
 
     frames = []
     silent_chunks = 0
     max_silent_chunks = int(MAX_SILENCE_DURATION * SAMPLING_RATE / CHUNK_SIZE)
 
-    while True:
-        data = stream.read(CHUNK_SIZE)
-        frames.append(data)
-
-        # Convert bytes to int16 samples
-        samples = struct.unpack(f"{len(data) // 2}h", data)
-        avg_amplitude = sum(abs(x) for x in samples) / len(samples)
-        zcr_value = zero_crossing_rate(samples)
+    with recorder:
+        while True:
+            samples = recorder.read_chunk()
+            if samples is None:
+                break  # the stream stopped
+            frames.append(samples)
 
-        print(f"Amplitude: {avg_amplitude:.2f}, ZCR: {zcr_value:.3f}")
+            avg_amplitude = average_amplitude(samples)
+            zcr_value = zero_crossing_rate(samples)
 
-        is_silent = avg_amplitude < SILENCE_THRESHOLD and zcr_value < ZCR_THRESHOLD
+            is_silent = avg_amplitude < SILENCE_THRESHOLD and zcr_value < ZCR_THRESHOLD
+            silent_chunks = silent_chunks + 1 if is_silent else 0
 
-        if is_silent:
-            silent_chunks += 1
-            print(f"Silence detected: {silent_chunks}/{max_silent_chunks}")
-        else:
-            silent_chunks = 0
-            print("Speech detected.")
+            if verbose:
+                print(f"Amplitude: {avg_amplitude:.2f}, ZCR: {zcr_value:.3f}, "
+                      f"silence: {silent_chunks}/{max_silent_chunks}")
 
-        if silent_chunks > max_silent_chunks:
-            print("Silence threshold reached. Stopping recording.")
-            break
+            if silent_chunks > max_silent_chunks:
+                print("Silence threshold reached. Stopping recording.")
+                break
 
-    # Stop recording
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
+    if recorder.ring.overruns:
+        print(f"Warning: {recorder.ring.overruns} samples were dropped", file=sys.stderr)
 
     # Save the WAV file
     file_path = os.path.join(RECORDINGS_DIR, output_filename)
     with wave.open(file_path, 'wb') as wf:
         wf.setnchannels(CHANNELS)
-        wf.setsampwidth(audio.get_sample_size(pyaudio.paInt16)) # ← 16-bit = 2 bytes per sample
+        wf.setsampwidth(SAMPLE_WIDTH) # ← 16-bit = 2 bytes per sample
         wf.setframerate(SAMPLING_RATE)
-        wf.writeframes(b''.join(frames))
+        wf.writeframes(np.concatenate(frames).astype('<i2').tobytes())
 
     print(f"Recording saved to {file_path}")
     return file_path
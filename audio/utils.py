@@ -1,18 +1,27 @@
 import numpy as np
 def zero_crossing_rate(samples):
     """
-    Computes the Zero Crossing Rate (ZCR) for a list of 16-bit PCM samples.
+    Computes the Zero Crossing Rate (ZCR) for an array of 16-bit PCM samples.
     ZCR = (number of sign changes) / (total samples - 1)
     """
+    samples = np.asarray(samples)
     if len(samples) < 2:
         return 0.0
 
-    zero_crossings = 0
-    for i in range(1, len(samples)):
-        if (samples[i - 1] >= 0 and samples[i] < 0) or (samples[i - 1] < 0 and samples[i] >= 0):
-            zero_crossings += 1
+    non_negative = samples >= 0
+    zero_crossings = np.count_nonzero(non_negative[1:] != non_negative[:-1])
 
-    return zero_crossings / (len(samples) - 1)
+    return float(zero_crossings / (len(samples) - 1))
+
+def average_amplitude(samples):
+    """
+    Average absolute amplitude (short-term energy) of 16-bit PCM samples.
+    """
+    samples = np.asarray(samples)
+    if len(samples) == 0:
+        return 0.0
+    # int32 so that abs(-32768) does not overflow
+    return float(np.abs(samples.astype(np.int32)).mean())
 
 def add_noise(audio, noise_level=0.005):
     """